@@ -3,6 +3,18 @@ import os
 from flask import Flask
 from flask_login import LoginManager
 from .models import db, User
+from .capture_store import CaptureStore
+from .live_events import EventBroker
+from .inference import InferenceClient
+from .panic_series import PanicSeries
+from .user_cache import UserCache
+from .assets import AssetPipeline, asset_url
+from .serving import EventLoopRunner, request_threads
+from .admission import build_controllers
+from .near_duplicates import NearDuplicateIndex, NEAR_DUPLICATE_ACTIONS
+from .maintenance import FileCleaner
+from .frame_buffer import FrameBuffers
+from .speaker_relay import AudioTranscoder, SpeakerRelay
 from flask_migrate import Migrate
 
 migrate = Migrate()
@@ -17,7 +29,83 @@ def create_app():
         # This tells SQLAlchemy where to create the database inside the instance folder
         SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(app.instance_path, "site.db")}',
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        USER_CACHE_TTL_SECONDS=30,  # load_user cache (see user_cache.py); 0 queries on every request
+        # Content-addressed capture storage (see capture_store.py)
+        CAPTURE_FOLDER=os.path.join(app.static_folder, 'captures'),
+        CAPTURE_SHARD_LEVELS=2,
+        CAPTURE_ANALYZE_ON_INGEST=False,  # save_capture can also opt in per request with "analyze": true
+        # Near-duplicate frames (dHash Hamming distance <= threshold; None disables):
+        # 'flag' stores and marks them, 'skip_analysis' also skips ingest analysis, 'skip_storage' drops them
+        CAPTURE_NEAR_DUP_THRESHOLD=6,
+        CAPTURE_NEAR_DUP_ACTION='flag',
+        # Capture maintenance (see maintenance.py / `flask captures maintain`)
+        CAPTURE_PACK_FOLDER=os.path.join(app.instance_path, 'capture_packs'),
+        CAPTURE_PACK_AFTER_HOURS=24,
+        CAPTURE_GC_GRACE_SECONDS=3600,
+        CAPTURE_RETENTION_DAYS=None,  # None keeps captures forever
+        CAPTURE_RETENTION_STATUSES=['Completed'],
+        # Deleted investigations' files are removed in the background after this delay
+        CAPTURE_CLEANER_DELAY_SECONDS=30,
+        # Server-Sent Events for live capture/analysis updates (see live_events.py)
+        LIVE_EVENTS_BACKLOG=100,
+        LIVE_EVENTS_HEARTBEAT_SECONDS=15,
+        # Every open stream holds a request thread for as long as the page stays open; beyond this
+        # many (a quarter of WEB_THREADS, 4 by default) new streams get 503 so other requests still run
+        LIVE_EVENTS_MAX_SUBSCRIBERS=max(1, request_threads() // 4),
+        # Continuous frame ingest (see frame_buffer.py): seconds kept per investigation, the
+        # preallocated buffer per streaming investigation, and how many stream at once per worker
+        FRAME_BUFFER_SECONDS=10,
+        FRAME_BUFFER_MAX_MB=32,
+        FRAME_BUFFER_MAX_INVESTIGATIONS=4,
+        # A snapshot holds its request thread while it waits for later frames and stores (and
+        # maybe analyzes) each one, so both are kept short
+        FRAME_SNAPSHOT_MAX_AFTER_SECONDS=2,
+        FRAME_SNAPSHOT_MAX_FRAMES=10,
+        # Drone speaker relay (see speaker_relay.py): default drone base URLs for investigations that
+        # list none, the transcode target, the clip cache size and the per-drone request timeout
+        SPEAKER_ENDPOINTS=[],
+        # Networks (CIDR) drone URLs may resolve to; the server connects nowhere else, so empty disables it
+        SPEAKER_ALLOWED_NETWORKS=[],
+        SPEAKER_MAX_UPLOAD_MB=20,
+        SPEAKER_BITRATE='48k',
+        SPEAKER_SAMPLE_RATE=22050,
+        SPEAKER_CACHE_FOLDER=os.path.join(app.instance_path, 'speaker_cache'),
+        SPEAKER_CACHE_MAX_MB=200,
+        SPEAKER_TIMEOUT_SECONDS=10,
+        # Shared model server (`flask inference serve`); None keeps the models in each worker
+        INFERENCE_SOCKET=None,
+        INFERENCE_TIMEOUT_SECONDS=30,
+        # Cross-request emotion batching: bigger/longer batches favour throughput over latency; 0 disables
+        ANALYSIS_BATCH_MAX_SIZE=32,
+        ANALYSIS_BATCH_MAX_WAIT_MS=5,
+        # InsightFace models to run: 'fast' (detection + gender/age), 'recognition', 'full' or a module list
+        ANALYSIS_PROFILE='fast',
+        # Memory-budget mode: emotion model in 'float32', 'bfloat16' or 'int8' (CPU), and
+        # unload the models after this many idle seconds (None keeps them resident)
+        MODEL_PRECISION='float32',
+        MODEL_IDLE_UNLOAD_SECONDS=None,
+        # Faces failing any of these skip the emotion model (0 disables a check)
+        FACE_GATE_MIN_SIZE=20,
+        FACE_GATE_MIN_SHARPNESS=15.0,
+        FACE_GATE_MIN_DET_SCORE=0.6,  # The detector already drops faces below 0.5 (det_thresh)
+        # Panic score time series (see panic_series.py); alerts fire when a metric crosses its threshold
+        PANIC_WINDOW_SIZE=20,
+        PANIC_EWMA_ALPHA=0.3,
+        PANIC_ALERT_THRESHOLDS={'ewma': 60, 'max_face': 85},
+        PANIC_ALERT_HYSTERESIS=10,
+        # Admission control per worker (see admission.py): concurrent requests, queued waiters and
+        # seconds a waiter may queue per expensive endpoint class; a class left out is unlimited.
+        # Admitted analyses are all the emotion batcher can merge: 8 of them (~6 faces each) fill
+        # most of an ANALYSIS_BATCH_MAX_SIZE batch and leave half of gunicorn's 16 threads free
+        ADMISSION_LIMITS={
+            'analysis': {'max_concurrent': 8, 'max_queue': 16, 'queue_timeout': 15},
+            'voice': {'max_concurrent': 4, 'max_queue': 8, 'queue_timeout': 10},
+        },
+        # Run `async def` views on one long-lived event loop per process (see serving.py)
+        ASYNC_VIEWS_SHARED_LOOP=True,
     )
+    # Allow overrides such as FLASK_CAPTURE_FOLDER from the environment / .env
+    app.config.from_prefixed_env()
 
     # Ensure the instance folder exists
     try:
@@ -29,22 +117,76 @@ def create_app():
     app.config['UPLOAD_FOLDER'] = os.path.join(app.static_folder, 'profile_pics')
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+    app.extensions['capture_store'] = CaptureStore(
+        app.config['CAPTURE_FOLDER'],
+        shard_levels=app.config['CAPTURE_SHARD_LEVELS'],
+        pack_root=app.config['CAPTURE_PACK_FOLDER'],
+    )
+    app.extensions['file_cleaner'] = FileCleaner(app, delay=app.config['CAPTURE_CLEANER_DELAY_SECONDS'])
+    app.extensions['assets'] = AssetPipeline(app.static_folder, static_url_path=app.static_url_path)
+    app.jinja_env.globals['asset_url'] = asset_url
+    if app.config['ASYNC_VIEWS_SHARED_LOOP']:
+        app.extensions['event_loop'] = EventLoopRunner()
+        app.async_to_sync = app.extensions['event_loop'].async_to_sync
+    app.extensions['admission'] = build_controllers(app.config['ADMISSION_LIMITS'])
+    app.extensions['user_cache'] = UserCache(ttl=app.config['USER_CACHE_TTL_SECONDS'])
+    app.extensions['live_events'] = EventBroker(backlog=app.config['LIVE_EVENTS_BACKLOG'],
+                                                max_subscribers=app.config['LIVE_EVENTS_MAX_SUBSCRIBERS'])
+    app.extensions['frame_buffers'] = FrameBuffers(
+        seconds=app.config['FRAME_BUFFER_SECONDS'],
+        max_bytes=int(app.config['FRAME_BUFFER_MAX_MB'] * 2**20),
+        max_investigations=app.config['FRAME_BUFFER_MAX_INVESTIGATIONS'],
+    )
+    app.extensions['speaker_relay'] = SpeakerRelay(
+        AudioTranscoder(
+            app.config['SPEAKER_CACHE_FOLDER'],
+            bitrate=app.config['SPEAKER_BITRATE'],
+            sample_rate=app.config['SPEAKER_SAMPLE_RATE'],
+            max_cache_mb=app.config['SPEAKER_CACHE_MAX_MB'],
+        ),
+        timeout=app.config['SPEAKER_TIMEOUT_SECONDS'],
+        allowed_networks=app.config['SPEAKER_ALLOWED_NETWORKS'],
+    )
+    if app.config['CAPTURE_NEAR_DUP_ACTION'] not in NEAR_DUPLICATE_ACTIONS:
+        raise ValueError(f"CAPTURE_NEAR_DUP_ACTION must be one of {', '.join(NEAR_DUPLICATE_ACTIONS)}")
+    app.extensions['near_duplicates'] = NearDuplicateIndex(app.config['CAPTURE_NEAR_DUP_THRESHOLD'])
+    app.extensions['panic_series'] = PanicSeries(
+        window=app.config['PANIC_WINDOW_SIZE'],
+        alpha=app.config['PANIC_EWMA_ALPHA'],
+        thresholds=app.config['PANIC_ALERT_THRESHOLDS'],
+        hysteresis=app.config['PANIC_ALERT_HYSTERESIS'],
+    )
+    if app.config['INFERENCE_SOCKET']:
+        app.extensions['inference'] = InferenceClient(
+            app.config['INFERENCE_SOCKET'], timeout=app.config['INFERENCE_TIMEOUT_SECONDS'])
+
     # --- Initialize Extensions ---
     db.init_app(app)
-    migrate.init_app(app, db)
+    # Batch mode, so autogenerated revisions can alter SQLite tables (rebuilt by copy)
+    migrate.init_app(app, db, render_as_batch=True)
     login_manager = LoginManager(app)
     login_manager.login_view = 'main.login' 
     login_manager.login_message_category = 'info'
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return app.extensions['user_cache'].load(int(user_id))
 
     # --- Register Blueprints ---
     from .routes import main as main_blueprint
     app.register_blueprint(main_blueprint)
+    from .commands import register_commands
+    register_commands(app)
     from . import analysis_utils
-    with app.app_context():
-        analysis_utils.initialize_models()
+    analysis_utils.configure_profile(app.config['ANALYSIS_PROFILE'])
+    analysis_utils.configure_memory_budget(app.config['MODEL_PRECISION'], app.config['MODEL_IDLE_UNLOAD_SECONDS'])
+    analysis_utils.configure_batching(app.config['ANALYSIS_BATCH_MAX_SIZE'], app.config['ANALYSIS_BATCH_MAX_WAIT_MS'])
+    analysis_utils.configure_gating(app.config['FACE_GATE_MIN_SIZE'], app.config['FACE_GATE_MIN_SHARPNESS'],
+                                    app.config['FACE_GATE_MIN_DET_SCORE'])
+    # With an inference server the workers stay model-free; they only load
+    # the models themselves if the server turns out to be missing.
+    if 'inference' not in app.extensions:
+        with app.app_context():
+            analysis_utils.initialize_models()
 
     return app
\ No newline at end of file
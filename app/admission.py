@@ -0,0 +1,156 @@
+# app/admission.py
+import functools
+import math
+import threading
+import time
+from collections import deque
+
+from flask import current_app, jsonify
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded concurrency for one class of expensive requests.
+
+    At most `max_concurrent` requests run at once; up to `max_queue` more
+    wait in FIFO order for a slot, each for at most `queue_timeout` seconds.
+    A full queue is rejected straight away (429) and a wait that runs past
+    its deadline gives up (503), both with a Retry-After estimated from the
+    recent service time, so overload turns into fast refusals instead of
+    every caller getting slower. Limits are per worker process.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue=0, queue_timeout=10.0, alpha=0.2):
+        if max_concurrent < 1:
+            raise ValueError(f"Admission class {name!r} needs max_concurrent >= 1")
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.alpha = alpha
+        self._cond = threading.Condition()
+        self._waiters = deque()
+        self._active = 0
+        self._service_seconds = None  # EWMA of how long an admitted request holds its slot
+        self._counters = {'admitted': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0, 'deferred': 0}
+        self._wait_seconds = 0.0
+
+    def _retry_after(self, ahead):
+        service = self._service_seconds or 1.0
+        return max(1, math.ceil(service * (ahead + 1) / self.max_concurrent))
+
+    def _admit(self, waited):
+        self._active += 1
+        self._counters['admitted'] += 1
+        self._wait_seconds += waited
+        return time.monotonic()
+
+    def acquire(self):
+        """Blocks until a slot is free; returns a token for release(). Raises AdmissionRejected."""
+        with self._cond:
+            if self._active < self.max_concurrent and not self._waiters:
+                return self._admit(0.0)
+            if len(self._waiters) >= self.max_queue:
+                self._counters['rejected_queue_full'] += 1
+                raise AdmissionRejected(429, f"{self.name} queue is full",
+                                        self._retry_after(len(self._waiters)))
+
+            waiter = object()
+            self._waiters.append(waiter)
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+            try:
+                while self._waiters[0] is not waiter or self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['rejected_timeout'] += 1
+                        raise AdmissionRejected(503, f"Timed out waiting for a {self.name} slot",
+                                                self._retry_after(len(self._waiters)))
+                    self._cond.wait(remaining)
+                return self._admit(time.monotonic() - start)
+            finally:
+                self._waiters.remove(waiter)
+                self._cond.notify_all()  # The next waiter may now be at the head
+
+    def try_acquire(self):
+        """Non-blocking acquire for optional work; returns a token, or None when busy."""
+        with self._cond:
+            if self._active < self.max_concurrent and not self._waiters:
+                return self._admit(0.0)
+            self._counters['deferred'] += 1
+            return None
+
+    def release(self, token):
+        held = time.monotonic() - token
+        with self._cond:
+            self._active -= 1
+            if self._service_seconds is None:
+                self._service_seconds = held
+            else:
+                self._service_seconds += self.alpha * (held - self._service_seconds)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            admitted = self._counters['admitted']
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'queue_timeout': self.queue_timeout,
+                'active': self._active,
+                'queued': len(self._waiters),
+                **self._counters,
+                'mean_wait_seconds': round(self._wait_seconds / admitted, 4) if admitted else 0.0,
+                'service_seconds': round(self._service_seconds, 4) if self._service_seconds is not None else None,
+            }
+
+
+def build_controllers(limits):
+    """{name: AdmissionController} from the ADMISSION_LIMITS config mapping."""
+    return {name: AdmissionController(name, **options) for name, options in (limits or {}).items()}
+
+
+def get_admission(name):
+    """The current app's controller for `name`, or None when that class is unlimited."""
+    return current_app.extensions['admission'].get(name)
+
+
+def rejection_response(rejected):
+    response = jsonify({'error': f"Server busy: {rejected.reason}. Retry in {rejected.retry_after}s.",
+                        'retry_after': rejected.retry_after})
+    response.status_code = rejected.status
+    response.headers['Retry-After'] = str(rejected.retry_after)
+    return response
+
+
+def admission(name):
+    """
+    View decorator: runs the view inside the `name` admission class. Goes
+    below @login_required so anonymous callers never take a queue slot.
+    Works for `async def` views too; the slot is held while the view's
+    coroutine runs on the event loop.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            controller = get_admission(name)
+            if controller is None:
+                return current_app.ensure_sync(view)(*args, **kwargs)
+            try:
+                token = controller.acquire()
+            except AdmissionRejected as rejected:
+                return rejection_response(rejected)
+            try:
+                return current_app.ensure_sync(view)(*args, **kwargs)
+            finally:
+                controller.release(token)
+        return wrapper
+    return decorator
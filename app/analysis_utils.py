@@ -8,6 +8,15 @@ from io import BytesIO
 import asyncio
 import scipy.io.wavfile as wav
 import tempfile
+import threading
+import time
+import gc
+import ctypes
+import warnings
+from contextlib import contextmanager
+
+from .batching import MicroBatcher
+from .serving import process_memory
 
 # --- Conditionally import models to avoid errors during setup ---
 try:
@@ -22,7 +31,42 @@ device = "cpu"
 face_app = None
 processor = None
 emotion_model = None
+emotion_batcher = None
+# Memory-budget mode (see configure_memory_budget)
+MODEL_PRECISIONS = ('float32', 'bfloat16', 'int8')
+MODEL_PRECISION = 'float32'
+MODEL_IDLE_UNLOAD_SECONDS = None  # None keeps the models resident forever
+emotion_device = "cpu"
+emotion_dtype = torch.float32
+model_stats = {'loads': 0, 'unloads': 0, 'last_load_seconds': None}
+models_unloaded = False
+last_used = 0.0
+_in_flight = 0
+_model_lock = threading.RLock()
+_reaper = None
+# Pre-filter applied before the emotion model (see configure_gating); 0 disables a check
+FACE_GATE_MIN_SIZE = 20          # px, shorter side of the crop
+FACE_GATE_MIN_SHARPNESS = 15.0   # variance of the Laplacian of the grayscale crop
+FACE_GATE_MIN_DET_SCORE = 0.6   # Only matters above the detector's own det_thresh (0.5)
+gating_counts = {'faces': 0, 'gated': 0, 'too_small': 0, 'blurred': 0, 'low_confidence': 0}
+_gating_lock = threading.Lock()
+# InsightFace models to load and run per face (FaceAnalysis allowed_modules); None loads all of buffalo_l
+ANALYSIS_PROFILES = {
+    'fast': ['detection', 'genderage'],                       # Everything analyze_image reads
+    'recognition': ['detection', 'genderage', 'recognition'],  # + face embeddings
+    'full': None,                                             # + 2D/3D landmarks
+}
+FACE_MODULES = ('detection', 'landmark_2d_106', 'landmark_3d_68', 'genderage', 'recognition')
+REQUIRED_FACE_MODULES = ('detection', 'genderage')  # bbox/det_score and gender/age
+face_modules = ANALYSIS_PROFILES['fast']
 EMOTIONS = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
+# Reduced-resolution JPEG decode: pick the largest 1/2, 1/4 or 1/8 scale that
+# still leaves the long side at least this big (2x the 640px detector input).
+DECODE_MIN_SIDE = 1280
+REDUCED_DECODE_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+# Only this much of the image is copied to read its size; a header further in (very large
+# EXIF/ICC blocks) just means a full-size decode.
+HEADER_PROBE_BYTES = 64 * 1024
 AGE_BUCKETS = [(1,5),(6,10),(11,15),(16,20),(21,25),(26,30),
                (31,35),(36,40),(41,45),(46,50),(51,55),(56,60),(61,65),(66,70),(71,75),(76,80),
                (81,85),(86,90),(91,95),(96,100)]
@@ -30,27 +74,153 @@ AGE_BUCKETS = [(1,5),(6,10),(11,15),(16,20),(21,25),(26,30),
 # --- Model Initialization ---
 def initialize_models():
     """Initializes and loads all the necessary AI models."""
-    global device, face_app, processor, emotion_model
+    global device, face_app, processor, emotion_model, models_unloaded, last_used
     if not MODELS_LOADED:
         print("[WARN] Analysis libraries not installed. Skipping model loading.")
         return
 
     if face_app is not None: # Models already loaded
         return
+    start = time.perf_counter()
 
     device = "mps" if torch.backends.mps.is_available() else ("cuda" if torch.cuda.is_available() else "cpu")
     print(f"[INFO] Using device: {device}")
 
-    print("[INFO] Loading InsightFace...")
-    face_app = FaceAnalysis(name="buffalo_l")
-    face_app.prepare(ctx_id=0, det_size=(640, 640))
+    print(f"[INFO] Loading InsightFace ({', '.join(face_modules) if face_modules else 'all modules'})...")
+    face_app = load_face_app()
     print("[INFO] InsightFace ready.")
 
     print("[INFO] Loading HuggingFace ViT Emotion Model...")
-    processor = ViTImageProcessor.from_pretrained("abhilash88/face-emotion-detection")
-    emotion_model = ViTForImageClassification.from_pretrained("abhilash88/face-emotion-detection").to(device)
-    emotion_model.eval()
-    print("[INFO] Emotion model loaded successfully.")
+    processor, model = load_emotion_model()
+    emotion_model = prepare_emotion_model(model)
+    print(f"[INFO] Emotion model loaded successfully ({MODEL_PRECISION}).")
+
+    models_unloaded = False
+    last_used = time.monotonic()
+    model_stats['loads'] += 1
+    model_stats['last_load_seconds'] = time.perf_counter() - start
+
+
+def load_face_app():
+    app = FaceAnalysis(name="buffalo_l", allowed_modules=face_modules)
+    app.prepare(ctx_id=0, det_size=(640, 640))
+    return app
+
+
+def load_emotion_model():
+    """(processor, model) as stored, before prepare_emotion_model."""
+    return (ViTImageProcessor.from_pretrained("abhilash88/face-emotion-detection"),
+            ViTForImageClassification.from_pretrained("abhilash88/face-emotion-detection"))
+
+
+def prepare_emotion_model(model):
+    """
+    Moves the emotion model to its device in MODEL_PRECISION: bfloat16 halves
+    the weights; int8 quantizes every Linear layer (most of a ViT) to a
+    quarter, with activations quantized on the fly. Dynamic int8 is CPU-only.
+    """
+    global emotion_device, emotion_dtype
+    emotion_device, emotion_dtype = device, torch.float32
+    if MODEL_PRECISION == 'int8':
+        emotion_device = "cpu"
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # torch.ao deprecation notices
+            model = torch.ao.quantization.quantize_dynamic(model.to("cpu").eval(), {torch.nn.Linear}, dtype=torch.qint8)
+    elif MODEL_PRECISION == 'bfloat16':
+        emotion_dtype = torch.bfloat16
+        model = model.to(device=device, dtype=torch.bfloat16)
+    else:
+        model = model.to(device)
+    return model.eval()
+
+
+# --- Memory-budget Mode ---
+def configure_memory_budget(precision='float32', idle_unload_seconds=None):
+    """
+    Sets the emotion model precision (applied on the next load) and, when
+    idle_unload_seconds is set, starts a reaper thread that unloads the models
+    once nothing has been analyzed for that long. The next analysis reloads
+    them (see models_in_use).
+    """
+    global MODEL_PRECISION, MODEL_IDLE_UNLOAD_SECONDS
+    if precision not in MODEL_PRECISIONS:
+        raise ValueError(f"MODEL_PRECISION must be one of {', '.join(MODEL_PRECISIONS)}")
+    MODEL_PRECISION = precision
+    MODEL_IDLE_UNLOAD_SECONDS = idle_unload_seconds or None
+    if MODEL_IDLE_UNLOAD_SECONDS:
+        _start_reaper()
+
+def _start_reaper():
+    global _reaper
+    if _reaper is None or not _reaper.is_alive():
+        _reaper = threading.Thread(target=_reap_idle_models, name='model-reaper', daemon=True)
+        _reaper.start()
+
+def _reap_idle_models():
+    while MODEL_IDLE_UNLOAD_SECONDS:
+        time.sleep(min(30.0, max(1.0, MODEL_IDLE_UNLOAD_SECONDS / 4)))
+        with _model_lock:
+            idle = MODEL_IDLE_UNLOAD_SECONDS
+            if idle and face_app is not None and _in_flight == 0 and time.monotonic() - last_used >= idle:
+                print(f"[INFO] Models idle for {idle}s; unloading.")
+                unload_models()
+
+def unload_models():
+    """Drops the models and hands their memory back to the OS; models_in_use() reloads them."""
+    global face_app, processor, emotion_model, models_unloaded
+    with _model_lock:
+        if face_app is None:
+            return
+        face_app = processor = emotion_model = None
+        models_unloaded = True
+        model_stats['unloads'] += 1
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)  # glibc keeps freed arenas otherwise
+    except (OSError, AttributeError):
+        pass
+
+@contextmanager
+def models_in_use():
+    """
+    Wraps one analysis: reloads models the reaper unloaded, and keeps the
+    reaper from unloading them until the analysis is done.
+    """
+    global _in_flight, last_used
+    with _model_lock:
+        if models_unloaded and face_app is None:
+            initialize_models()
+        _in_flight += 1
+    try:
+        yield
+    finally:
+        with _model_lock:
+            _in_flight -= 1
+            last_used = time.monotonic()
+
+def models_available():
+    """True when models are loaded, or were unloaded for idleness and reload on use."""
+    return MODELS_LOADED and (face_app is not None or models_unloaded)
+
+def _tensor_bytes(value):
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(v) for v in value)
+    return 0
+
+def memory_stats():
+    """Emotion model weight size, process RSS, load/unload counts and the last (cold) load time."""
+    with _model_lock:
+        model = emotion_model
+        stats = dict(model_stats, loaded=face_app is not None, precision=MODEL_PRECISION,
+                     idle_unload_seconds=MODEL_IDLE_UNLOAD_SECONDS,
+                     idle_seconds=round(time.monotonic() - last_used, 1) if last_used else None)
+    stats['emotion_model_bytes'] = sum(_tensor_bytes(v) for v in model.state_dict().values()) if model is not None else 0
+    stats['rss_bytes'] = process_memory().get('rss')
+    return stats
 
 
 # --- Analysis Helper Functions ---
@@ -62,24 +232,146 @@ def age_to_range(age):
     return "100+"
 
 def get_emotion_vit(face_crop):
+    return get_emotions_vit([face_crop])[0]
+
+def get_emotions_vit(face_crops):
+    """Emotion label and fear score for each crop, from a single batched forward pass."""
+    results = [("N/A", 0.0)] * len(face_crops)
     try:
-        if not MODELS_LOADED or face_crop.size == 0:
-            return "N/A", 0.0
-        img_pil = Image.fromarray(cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB))
-        inputs = processor(img_pil, return_tensors="pt").to(device)
+        if not MODELS_LOADED:
+            return results
+        valid = [i for i, crop in enumerate(face_crops) if crop.size != 0]
+        if not valid:
+            return results
+        images = [Image.fromarray(cv2.cvtColor(face_crops[i], cv2.COLOR_BGR2RGB)) for i in valid]
+        inputs = processor(images, return_tensors="pt").to(emotion_device)
         with torch.no_grad():
-            outputs = emotion_model(**inputs)
-            probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-            idx = torch.argmax(probs, dim=-1).item()
-            pred_emotion = EMOTIONS[idx]
-        fear_score = (
-            probs[0][2].item() + 0.5*probs[0][5].item() + 0.3*probs[0][0].item() + 0.2*probs[0][1].item()
-        )
-        fear_score = np.clip(fear_score,0,1)
-        return pred_emotion, fear_score
+            outputs = emotion_model(pixel_values=inputs["pixel_values"].to(emotion_dtype))
+            probs = torch.nn.functional.softmax(outputs.logits.float(), dim=-1)
+            indices = torch.argmax(probs, dim=-1).tolist()
+        fear_scores = (
+            probs[:, 2] + 0.5*probs[:, 5] + 0.3*probs[:, 0] + 0.2*probs[:, 1]
+        ).clamp(0, 1).tolist()
+        results = list(results)
+        for i, idx, fear_score in zip(valid, indices, fear_scores):
+            results[i] = (EMOTIONS[idx], fear_score)
+        return results
     except Exception as e:
         print("[WARN] Emotion prediction failed:", e)
-        return "N/A", 0.0
+        return [("N/A", 0.0)] * len(face_crops)
+
+# --- Pre-filter Gating ---
+def configure_gating(min_size=20, min_sharpness=15.0, min_det_score=0.6):
+    global FACE_GATE_MIN_SIZE, FACE_GATE_MIN_SHARPNESS, FACE_GATE_MIN_DET_SCORE
+    FACE_GATE_MIN_SIZE = min_size
+    FACE_GATE_MIN_SHARPNESS = min_sharpness
+    FACE_GATE_MIN_DET_SCORE = min_det_score
+
+def gate_face(face_crop, det_score, scale=1):
+    """
+    Returns why a face should skip the emotion model, or None to keep it.
+    Checks run cheapest first: detector confidence, crop size (in source
+    pixels: `scale` undoes a reduced decode), then a Laplacian-variance blur
+    score (tiny or blurred crops only give the ViT noise).
+    """
+    if det_score < FACE_GATE_MIN_DET_SCORE:
+        return 'low_confidence'
+    if min(face_crop.shape[:2]) * scale < FACE_GATE_MIN_SIZE:
+        return 'too_small'
+    if FACE_GATE_MIN_SHARPNESS:
+        gray = cv2.cvtColor(face_crop, cv2.COLOR_BGR2GRAY)
+        if cv2.Laplacian(gray, cv2.CV_64F).var() < FACE_GATE_MIN_SHARPNESS:
+            return 'blurred'
+    return None
+
+def _record_gating(total, reasons):
+    with _gating_lock:
+        gating_counts['faces'] += total
+        gating_counts['gated'] += len(reasons)
+        for reason in reasons:
+            gating_counts[reason] += 1
+
+def gating_stats():
+    """Cumulative faces seen and emotion inferences skipped by the pre-filter in this process."""
+    with _gating_lock:
+        return dict(gating_counts)
+
+# --- Cross-request Batching ---
+def configure_batching(max_batch_size=32, max_wait_ms=5):
+    """
+    Routes emotion inference from all concurrent analyses through one
+    MicroBatcher (see batching.py). max_batch_size=0 turns batching off and
+    each analysis runs its own forward pass again.
+    """
+    global emotion_batcher
+    if max_batch_size <= 0:
+        emotion_batcher = None
+        return
+    if (emotion_batcher is not None and emotion_batcher.max_batch_size == max_batch_size
+            and emotion_batcher.max_wait == max_wait_ms / 1000.0):
+        return
+    emotion_batcher = MicroBatcher(get_emotions_vit, max_batch_size=max_batch_size,
+                                   max_wait_ms=max_wait_ms, name='emotion-batcher')
+
+def configure_profile(profile='fast'):
+    """
+    Selects the InsightFace models initialize_models() loads: a name from
+    ANALYSIS_PROFILES or a list of module names. The default skips the
+    landmark and recognition heads, which the analysis never reads; profiles
+    that need embeddings opt back in. Takes effect on the next model load.
+    """
+    global face_modules
+    modules = ANALYSIS_PROFILES.get(profile, profile) if isinstance(profile, str) else profile
+    if isinstance(modules, str):
+        raise ValueError(f"Unknown analysis profile {profile!r}; choose from {', '.join(ANALYSIS_PROFILES)} "
+                         f"or list modules from {', '.join(FACE_MODULES)}")
+    if modules is not None:
+        modules = list(modules)
+        unknown = set(modules) - set(FACE_MODULES)
+        if unknown:
+            raise ValueError(f"Unknown InsightFace module(s): {', '.join(sorted(unknown))}")
+        missing = [m for m in REQUIRED_FACE_MODULES if m not in modules]
+        if missing:
+            raise ValueError(f"Analysis profile must include {', '.join(missing)}")
+    face_modules = modules
+
+def configure_threads(num_threads):
+    """
+    Caps the intra-op threads torch and OpenCV use within one analysis. With
+    several worker processes each should get its share of the cores, not all
+    of them, or the workers oversubscribe the CPU.
+    """
+    torch.set_num_threads(num_threads)
+    cv2.setNumThreads(num_threads)
+
+def reset_after_fork(num_threads):
+    """
+    Per-worker setup when a pre-fork master already loaded the models (see
+    serving.py). The torch weights stay shared copy-on-write; only what did
+    not survive fork() is rebuilt: the emotion batcher's thread and
+    InsightFace's ONNX Runtime sessions, whose thread pools live in the master,
+    and the idle-unload reaper.
+    """
+    global emotion_batcher
+    configure_threads(num_threads)
+    if MODEL_IDLE_UNLOAD_SECONDS:
+        _start_reaper()
+    if emotion_batcher is not None:
+        emotion_batcher = MicroBatcher(get_emotions_vit, max_batch_size=emotion_batcher.max_batch_size,
+                                       max_wait_ms=emotion_batcher.max_wait * 1000, name='emotion-batcher')
+    if MODELS_LOADED and face_app is not None and hasattr(face_app, 'models'):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        for model in face_app.models.values():
+            model.session = onnxruntime.InferenceSession(
+                model.model_file, sess_options=options, providers=model.session.get_providers())
+
+def predict_emotions(face_crops):
+    if emotion_batcher is None:
+        return get_emotions_vit(face_crops)
+    return emotion_batcher.submit(face_crops)
 
 def get_vulnerability_from_age(age):
     if age is None: return 0.2
@@ -116,13 +408,41 @@ def image_to_base64(img_arr):
     _, buffer = cv2.imencode('.jpg', img_arr)
     return f"data:image/jpeg;base64,{base64.b64encode(buffer).decode('utf-8')}"
 
-# --- Main Analysis Function ---
+# --- Image Decoding ---
+def decode_image_bytes(image_bytes, min_side=DECODE_MIN_SIDE):
+    """
+    Decodes an encoded image straight from memory. np.frombuffer wraps the
+    bytes without copying; for large JPEGs libjpeg's DCT scaling decodes at
+    1/2, 1/4 or 1/8 resolution, which is much cheaper than a full decode
+    followed by a resize. Pass min_side=None to always decode at full size.
+    """
+    return decode_image_bytes_scaled(image_bytes, min_side)[0]
+
+def decode_image_bytes_scaled(image_bytes, min_side=DECODE_MIN_SIDE):
+    """decode_image_bytes, plus the reduction factor (1, 2, 4 or 8) it decoded at."""
+    buf = np.frombuffer(image_bytes, dtype=np.uint8)
+    flags, scale = cv2.IMREAD_COLOR, 1
+    if min_side:
+        try:
+            # PIL only parses the header here, from a copy of the first bytes: the
+            # inference server passes a shared-memory view that must not be copied whole
+            width, height = Image.open(BytesIO(bytes(buf[:HEADER_PROBE_BYTES]))).size
+            long_side = max(width, height)
+            for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+                if long_side // factor >= min_side:
+                    flags, scale = reduced_flag, factor
+                    break
+        except Exception:
+            pass
+    return cv2.imdecode(buf, flags), scale
+
+# --- Main Analysis Functions ---
 def analyze_image_from_path(image_path):
     """
     Performs full face, emotion, and panic analysis on an image file.
     Returns a dictionary with group stats and individual face data.
     """
-    if not MODELS_LOADED or face_app is None:
+    if not models_available():
         return {"error": "Analysis models are not loaded."}
 
     try:
@@ -132,6 +452,35 @@ def analyze_image_from_path(image_path):
     except Exception as e:
         return {"error": f"Error loading image: {e}"}
 
+    return analyze_image(img)
+
+def analyze_image_from_bytes(image_bytes, min_side=DECODE_MIN_SIDE):
+    """
+    Same as analyze_image_from_path, but for an encoded image already in memory
+    (e.g. the upload in save_capture), so there is no disk round trip.
+    """
+    if not models_available():
+        return {"error": "Analysis models are not loaded."}
+
+    try:
+        img, scale = decode_image_bytes_scaled(image_bytes, min_side=min_side)
+        if img is None:
+            return {"error": "Could not decode the image data."}
+    except Exception as e:
+        return {"error": f"Error decoding image: {e}"}
+
+    return analyze_image(img, scale=scale)
+
+def analyze_image(img, scale=1):
+    """
+    Runs the analysis pipeline on a decoded BGR image. `scale` is the source
+    pixels per decoded pixel of a reduced decode, so the face size gate
+    still measures faces at the source resolution.
+    """
+    with models_in_use():
+        return _analyze_loaded_image(img, scale)
+
+def _analyze_loaded_image(img, scale=1):
     faces = face_app.get(img)
     if not faces:
         return {"group_stats": {}, "faces": []}
@@ -141,12 +490,20 @@ def analyze_image_from_path(image_path):
     male_count = 0
     female_count = 0
 
+    # Crop and gate every face first; the survivors' emotions come from one (batched) forward pass
+    crops = []
     for idx, f in enumerate(faces):
         x1, y1, x2, y2 = map(int, f.bbox)
         face_crop = img[y1:y2, x1:x2]
-        if face_crop.size == 0:
-            continue
+        if face_crop.size != 0:
+            face_conf = float(getattr(f, "det_score", 1.0))
+            crops.append((idx, f, face_crop, face_conf, gate_face(face_crop, face_conf, scale)))
+    kept = [face_crop for _, _, face_crop, _, gated in crops if gated is None]
+    emotions = iter(predict_emotions(kept))
+    gated_reasons = [gated for *_, gated in crops if gated is not None]
+    _record_gating(len(crops), gated_reasons)
 
+    for idx, f, face_crop, face_conf, gated in crops:
         gender = "Male" if f.gender == 1 else "Female"
         if gender == "Male": male_count += 1
         else: female_count += 1
@@ -154,17 +511,20 @@ def analyze_image_from_path(image_path):
         age = int(f.age) if hasattr(f, "age") else 25
         age_vuln = get_vulnerability_from_age(age)
         gender_score = 0.8 if gender == "Male" else 1.0
-        face_conf = float(getattr(f, "det_score", 1.0))
-
-        emo_label, emo_fear = get_emotion_vit(face_crop)
-        raw_score, panic_score = compute_panic_score(age_vuln, emo_fear, gender_score, face_conf)
 
-        face_data_list.append({
-            'emo_fear': emo_fear, 'age_vuln': age_vuln,
-            'gender_score': gender_score, 'face_conf': face_conf, 'raw_score': raw_score
-        })
+        if gated is not None:
+            # Kept in the output, but without an emotion it stays out of the group score
+            emo_label, fear_text, panic_text = "N/A", "N/A", "N/A"
+        else:
+            emo_label, emo_fear = next(emotions)
+            raw_score, panic_score = compute_panic_score(age_vuln, emo_fear, gender_score, face_conf)
+            face_data_list.append({
+                'emo_fear': emo_fear, 'age_vuln': age_vuln,
+                'gender_score': gender_score, 'face_conf': face_conf, 'raw_score': raw_score
+            })
+            fear_text, panic_text = f"{emo_fear:.2%}", f"{panic_score:.0f}"
 
-        person_details.append({
+        details = {
             "id": idx,
             "crop_base64": image_to_base64(face_crop),
             "gender": gender,
@@ -172,17 +532,21 @@ def analyze_image_from_path(image_path):
             "age_range": age_to_range(age),
             "emotion_label": emo_label,
             "confidence": f"{face_conf:.2%}",
-            "fear_score": f"{emo_fear:.2%}",
+            "fear_score": fear_text,
             "vulnerability": f"{age_vuln:.2%}",
-            "panic_score": f"{panic_score:.0f}"
-        })
+            "panic_score": panic_text
+        }
+        if gated is not None:
+            details["gated"] = gated
+        person_details.append(details)
 
     group_scores = compute_group_panic(face_data_list)
     group_stats = {
         "total_faces": len(faces),
         "male_count": male_count,
         "female_count": female_count,
-        "panic_score": f"{group_scores.get('PanicScore', 0.0):.0f}"
+        "panic_score": f"{group_scores.get('PanicScore', 0.0):.0f}",
+        "gated_faces": len(gated_reasons)
     }
 
     return {"group_stats": group_stats, "faces": person_details}
\ No newline at end of file
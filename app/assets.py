@@ -0,0 +1,206 @@
+# app/assets.py
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import current_app, request, send_file, url_for, abort, Response
+
+# --- Conditionally import optional minifiers/compressors ---
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Logical bundle name -> source files (relative to the static folder), in load order
+BUNDLES = {
+    'base.css': ['style.css', 'css/modal.css', 'css/investigations.css', 'css/flash.css',
+                 'css/live_investigation.css', 'css/reports.css', 'css/analysis_modals.css'],
+    'base.js': ['script.js'],
+    'auth.css': ['style.css'],
+    'dashboard.css': ['css/dashboard.css'],
+    'profile.css': ['css/profile.css'],
+    'live.css': ['style.css', 'css/modal.css', 'css/live_investigation.css'],
+    'live.js': ['script.js', 'js/live_investigation.js'],
+    'reports.js': ['js/reports.js'],
+}
+MANIFEST_NAME = 'manifest.json'
+ASSETS_URL_PATH = '/assets'  # Where main.asset serves bundles
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]  # Preference order for content negotiation
+
+CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+# The whole url(...) or string, so semicolons inside it (e.g. Google Fonts' wght@400;500) do not end the rule
+CSS_IMPORT_RE = re.compile(r'''@import\s+(?:url\([^)]*\)|"[^"]*"|'[^']*')[^;]*;''')
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+
+
+# --- Minification ---
+def minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    # Conservative fallback: comments and whitespace only, never inside selectors' combinators
+    text = CSS_COMMENT_RE.sub('', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    # Without a real tokenizer only trailing whitespace and blank lines are safe to drop
+    lines = (line.rstrip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def _rebase_css_urls(text, source, static_url_path, served_from):
+    """
+    Rewrites relative url(...) references in `source` (a path in the static
+    folder) so they resolve from `served_from`, the URL directory the bundle
+    is served under. The result stays relative, so a mounted prefix still works.
+    """
+    source_dir = posixpath.dirname(source)
+
+    def rebase(match):
+        quote, target = match.group(1), match.group(2).strip()
+        if re.match(r'^([a-z]+:|/|#)', target, re.I):
+            return match.group(0)  # Absolute, data: or fragment URL
+        resolved = posixpath.normpath(posixpath.join(static_url_path, source_dir, target))
+        return f"url({quote}{posixpath.relpath(resolved, served_from)}{quote})"
+
+    return CSS_URL_RE.sub(rebase, text)
+
+
+class AssetPipeline:
+    """
+    Builds per-page bundles (`flask assets build`) into `output_dir` under the
+    static folder: each bundle is concatenated, minified, named by a hash of
+    its content and precompressed to .gz (and .br when brotli is installed).
+    The manifest maps logical names to fingerprinted files; asset_url() uses
+    it, and the /assets/ route serves the best encoding the client accepts
+    with a one-year immutable Cache-Control, so repeat visits make no
+    requests at all.
+
+    Without a build (development), /assets/<bundle> concatenates the sources
+    on the fly and marks the response no-cache.
+    """
+
+    def __init__(self, static_folder, output_dir='dist', bundles=None, static_url_path='/static',
+                 served_from=ASSETS_URL_PATH):
+        self.static_folder = static_folder
+        self.static_url_path = static_url_path
+        self.served_from = served_from  # Built and live bundles are both served by the /assets/ route
+        self.output_dir = output_dir
+        self.output_folder = os.path.join(static_folder, output_dir)
+        self.bundles = bundles or BUNDLES
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.output_folder, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def bundle_source(self, name):
+        """Concatenated (unminified) bundle text."""
+        parts, imports = [], []
+        for source in self.bundles[name]:
+            with open(os.path.join(self.static_folder, source), encoding='utf-8') as f:
+                text = f.read()
+            if name.endswith('.css'):
+                text = _rebase_css_urls(text, source, self.static_url_path, self.served_from)
+                # @import is only valid at the top of a stylesheet
+                imports.extend(m for m in CSS_IMPORT_RE.findall(text) if m not in imports)
+                text = CSS_IMPORT_RE.sub('', text)
+            parts.append(f"/* {source} */\n{text}")
+        if name.endswith('.js'):
+            return ';\n'.join(parts)
+        return '\n'.join(imports + parts)
+
+    def build(self):
+        """Writes every bundle and its compressed variants, then the manifest. Returns the new manifest."""
+        os.makedirs(self.output_folder, exist_ok=True)
+        manifest = {}
+        for name in self.bundles:
+            text = self.bundle_source(name)
+            text = minify_css(text) if name.endswith('.css') else minify_js(text)
+            data = text.encode('utf-8')
+            stem, ext = os.path.splitext(name)
+            filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+            path = os.path.join(self.output_folder, filename)
+            with open(path, 'wb') as f:
+                f.write(data)
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(path + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+            manifest[name] = filename
+
+        # Keep the previous build's files so pages rendered before a deploy still load
+        keep = set(manifest.values()) | set(self.manifest.values())
+        for entry in os.listdir(self.output_folder):
+            base = entry[:-3] if entry.endswith(('.gz', '.br')) else entry
+            if entry != MANIFEST_NAME and base not in keep:
+                os.remove(os.path.join(self.output_folder, entry))
+
+        tmp_path = os.path.join(self.output_folder, MANIFEST_NAME + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, os.path.join(self.output_folder, MANIFEST_NAME))
+        self.manifest = manifest
+        return manifest
+
+    def url(self, name):
+        if name in self.manifest:
+            return url_for('main.asset', filename=self.manifest[name])
+        if name in self.bundles:
+            return url_for('main.asset', filename=name)
+        return url_for('static', filename=name)
+
+    def send(self, filename):
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if filename in self.bundles and filename not in self.manifest:
+            response = Response(self.bundle_source(filename), mimetype=mimetype)
+            response.cache_control.no_cache = True
+            return response
+        if filename not in set(self.manifest.values()):
+            abort(404)
+
+        path = os.path.join(self.output_folder, filename)
+        encoding = None
+        for candidate, suffix in ENCODINGS:
+            if candidate in request.accept_encodings and os.path.exists(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+        response = send_file(path, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE, conditional=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+def get_asset_pipeline():
+    return current_app.extensions['assets']
+
+
+def asset_url(name):
+    """url_for for bundles: the fingerprinted build when there is one, else the live bundle or plain static file."""
+    return get_asset_pipeline().url(name)
+
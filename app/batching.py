@@ -0,0 +1,102 @@
+# app/batching.py
+import queue
+import threading
+import time
+
+
+class _Request:
+    __slots__ = ('items', 'results', 'error', 'done')
+
+    def __init__(self, items):
+        self.items = items
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Dynamic batching in front of a model call.
+
+    Callers on any thread submit() a list of inputs and block. A single worker
+    thread takes the first waiting request, keeps collecting more for up to
+    `max_wait_ms` or until `max_batch_size` inputs are queued, then runs
+    `batch_fn` once over all of them and hands each caller its own slice of
+    the outputs. A larger wait or batch size trades per-request latency for
+    throughput under concurrency; max_wait_ms=0 only merges requests that are
+    already queued.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5, name='batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._carry = None  # Request that did not fit in the previous batch
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_seen = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, items):
+        items = list(items)
+        if not items:
+            return []
+        request = _Request(items)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+                'max_batch_size_seen': self.max_seen,
+            }
+
+    def _collect(self):
+        first = self._carry or self._queue.get()
+        self._carry = None
+        batch, size = [first], len(first.items)
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if size + len(request.items) > self.max_batch_size:
+                # Never split one caller's inputs; it leads the next batch instead.
+                self._carry = request
+                break
+            batch.append(request)
+            size += len(request.items)
+        return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._collect()
+            inputs = [item for request in batch for item in request.items]
+            try:
+                outputs = self.batch_fn(inputs)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+            start = 0
+            for request in batch:
+                end = start + len(request.items)
+                request.results = outputs[start:end]
+                start = end
+                request.done.set()
+            with self._stats_lock:
+                self.batches += 1
+                self.items += size
+                self.max_seen = max(self.max_seen, size)
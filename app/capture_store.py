@@ -0,0 +1,288 @@
+# app/capture_store.py
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import tempfile
+from io import BytesIO
+
+from flask import abort, current_app, send_file
+
+# Capture filenames are 32 hex chars plus an extension. Legacy random names
+# (secrets.token_hex(16)) and content digests share this shape, which keeps
+# them inside the Capture.image_filename column and rejects path tricks.
+FILENAME_RE = re.compile(r'^[0-9a-f]{32}\.[a-z0-9]{1,5}$')
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Pack layout: MAGIC | blob | blob | ... | JSON index | <Q index offset> | MAGIC
+# The index maps filename -> [offset, length]; offsets are also kept on the
+# Capture rows so serving a packed image is a single seek + read.
+PACK_MAGIC = b'IGNPACK1'
+PACK_FOOTER = struct.Struct('<Q8s')
+
+
+class CaptureStore:
+    """
+    Content-addressed storage for capture images.
+
+    Every file is named after a BLAKE2b digest of its bytes and sharded into
+    nested subdirectories (``ab/cd/abcd....jpg``), so no directory grows past
+    a few hundred entries and identical frames are only written once.
+    Files from the old flat layout are still found until they are migrated.
+    Completed investigations can be folded into a single pack file under
+    `pack_root` and served from there by byte offset.
+    """
+
+    def __init__(self, root, shard_levels=2, shard_width=2, pack_root=None):
+        self.root = root
+        self.shard_levels = shard_levels
+        self.shard_width = shard_width
+        self.pack_root = pack_root or os.path.join(root, 'packs')
+        os.makedirs(self.root, exist_ok=True)
+        os.makedirs(self.pack_root, exist_ok=True)
+
+    # --- Naming ---
+    @staticmethod
+    def digest_bytes(data):
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    @staticmethod
+    def digest_file(path):
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    @staticmethod
+    def is_valid_filename(filename):
+        return bool(filename) and FILENAME_RE.match(filename) is not None
+
+    def shard_dir(self, filename):
+        parts = [filename[i * self.shard_width:(i + 1) * self.shard_width]
+                 for i in range(self.shard_levels)]
+        return os.path.join(self.root, *parts)
+
+    def shard_path(self, filename):
+        return os.path.join(self.shard_dir(filename), filename)
+
+    def legacy_path(self, filename):
+        return os.path.join(self.root, filename)
+
+    def resolve(self, filename):
+        """Returns the on-disk path of a stored capture, or None if it is missing."""
+        if not self.is_valid_filename(filename):
+            return None
+        path = self.shard_path(filename)
+        if os.path.isfile(path):
+            return path
+        path = self.legacy_path(filename)
+        if os.path.isfile(path):
+            return path
+        return None
+
+    # --- Read / Write ---
+    def save(self, data, ext='.jpg'):
+        """
+        Stores `data` under its content hash.
+        Returns (filename, created) where `created` is False for a duplicate.
+        """
+        filename = f"{self.digest_bytes(data)}{ext.lower()}"
+        path = self.shard_path(filename)
+        if os.path.exists(path):
+            # Refresh mtime so the orphan collector's grace period covers the
+            # window before the new referencing row is committed.
+            os.utime(path)
+            return filename, False
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial image.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return filename, True
+
+    def read(self, filename):
+        path = self.resolve(filename)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def delete(self, filename):
+        """Removes a stored capture. Returns True if a file was deleted."""
+        path = self.resolve(filename)
+        if path is None:
+            return False
+        os.remove(path)
+        self.prune_empty_dirs(path)
+        return True
+
+    def prune_empty_dirs(self, path):
+        """Removes shard directories left empty after `path` was deleted."""
+        directory = os.path.dirname(path)
+        for _ in range(self.shard_levels):
+            if os.path.normpath(directory) == os.path.normpath(self.root):
+                return
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
+
+    def send(self, filename, max_age=31536000):
+        """
+        Serves a capture with send_file, which honours Range/If-None-Match and
+        hands the open file to the server's sendfile wrapper when available.
+        """
+        path = self.resolve(filename)
+        if path is None:
+            abort(404)
+        response = send_file(path, mimetype='image/jpeg', conditional=True,
+                             etag=filename.split('.', 1)[0], max_age=max_age)
+        # Content never changes for a given name, so browsers can skip revalidation.
+        response.cache_control.immutable = True
+        return response
+
+    def iter_loose_files(self):
+        """Yields (filename, path, mtime) for every loose capture, sharded or flat."""
+        def walk(directory, depth):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if depth < self.shard_levels and len(entry.name) == self.shard_width:
+                            yield from walk(entry.path, depth + 1)
+                    elif self.is_valid_filename(entry.name):
+                        yield entry.name, entry.path, entry.stat().st_mtime
+        yield from walk(self.root, 0)
+
+    # --- Archive Packs ---
+    def pack_path(self, pack_filename):
+        return os.path.join(self.pack_root, os.path.basename(pack_filename))
+
+    def write_pack(self, pack_filename, filenames):
+        """
+        Concatenates the given loose captures into one pack file.
+        Returns ({filename: (offset, length)}, pack_size); missing files are skipped.
+        """
+        path = self.pack_path(pack_filename)
+        index = {}
+        fd, tmp_path = tempfile.mkstemp(dir=self.pack_root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(PACK_MAGIC)
+                for filename in filenames:
+                    src = self.resolve(filename)
+                    if src is None or filename in index:
+                        continue
+                    offset = out.tell()
+                    with open(src, 'rb') as f:
+                        shutil.copyfileobj(f, out, HASH_CHUNK_SIZE)
+                    index[filename] = (offset, out.tell() - offset)
+                index_offset = out.tell()
+                out.write(json.dumps(index, separators=(',', ':')).encode('utf-8'))
+                out.write(PACK_FOOTER.pack(index_offset, PACK_MAGIC))
+                out.flush()
+                os.fsync(out.fileno())
+                size = out.tell()
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return index, size
+
+    def read_pack_index(self, pack_filename):
+        """Reads the index embedded at the end of a pack file."""
+        with open(self.pack_path(pack_filename), 'rb') as f:
+            f.seek(-PACK_FOOTER.size, os.SEEK_END)
+            footer_pos = f.tell()
+            index_offset, magic = PACK_FOOTER.unpack(f.read(PACK_FOOTER.size))
+            if magic != PACK_MAGIC:
+                raise ValueError(f"{pack_filename} is not a capture pack")
+            f.seek(index_offset)
+            return json.loads(f.read(footer_pos - index_offset))
+
+    def read_packed(self, pack_filename, offset, length):
+        with open(self.pack_path(pack_filename), 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def send_packed(self, pack_filename, offset, length, filename, max_age=31536000):
+        """Serves one image straight out of a pack without unpacking the archive."""
+        try:
+            data = self.read_packed(pack_filename, offset, length)
+        except OSError:
+            abort(404)
+        response = send_file(BytesIO(data), mimetype='image/jpeg', conditional=True,
+                             etag=filename.split('.', 1)[0], max_age=max_age,
+                             download_name=filename)
+        response.cache_control.immutable = True
+        return response
+
+    def iter_pack_files(self):
+        with os.scandir(self.pack_root) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.pack'):
+                    yield entry.name, entry.path, entry.stat().st_mtime
+
+    # --- Layout Migration ---
+    def iter_flat_files(self):
+        """Yields filenames still sitting in the old flat directory."""
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file() and self.is_valid_filename(entry.name):
+                    yield entry.name
+
+    def link_flat_file(self, filename, dry_run=False):
+        """
+        Places a copy of a flat-layout file at its content-addressed location.
+        The flat file is left in place (see remove_flat_file) so rows can be
+        repointed and committed before the old name disappears.
+        Returns (new_filename, duplicate) where `duplicate` means the content
+        was already stored.
+        """
+        src = self.legacy_path(filename)
+        ext = os.path.splitext(filename)[1].lower()
+        new_filename = f"{self.digest_file(src)}{ext}"
+        dest = self.shard_path(new_filename)
+        duplicate = os.path.exists(dest)
+        if dry_run or duplicate:
+            return new_filename, duplicate
+
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copy2(src, dest)
+        return new_filename, duplicate
+
+    def remove_flat_file(self, filename):
+        path = self.legacy_path(filename)
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def get_capture_store():
+    return current_app.extensions['capture_store']
+
+
+def read_capture_bytes(capture, store=None):
+    """Returns the image bytes for a Capture row, loose or packed, or None if missing."""
+    store = store or get_capture_store()
+    data = store.read(capture.image_filename)
+    if data is None and capture.pack_id is not None:
+        try:
+            data = store.read_packed(capture.pack.filename, capture.pack_offset, capture.pack_length)
+        except OSError:
+            return None
+    return data
@@ -0,0 +1,302 @@
+# app/commands.py
+import os
+import sys
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .models import db, Capture, Investigation
+from .capture_store import get_capture_store, read_capture_bytes
+from .near_duplicates import dhash, to_signed
+from . import maintenance
+from .maintenance import delete_investigations, get_file_cleaner
+from .exports import EXPORT_FORMATS, write_export
+from . import analysis_utils
+from .inference import InferenceServer, InferenceClient, InferenceUnavailable
+from .assets import get_asset_pipeline, brotli
+from .serving import process_memory
+from .search import rebuild_search_index
+from .geo import apply_exif
+
+captures_cli = AppGroup('captures', help='Capture storage maintenance commands.')
+investigations_cli = AppGroup('investigations', help='Investigation data commands.')
+inference_cli = AppGroup('inference', help='Shared model server commands.')
+assets_cli = AppGroup('assets', help='Static asset build commands.')
+
+
+@captures_cli.command('migrate-layout')
+@click.option('--dry-run', is_flag=True, help='Report what would move without touching files or rows.')
+@click.option('--batch-size', default=500, show_default=True, help='Files migrated per database commit.')
+def migrate_layout(dry_run, batch_size):
+    """Moves flat static/captures files into the sharded content-addressed layout."""
+    store = get_capture_store()
+    moved = duplicates = rows = 0
+    pending = []
+
+    def flush():
+        # Rows must point at the new names before the flat copies go away.
+        db.session.commit()
+        for name in pending:
+            store.remove_flat_file(name)
+        pending.clear()
+
+    # Collect names first so the directory is not mutated while scandir walks it.
+    for i, filename in enumerate(list(store.iter_flat_files()), start=1):
+        new_filename, duplicate = store.link_flat_file(filename, dry_run=dry_run)
+        if duplicate:
+            duplicates += 1
+        else:
+            moved += 1
+
+        query = Capture.query.filter_by(image_filename=filename)
+        if dry_run:
+            rows += query.count()
+            continue
+        rows += query.update({Capture.image_filename: new_filename}, synchronize_session=False)
+        pending.append(filename)
+
+        if i % batch_size == 0:
+            flush()
+            click.echo(f"[INFO] {i} files processed...")
+
+    if not dry_run:
+        flush()
+    prefix = "[DRY RUN] " if dry_run else ""
+    click.echo(f"{prefix}Moved {moved} files, dropped {duplicates} duplicates, updated {rows} capture rows.")
+
+
+@captures_cli.command('hash')
+@click.option('--batch-size', default=500, show_default=True, help='Captures hashed per database commit.')
+def hash_captures(batch_size):
+    """Computes perceptual hashes for captures saved before near-duplicate detection."""
+    store = get_capture_store()
+    hashed = unreadable = 0
+    last_id = 0
+    while True:
+        batch = (Capture.query.filter(Capture.phash.is_(None), Capture.id > last_id)
+                 .order_by(Capture.id).limit(batch_size).all())
+        if not batch:
+            break
+        for capture in batch:
+            last_id = capture.id
+            data = read_capture_bytes(capture, store=store)
+            value = dhash(data) if data is not None else None
+            if value is None:
+                unreadable += 1
+                continue
+            capture.phash = to_signed(value)
+            hashed += 1
+        db.session.commit()
+        click.echo(f"[INFO] {hashed} captures hashed...")
+    click.echo(f"Hashed {hashed} captures, skipped {unreadable} unreadable.")
+
+
+@captures_cli.command('exif')
+@click.option('--batch-size', default=500, show_default=True, help='Captures read per database commit.')
+def extract_exif(batch_size):
+    """Fills GPS, altitude and capture time from EXIF for captures saved before ingest parsed it."""
+    store = get_capture_store()
+    located = timed = unreadable = 0
+    last_id = 0
+    while True:
+        batch = (Capture.query.filter(Capture.taken_at.is_(None), Capture.id > last_id)
+                 .order_by(Capture.id).limit(batch_size).all())
+        if not batch:
+            break
+        for capture in batch:
+            last_id = capture.id
+            data = read_capture_bytes(capture, store=store)
+            if data is None:
+                unreadable += 1
+                capture.taken_at = capture.timestamp
+                continue
+            meta = apply_exif(capture, data)
+            located += meta['latitude'] is not None
+            timed += meta['taken_at'] is not None
+        db.session.commit()
+        click.echo(f"[INFO] {last_id} captures checked...")
+    click.echo(f"Found GPS in {located} and a capture time in {timed} captures; {unreadable} unreadable.")
+
+
+def _echo_stats(label, stats, dry_run):
+    prefix = "[DRY RUN] " if dry_run else ""
+    details = ', '.join(f"{key}={value}" for key, value in stats.items())
+    click.echo(f"{prefix}{label}: {details}")
+
+
+@captures_cli.command('gc')
+@click.option('--dry-run', is_flag=True, help='Report orphans without deleting them.')
+@click.option('--grace-seconds', type=int, default=None, help='Override CAPTURE_GC_GRACE_SECONDS.')
+def gc(dry_run, grace_seconds):
+    """Deletes capture and pack files that no Capture row references."""
+    _echo_stats('Orphan GC', maintenance.collect_orphans(dry_run=dry_run, grace_seconds=grace_seconds), dry_run)
+
+
+@captures_cli.command('retention')
+@click.option('--dry-run', is_flag=True, help='Count expired captures without deleting them.')
+def retention(dry_run):
+    """Deletes captures that fall outside the configured retention policy."""
+    _echo_stats('Retention', maintenance.apply_retention(dry_run=dry_run), dry_run)
+
+
+@captures_cli.command('pack')
+@click.option('--investigation-id', type=int, default=None, help='Pack one investigation regardless of status.')
+@click.option('--dry-run', is_flag=True, help='List what would be packed.')
+def pack(investigation_id, dry_run):
+    """Packs completed investigations' loose captures into indexed archive files."""
+    if investigation_id is not None:
+        result = maintenance.pack_investigation(investigation_id, dry_run=dry_run)
+        results = [result] if result else []
+    else:
+        results = maintenance.pack_completed_investigations(dry_run=dry_run)
+    for result in results:
+        _echo_stats(f"Investigation {result['investigation_id']}", result, dry_run)
+    if not results:
+        click.echo("Nothing to pack.")
+
+
+@captures_cli.command('maintain')
+@click.option('--dry-run', is_flag=True, help='Run every step without changing anything.')
+def maintain(dry_run):
+    """Runs retention, packing and orphan GC in order (suitable for cron)."""
+    _echo_stats('Retention', maintenance.apply_retention(dry_run=dry_run), dry_run)
+    packed = maintenance.pack_completed_investigations(dry_run=dry_run)
+    click.echo(f"Packed {len(packed)} investigations.")
+    _echo_stats('Orphan GC', maintenance.collect_orphans(dry_run=dry_run), dry_run)
+
+
+@investigations_cli.command('export')
+@click.argument('investigation_id', type=int)
+@click.option('--format', 'fmt', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='Destination file (defaults to stdout).')
+def export(investigation_id, fmt, output):
+    """Streams an investigation's captures to CSV, JSON Lines or ZIP."""
+    inv = db.session.get(Investigation, investigation_id)
+    if inv is None:
+        raise click.ClickException(f"Investigation {investigation_id} not found.")
+    if output is None:
+        write_export(inv, fmt, sys.stdout.buffer)
+        return
+    with open(output, 'wb') as out:
+        total = write_export(inv, fmt, out)
+    click.echo(f"Wrote {total} bytes to {output}.", err=True)
+
+
+@investigations_cli.command('delete')
+@click.argument('investigation_ids', type=int, nargs=-1, required=True)
+def delete(investigation_ids):
+    """Deletes investigations with all their rows, then waits for their files to be removed."""
+    found = [inv_id for (inv_id,) in db.session.query(Investigation.id).filter(Investigation.id.in_(investigation_ids))]
+    queued = delete_investigations(found)
+    click.echo(f"Deleted {len(found)} investigations; removing up to {queued} files...")
+    cleaner = get_file_cleaner()
+    cleaner.join()
+    click.echo(f"Removed {cleaner.stats['files_removed']} files ({_mb(cleaner.stats['bytes_freed'])}), "
+               f"kept {cleaner.stats['files_kept']} still shared with other captures.")
+
+
+@investigations_cli.command('reindex')
+def reindex():
+    """Creates the full-text search index if missing and rebuilds it from the investigation table."""
+    with db.engine.begin() as connection:
+        backend = rebuild_search_index(connection)
+    count = db.session.query(Investigation).count()
+    if backend == 'like':
+        click.echo(f"No full-text index for {db.engine.dialect.name}; search scans {count} investigations.")
+    else:
+        click.echo(f"Indexed {count} investigations ({backend}).")
+
+
+def _mb(num_bytes):
+    return f"{num_bytes / 2**20:.1f} MB" if num_bytes is not None else "n/a"
+
+
+def _socket_path(socket_path):
+    socket_path = socket_path or current_app.config['INFERENCE_SOCKET']
+    if not socket_path:
+        raise click.ClickException("Pass --socket or set INFERENCE_SOCKET (e.g. FLASK_INFERENCE_SOCKET).")
+    return socket_path
+
+
+@inference_cli.command('serve')
+@click.option('--socket', 'socket_path', default=None, help='Unix socket path (defaults to INFERENCE_SOCKET).')
+def serve(socket_path):
+    """Loads the models once and serves analysis requests to all web workers."""
+    socket_path = _socket_path(socket_path)
+    analysis_utils.initialize_models()
+    if analysis_utils.face_app is None:
+        raise click.ClickException("Analysis models could not be loaded.")
+    server = InferenceServer(socket_path)
+    click.echo(f"[INFO] Inference server listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@inference_cli.command('status')
+@click.option('--socket', 'socket_path', default=None, help='Unix socket path (defaults to INFERENCE_SOCKET).')
+def status(socket_path):
+    """Pings the inference server."""
+    client = InferenceClient(_socket_path(socket_path), timeout=5)
+    try:
+        info = client.ping()
+    except (InferenceUnavailable, OSError) as e:
+        raise click.ClickException(f"Inference server unavailable: {e}")
+    click.echo(f"models_loaded={info['models_loaded']}, requests_served={info['requests_served']}, "
+               f"face_modules={','.join(info['face_modules']) or '-'}")
+    gating = info['gating']
+    click.echo(f"faces={gating['faces']}, emotion inferences skipped={gating['gated']} "
+               f"(too_small={gating['too_small']}, blurred={gating['blurred']}, "
+               f"low_confidence={gating['low_confidence']})")
+    memory = info['memory']
+    click.echo(f"precision={memory['precision']}, emotion weights={_mb(memory['emotion_model_bytes'])}, "
+               f"rss={_mb(memory['rss_bytes'])}, loads={memory['loads']}, unloads={memory['unloads']}, "
+               f"last load={memory['last_load_seconds'] or 0:.2f}s, idle={memory['idle_seconds']}s "
+               f"(unload after {memory['idle_unload_seconds'] or 'never'})")
+
+
+@inference_cli.command('memory')
+@click.option('--cycles', default=3, show_default=True, help='Unload/reload cycles to time.')
+def memory(cycles):
+    """Measures resident model memory and cold-reload latency in this process (MODEL_PRECISION applies)."""
+    if not analysis_utils.MODELS_LOADED:
+        raise click.ClickException("Analysis libraries are not installed.")
+    analysis_utils.unload_models()
+    empty_rss = process_memory().get('rss')
+    for cycle in range(1, cycles + 1):
+        analysis_utils.initialize_models()
+        stats = analysis_utils.memory_stats()
+        loaded_rss = stats['rss_bytes']
+        analysis_utils.unload_models()
+        unloaded_rss = process_memory().get('rss')
+        click.echo(f"cycle {cycle}: load {stats['last_load_seconds']:.2f}s, "
+                   f"emotion weights {_mb(stats['emotion_model_bytes'])} ({stats['precision']}), "
+                   f"rss {_mb(empty_rss)} -> {_mb(loaded_rss)} loaded -> {_mb(unloaded_rss)} unloaded")
+
+
+@assets_cli.command('build')
+def build_assets():
+    """Bundles, minifies, fingerprints and precompresses the CSS/JS bundles into static/dist."""
+    pipeline = get_asset_pipeline()
+    manifest = pipeline.build()
+    for name, filename in sorted(manifest.items()):
+        path = os.path.join(pipeline.output_folder, filename)
+        sizes = [f"{os.path.getsize(path)} B"]
+        for suffix in ('.gz', '.br'):
+            if os.path.exists(path + suffix):
+                sizes.append(f"{suffix[1:]} {os.path.getsize(path + suffix)} B")
+        click.echo(f"{name:<16} -> {filename}  ({', '.join(sizes)})")
+    if brotli is None:
+        click.echo("[INFO] brotli not installed; only gzip variants were written.")
+
+
+def register_commands(app):
+    app.cli.add_command(captures_cli)
+    app.cli.add_command(investigations_cli)
+    app.cli.add_command(inference_cli)
+    app.cli.add_command(assets_cli)
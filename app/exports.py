@@ -0,0 +1,255 @@
+# app/exports.py
+import csv
+import io
+import json
+import struct
+import tempfile
+import zipfile
+import zlib
+from datetime import datetime
+
+from flask import Response, stream_with_context
+
+from .models import db, Capture, CapturePack, FaceResult, Report, IST
+from .capture_store import get_capture_store
+
+YIELD_PER = 1000
+CHUNK_SIZE = 64 * 1024
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'zip': 'application/zip',
+}
+CAPTURE_FIELDS = ['capture_id', 'investigation_id', 'image_filename', 'timestamp', 'packed', 'duplicate_of',
+                  'taken_at', 'latitude', 'longitude', 'altitude']
+FACE_FIELDS = ['capture_id', 'face_index', 'timestamp', 'gender', 'age', 'emotion', 'fear', 'panic_score',
+               'det_score', 'gated']
+
+
+# --- Row Sources ---
+def iter_capture_rows(investigation_id):
+    """Yields one flat dict per capture, streaming from the DB in YIELD_PER batches."""
+    stmt = db.select(
+        Capture.id, Capture.investigation_id, Capture.image_filename, Capture.timestamp, Capture.pack_id,
+        Capture.duplicate_of_id, Capture.taken_at, Capture.latitude, Capture.longitude, Capture.altitude
+    ).where(Capture.investigation_id == investigation_id).order_by(Capture.id)
+    for row in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        yield {
+            'capture_id': row.id,
+            'investigation_id': row.investigation_id,
+            'image_filename': row.image_filename,
+            'timestamp': row.timestamp.isoformat(),
+            'packed': row.pack_id is not None,
+            'duplicate_of': row.duplicate_of_id,
+            'taken_at': row.taken_at.isoformat() if row.taken_at else None,
+            'latitude': row.latitude,
+            'longitude': row.longitude,
+            'altitude': row.altitude,
+        }
+
+
+def iter_face_rows(investigation_id):
+    """Yields one flat dict per analyzed face (see face_results.py)."""
+    stmt = db.select(*[getattr(FaceResult, field) for field in FACE_FIELDS]).where(
+        FaceResult.investigation_id == investigation_id
+    ).order_by(FaceResult.id)
+    for row in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        face = row._asdict()
+        face['timestamp'] = face['timestamp'].isoformat()
+        yield face
+
+
+# --- Generators ---
+def generate_csv(investigation_id, fieldnames=CAPTURE_FIELDS, rows=iter_capture_rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    for i, row in enumerate(rows(investigation_id), start=1):
+        writer.writerow(row)
+        if i % YIELD_PER == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generate_jsonl(investigation_id):
+    chunk = []
+    for row in iter_capture_rows(investigation_id):
+        chunk.append(json.dumps(row, separators=(',', ':')))
+        if len(chunk) == YIELD_PER:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+class StreamingZip:
+    """
+    Minimal write-only ZIP writer (stored entries, ZIP64 when needed).
+
+    zipfile.ZipFile keeps a ZipInfo object per entry until close, which costs
+    ~1 KB per capture. Here each central-directory record is packed to bytes
+    and spooled to a temp file instead, so memory stays flat for any entry count.
+    Every method returns the bytes to send next.
+    """
+    LOCAL = struct.Struct('<IHHHHHIIIHH')
+    CENTRAL = struct.Struct('<IHHHHHHIIIHHHHHII')
+    ZIP64_END = struct.Struct('<IQHHIIQQQQ')
+    ZIP64_LOCATOR = struct.Struct('<IIQI')
+    END = struct.Struct('<IHHHHIIH')
+    VERSION = 45      # 4.5: ZIP64
+    UTF8_FLAG = 0x800
+    MAX32 = 0xFFFFFFFF
+    MAX16 = 0xFFFF
+
+    def __init__(self):
+        self.offset = 0
+        self.count = 0
+        self.central = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+
+    @staticmethod
+    def _dos_datetime(dt):
+        dt = dt or datetime.now(IST)
+        year = min(max(dt.year, 1980), 2107)
+        dos_date = (year - 1980) << 9 | dt.month << 5 | dt.day
+        dos_time = dt.hour << 11 | dt.minute << 5 | dt.second // 2
+        return dos_time, dos_date
+
+    def _entry(self, name, crc, size, dt):
+        encoded = name.encode('utf-8')
+        dos_time, dos_date = self._dos_datetime(dt)
+        header = self.LOCAL.pack(0x04034b50, self.VERSION, self.UTF8_FLAG, zipfile.ZIP_STORED,
+                                 dos_time, dos_date, crc, size, size, len(encoded), 0) + encoded
+
+        extra = b''
+        offset_field = self.offset
+        if self.offset >= self.MAX32:
+            extra = struct.pack('<HHQ', 0x0001, 8, self.offset)
+            offset_field = self.MAX32
+        self.central.write(self.CENTRAL.pack(
+            0x02014b50, self.VERSION, self.VERSION, self.UTF8_FLAG, zipfile.ZIP_STORED,
+            dos_time, dos_date, crc, size, size, len(encoded), len(extra), 0, 0, 0, 0, offset_field
+        ) + encoded + extra)
+
+        self.offset += len(header) + size
+        self.count += 1
+        return header
+
+    def add(self, name, data, dt=None):
+        """Returns the local header and data for an in-memory entry."""
+        return self._entry(name, zlib.crc32(data), len(data), dt) + data
+
+    def add_file(self, name, fileobj, size, crc, dt=None):
+        """Yields the local header and then the contents of an already-written file."""
+        yield self._entry(name, crc, size, dt)
+        fileobj.seek(0)
+        for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+            yield chunk
+
+    def close(self):
+        """Yields the central directory and end records."""
+        cd_offset = self.offset
+        cd_size = self.central.tell()
+        self.central.seek(0)
+        for chunk in iter(lambda: self.central.read(CHUNK_SIZE), b''):
+            yield chunk
+        self.central.close()
+
+        tail = b''
+        if self.count >= self.MAX16 or cd_offset >= self.MAX32 or cd_size >= self.MAX32:
+            zip64_offset = cd_offset + cd_size
+            tail += self.ZIP64_END.pack(0x06064b50, 44, self.VERSION, self.VERSION, 0, 0,
+                                        self.count, self.count, cd_size, cd_offset)
+            tail += self.ZIP64_LOCATOR.pack(0x07064b50, 0, zip64_offset, 1)
+        tail += self.END.pack(0x06054b50, 0, 0, min(self.count, self.MAX16), min(self.count, self.MAX16),
+                              min(cd_size, self.MAX32), min(cd_offset, self.MAX32), 0)
+        yield tail
+
+
+def _read_row_bytes(store, row):
+    data = store.read(row.image_filename)
+    if data is None and row.pack_filename is not None:
+        try:
+            data = store.read_packed(row.pack_filename, row.pack_offset, row.pack_length)
+        except OSError:
+            return None
+    return data
+
+
+def generate_zip(investigation_id):
+    """
+    Streams a ZIP of every capture image plus a captures.csv manifest and the
+    per-face analysis results (faces.csv). Images are stored uncompressed
+    (JPEG is already compressed) and only one is held in memory at a time.
+    """
+    store = get_capture_store()
+    archive = StreamingZip()
+    stmt = db.select(
+        Capture.id, Capture.image_filename, Capture.timestamp,
+        Capture.pack_offset, Capture.pack_length, CapturePack.filename.label('pack_filename')
+    ).outerjoin(CapturePack, Capture.pack_id == CapturePack.id).where(
+        Capture.investigation_id == investigation_id
+    ).order_by(Capture.id)
+    for row in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        data = _read_row_bytes(store, row)
+        if data is not None:
+            yield archive.add(f"captures/{row.id:07d}_{row.image_filename}", data, row.timestamp)
+
+    # The CSVs are spooled first because stored entries need their CRC up front
+    for name, chunks in (('captures.csv', generate_csv(investigation_id)),
+                         ('faces.csv', generate_csv(investigation_id, FACE_FIELDS, iter_face_rows))):
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+            crc = 0
+            for chunk in chunks:
+                chunk = chunk.encode('utf-8')
+                crc = zlib.crc32(chunk, crc)
+                spool.write(chunk)
+            yield from archive.add_file(name, spool, spool.tell(), crc)
+    yield from archive.close()
+
+
+GENERATORS = {
+    'csv': generate_csv,
+    'jsonl': generate_jsonl,
+    'zip': generate_zip,
+}
+
+
+# --- Entry Points ---
+def record_report(investigation, fmt):
+    """Creates the Report row for an export so it shows up on the dashboard."""
+    report = Report(
+        title=f"{investigation.title} captures ({fmt.upper()})"[:100],
+        file_type=fmt,
+        user_id=investigation.user_id
+    )
+    db.session.add(report)
+    db.session.commit()
+    return report
+
+
+def export_filename(investigation, fmt):
+    return f"investigation-{investigation.id}-captures.{fmt}"
+
+
+def stream_export(investigation, fmt):
+    """Returns a streamed download response for an investigation export."""
+    record_report(investigation, fmt)
+    return Response(
+        stream_with_context(GENERATORS[fmt](investigation.id)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(investigation, fmt)}"'}
+    )
+
+
+def write_export(investigation, fmt, out):
+    """Writes an export to a binary file object (used by the CLI)."""
+    record_report(investigation, fmt)
+    total = 0
+    for chunk in GENERATORS[fmt](investigation.id):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        out.write(chunk)
+        total += len(chunk)
+    return total
@@ -0,0 +1,139 @@
+# app/face_results.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func
+
+from .models import db, IST, FaceResult
+
+# Same bands as get_vulnerability_from_age in analysis_utils
+AGE_BANDS = {'child': (0, 11), 'teen': (12, 17), 'adult': (18, 64), 'senior': (65, None)}
+GENDERS = {'Male': 'M', 'Female': 'F'}
+
+
+def _percent(value):
+    """Analysis results carry ratios as display strings ("42.00%"); returns 0.42, or None for "N/A"."""
+    try:
+        return round(float(str(value).rstrip('%')) / 100, 6)
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# --- Writes ---
+def face_rows(capture, analysis_results):
+    rows = []
+    for index, face in enumerate(analysis_results.get('faces', [])):
+        rows.append({
+            'investigation_id': capture.investigation_id,
+            'capture_id': capture.id,
+            'timestamp': capture.timestamp,
+            'face_index': face.get('id', index),
+            'gender': GENDERS.get(face.get('gender')),
+            'age': face.get('age'),
+            'emotion': None if face.get('gated') else face.get('emotion_label'),
+            'fear': _percent(face.get('fear_score')),
+            'panic_score': _number(face.get('panic_score')),
+            'det_score': _percent(face.get('confidence')),
+            'gated': face.get('gated'),
+        })
+    return rows
+
+
+def record_face_results(capture, analysis_results):
+    """
+    Replaces the capture's face rows (re-analysis does not double count) with
+    one executemany INSERT and commits. Returns the number of faces stored;
+    never breaks the caller's request.
+    """
+    rows = face_rows(capture, analysis_results)
+    try:
+        FaceResult.query.filter_by(capture_id=capture.id).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(db.insert(FaceResult), rows)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[WARN] Could not store face results for capture {capture.id}: {e}")
+        return 0
+    return len(rows)
+
+
+# --- Queries ---
+def since_minutes(minutes):
+    return datetime.now(IST) - timedelta(minutes=minutes) if minutes else None
+
+
+def _scoped(query, investigation_id, since):
+    query = query.filter(FaceResult.investigation_id == investigation_id)
+    if since is not None:
+        query = query.filter(FaceResult.timestamp >= since)
+    return query
+
+
+def filter_faces(investigation_id, since=None, age_band=None, gender=None, emotion=None, min_fear=None):
+    """
+    Faces of an investigation matching every given filter, newest first; e.g.
+    children with fear > 0.6 in the last hour is
+    filter_faces(inv_id, since=since_minutes(60), age_band='child', min_fear=0.6).
+    """
+    query = _scoped(FaceResult.query, investigation_id, since)
+    if age_band is not None:
+        low, high = AGE_BANDS[age_band]
+        query = query.filter(FaceResult.age >= low)
+        if high is not None:
+            query = query.filter(FaceResult.age <= high)
+    if gender is not None:
+        query = query.filter(FaceResult.gender == gender)
+    if emotion is not None:
+        query = query.filter(FaceResult.emotion == emotion)
+    if min_fear is not None:
+        query = query.filter(FaceResult.fear > min_fear)
+    return query.order_by(FaceResult.timestamp.desc(), FaceResult.id.desc())
+
+
+def emotion_histogram(investigation_id, since=None):
+    """{emotion: faces}; gated faces have no emotion and are left out."""
+    rows = _scoped(db.session.query(FaceResult.emotion, func.count(FaceResult.id)), investigation_id, since)
+    rows = rows.filter(FaceResult.emotion.isnot(None)).group_by(FaceResult.emotion)
+    return {emotion: count for emotion, count in rows}
+
+
+def demographics(investigation_id, since=None):
+    """Face count, mean fear and peak panic score per age band and gender, in one GROUP BY."""
+    band = case(
+        (FaceResult.age.is_(None), 'unknown'),
+        *[(FaceResult.age <= high, name) for name, (_, high) in AGE_BANDS.items() if high is not None],
+        else_='senior',
+    ).label('age_band')
+    rows = _scoped(db.session.query(band, FaceResult.gender, func.count(FaceResult.id),
+                                    func.avg(FaceResult.fear), func.max(FaceResult.panic_score)),
+                   investigation_id, since).group_by(band, FaceResult.gender)
+    return [{
+        'age_band': age_band,
+        'gender': gender,
+        'faces': count,
+        'mean_fear': round(mean_fear, 4) if mean_fear is not None else None,
+        'max_panic_score': max_panic,
+    } for age_band, gender, count, mean_fear, max_panic in rows]
+
+
+def face_to_dict(face):
+    return {
+        'id': face.id,
+        'capture_id': face.capture_id,
+        'timestamp': face.timestamp.isoformat(),
+        'face_index': face.face_index,
+        'gender': face.gender,
+        'age': face.age,
+        'emotion': face.emotion,
+        'fear': face.fear,
+        'panic_score': face.panic_score,
+        'det_score': face.det_score,
+        'gated': face.gated,
+    }
@@ -1,9 +1,10 @@
 # forms.py
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
-from wtforms.validators import DataRequired, Email, EqualTo, ValidationError, Length
+from wtforms.validators import DataRequired, Email, EqualTo, ValidationError, Length, Optional
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, TextAreaField, SelectField
 from app.models import User
+from app.speaker_relay import parse_endpoints, get_speaker_relay, EndpointNotAllowed, ENDPOINT_SPLIT_RE
 from flask_login import current_user
 
 class SignUpForm(FlaskForm):
@@ -86,4 +87,16 @@ class EditInvestigationForm(FlaskForm):
     location = StringField('Location (e.g., City, State)', validators=[DataRequired(), Length(max=150)])
     drone_photo = FileField('Update Drone Photo', validators=[FileAllowed(['jpg', 'png', 'jpeg'])])
     description = TextAreaField('Brief Description / Objectives', validators=[DataRequired(), Length(max=500)])
-    submit = SubmitField('Save Changes')
\ No newline at end of file
+    speaker_endpoints = TextAreaField('Drone Speaker URLs (one per line)', validators=[Optional(), Length(max=2000)])
+    submit = SubmitField('Save Changes')
+
+    def validate_speaker_endpoints(self, speaker_endpoints):
+        invalid = [entry for entry in ENDPOINT_SPLIT_RE.split(speaker_endpoints.data or '')
+                   if entry and not parse_endpoints([entry])]
+        if invalid:
+            raise ValidationError('Each drone speaker URL must start with http:// or https://.')
+        for endpoint in parse_endpoints(speaker_endpoints.data):
+            try:
+                get_speaker_relay().check_endpoint(endpoint)
+            except EndpointNotAllowed as e:
+                raise ValidationError(str(e))
\ No newline at end of file
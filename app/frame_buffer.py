@@ -0,0 +1,175 @@
+# app/frame_buffer.py
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import current_app
+
+
+class FrameBuffersFull(Exception):
+    """Every ring still holds live frames; retry once the stalest one goes idle."""
+
+    def __init__(self, retry_after):
+        super().__init__("every frame buffer is in use by a live stream")
+        self.retry_after = retry_after
+
+
+class FrameRing:
+    """
+    The last `seconds` of one investigation's JPEG frames, packed back to
+    back into a single preallocated slab. Writing wraps around and drops the
+    oldest frames it overwrites, so memory never grows past `max_bytes`
+    however fast frames arrive; frames older than `seconds` are dropped too.
+    Once retired the ring refuses writes, so its slab can be handed on.
+    """
+
+    def __init__(self, slab, seconds=10.0):
+        self._buf = slab
+        self.seconds = seconds
+        self._frames = deque()  # (seq, timestamp, offset, length), oldest first
+        self._head = 0  # Next write offset
+        self._seq = 0
+        self._retired = False
+        self.last_push = time.time()  # A new ring counts as live until it has had time to fill
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        return len(self._buf)
+
+    def retire(self):
+        """Drops the frames and refuses further writes; returns the slab for reuse."""
+        with self._lock:  # Waits out a push already writing into the slab
+            self._retired = True
+            self._frames.clear()
+            self._head = 0
+            return self._buf
+
+    def _expire(self, now):
+        cutoff = now - self.seconds
+        while self._frames and self._frames[0][1] < cutoff:
+            self._frames.popleft()
+
+    def push(self, data, timestamp=None):
+        """Appends one frame; returns its sequence number, or None if the ring has been retired."""
+        size = len(data)
+        if size > len(self._buf):
+            raise ValueError(f"Frame of {size} bytes exceeds the {len(self._buf)}-byte buffer")
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            if self._retired:
+                return None
+            start = self._head
+            if start + size > len(self._buf):
+                # Wrap: frames between the old head and the end are the oldest left
+                while self._frames and self._frames[0][2] >= start:
+                    self._frames.popleft()
+                start = 0
+            end = start + size
+            while self._frames and self._frames[0][2] < end and self._frames[0][2] + self._frames[0][3] > start:
+                self._frames.popleft()
+            self._buf[start:end] = data
+            self._head = end
+            self.last_push = time.time()
+            self._seq += 1
+            self._frames.append((self._seq, timestamp, start, size))
+            self._expire(time.time())
+            return self._seq
+
+    def snapshot(self, since=None, until=None):
+        """Copies of the buffered frames taken in [since, until], oldest first: [(seq, timestamp, bytes)]."""
+        with self._lock:
+            self._expire(time.time())
+            return [(seq, ts, bytes(self._buf[offset:offset + length]))
+                    for seq, ts, offset, length in self._frames
+                    if (since is None or ts >= since) and (until is None or ts <= until)]
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.time())
+            frames = list(self._frames)
+        span = frames[-1][1] - frames[0][1] if len(frames) > 1 else 0.0
+        return {
+            'frames': len(frames),
+            'bytes': sum(frame[3] for frame in frames),
+            'capacity_bytes': len(self._buf),
+            'seconds': round(span, 3),
+            'fps': round((len(frames) - 1) / span, 2) if span else 0.0,
+            'last_seq': frames[-1][0] if frames else None,
+            'last_timestamp': frames[-1][1] if frames else None,
+        }
+
+
+class FrameBuffers:
+    """
+    Per-investigation FrameRings for continuous ingest. Slabs are allocated
+    once and recycled: a new ring takes the slab of one that has not been fed
+    for `seconds` (its frames have all expired anyway). While all
+    `max_investigations` are live, a new stream is refused with
+    FrameBuffersFull rather than taking another stream's frames. Like the live
+    event broker this is per process, so the server runs a single worker
+    (see gunicorn.conf.py).
+    """
+
+    def __init__(self, seconds=10.0, max_bytes=32 * 2**20, max_investigations=4):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.max_investigations = max_investigations
+        self._rings = OrderedDict()  # investigation_id -> FrameRing, least recently used first
+        self._free = []  # Slabs of evicted rings
+        self._lock = threading.Lock()
+
+    def ring(self, investigation_id, create=False):
+        with self._lock:
+            ring = self._rings.get(investigation_id)
+            if ring is not None:
+                self._rings.move_to_end(investigation_id)
+                return ring
+            if not create:
+                return None
+            if len(self._rings) >= self.max_investigations:
+                cutoff = time.time() - self.seconds
+                idle = next((key for key, other in self._rings.items() if other.last_push < cutoff), None)
+                if idle is None:
+                    stalest = min(other.last_push for other in self._rings.values())
+                    raise FrameBuffersFull(max(1, math.ceil(stalest - cutoff)))
+                self._free.append(self._rings.pop(idle).retire())
+            slab = self._free.pop() if self._free else bytearray(self.max_bytes)
+            ring = self._rings[investigation_id] = FrameRing(slab, seconds=self.seconds)
+            return ring
+
+    def push(self, investigation_id, data, timestamp=None):
+        while True:
+            # A ring evicted between the lookup and the write refuses it; write to a fresh one instead
+            seq = self.ring(investigation_id, create=True).push(data, timestamp)
+            if seq is not None:
+                return seq
+
+    def snapshot(self, investigation_id, since=None, until=None):
+        ring = self.ring(investigation_id)
+        return ring.snapshot(since, until) if ring is not None else []
+
+    def forget(self, investigation_id):
+        with self._lock:
+            ring = self._rings.pop(investigation_id, None)
+            if ring is not None:
+                self._free.append(ring.retire())
+
+    def stats(self, investigation_id):
+        ring = self.ring(investigation_id)
+        return ring.stats() if ring is not None else None
+
+
+def select_frames(frames, max_frames):
+    """At most `max_frames` of `frames`, evenly spaced and always keeping the newest."""
+    if max_frames <= 0 or len(frames) <= max_frames:
+        return frames
+    if max_frames == 1:
+        return frames[-1:]
+    step = (len(frames) - 1) / (max_frames - 1)
+    return [frames[round(i * step)] for i in range(max_frames)]
+
+
+def get_frame_buffers():
+    return current_app.extensions['frame_buffers']
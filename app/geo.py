@@ -0,0 +1,186 @@
+# app/geo.py
+import io
+import math
+from datetime import datetime, timedelta
+
+from PIL import Image, UnidentifiedImageError
+
+from .models import db, IST, Capture, Investigation
+
+EARTH_RADIUS_M = 6371008.8
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # Stored length; a 9-character cell is about 5 x 5 m
+
+# EXIF tag ids (PIL.ExifTags): IFD pointers, then tags inside the Exif and GPS IFDs
+EXIF_IFD, GPS_IFD = 0x8769, 0x8825
+DATETIME_ORIGINAL, OFFSET_TIME_ORIGINAL = 0x9003, 0x9011
+GPS_LAT_REF, GPS_LAT, GPS_LON_REF, GPS_LON = 1, 2, 3, 4
+GPS_ALT_REF, GPS_ALT, GPS_TIME, GPS_DATE = 5, 6, 7, 29
+
+
+# --- EXIF ---
+def _rational(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+
+
+def _degrees(dms, ref):
+    parts = [_rational(part) for part in (dms or ())]
+    if len(parts) != 3 or None in parts:
+        return None
+    value = round(parts[0] + parts[1] / 60 + parts[2] / 3600, 7)  # ~1 cm
+    return -value if ref in ('S', 'W') else value
+
+
+def _exif_time(exif_ifd, gps):
+    """Capture time in IST: GPS UTC time, else DateTimeOriginal with its offset (assumed IST without one)."""
+    try:
+        if gps.get(GPS_DATE) and gps.get(GPS_TIME):
+            hours, minutes, seconds = (_rational(part) for part in gps[GPS_TIME])
+            day = datetime.strptime(gps[GPS_DATE], '%Y:%m:%d')
+            utc = day + timedelta(hours=hours, minutes=minutes, seconds=seconds)
+            return IST.fromutc(utc)
+        original = exif_ifd.get(DATETIME_ORIGINAL)
+        if original:
+            offset = exif_ifd.get(OFFSET_TIME_ORIGINAL)
+            if offset:
+                return datetime.strptime(f"{original}{offset}", '%Y:%m:%d %H:%M:%S%z').astimezone(IST)
+            return IST.localize(datetime.strptime(original, '%Y:%m:%d %H:%M:%S'))
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def read_exif(image_bytes):
+    """
+    GPS position, altitude (metres, negative below sea level) and capture
+    time from a frame's EXIF. Only the header is parsed; the pixels are never
+    decoded. Missing or malformed fields come back as None.
+    """
+    empty = {'latitude': None, 'longitude': None, 'altitude': None, 'taken_at': None}
+    try:
+        exif = Image.open(io.BytesIO(image_bytes)).getexif()
+        gps, exif_ifd = exif.get_ifd(GPS_IFD), exif.get_ifd(EXIF_IFD)
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        return empty
+
+    latitude = _degrees(gps.get(GPS_LAT), gps.get(GPS_LAT_REF))
+    longitude = _degrees(gps.get(GPS_LON), gps.get(GPS_LON_REF))
+    if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        latitude = longitude = None
+    altitude = _rational(gps.get(GPS_ALT))
+    if altitude is not None and gps.get(GPS_ALT_REF) in (1, b'\x01'):
+        altitude = -altitude
+    return {'latitude': latitude, 'longitude': longitude, 'altitude': altitude,
+            'taken_at': _exif_time(exif_ifd, gps)}
+
+
+def apply_exif(capture, image_bytes):
+    """Fills the capture's position and time columns; taken_at falls back to the receipt time."""
+    meta = read_exif(image_bytes)
+    capture.latitude, capture.longitude, capture.altitude = meta['latitude'], meta['longitude'], meta['altitude']
+    capture.geohash = encode_geohash(meta['latitude'], meta['longitude']) if meta['latitude'] is not None else None
+    capture.taken_at = meta['taken_at'] or capture.timestamp or datetime.now(IST)
+    return meta
+
+
+# --- Geohash ---
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_degrees(precision):
+    """(height, width) of a geohash cell in degrees."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def covering_prefixes(latitude, longitude, radius_m):
+    """
+    Geohash prefixes whose cells together cover the circle: the finest
+    precision whose cells are at least `radius_m` across, then the cell
+    holding the centre and its eight neighbours. Returns [] when the circle
+    is too large for even one-character cells to bound it.
+    """
+    lat_m = math.pi * EARTH_RADIUS_M / 180
+    lon_m = lat_m * max(math.cos(math.radians(min(abs(latitude) + radius_m / lat_m, 90))), 1e-6)
+    precision = GEOHASH_PRECISION
+    while precision > 0:
+        height, width = geohash_cell_degrees(precision)
+        if height * lat_m >= radius_m and width * lon_m >= radius_m:
+            break
+        precision -= 1
+    if precision == 0:
+        return []
+    prefixes = set()
+    for dlat in (-height, 0, height):
+        for dlon in (-width, 0, width):
+            lat = max(min(latitude + dlat, 90.0), -90.0)
+            lon = (longitude + dlon + 180.0) % 360.0 - 180.0
+            prefixes.add(encode_geohash(lat, lon, precision))
+    return sorted(prefixes)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+# --- Queries ---
+def captures_near(user_id, latitude, longitude, radius_m, start=None, end=None, investigation_id=None, limit=500):
+    """
+    The user's captures within `radius_m` of a point, optionally taken
+    between `start` and `end`, nearest first, as [(Capture, distance_m)].
+    Candidates come from (geohash, taken_at) index range scans over the
+    covering cells; only those are checked by exact distance.
+    """
+    query = (Capture.query.join(Investigation, Investigation.id == Capture.investigation_id)
+             .filter(Investigation.user_id == user_id, Capture.latitude.isnot(None)))
+    prefixes = covering_prefixes(latitude, longitude, radius_m)
+    if prefixes:
+        # '{' sorts right after 'z', so [prefix, prefix + '{') is exactly the cell
+        query = query.filter(db.or_(*[db.and_(Capture.geohash >= prefix, Capture.geohash < prefix + '{')
+                                      for prefix in prefixes]))
+    if start is not None:
+        query = query.filter(Capture.taken_at >= start)
+    if end is not None:
+        query = query.filter(Capture.taken_at <= end)
+    if investigation_id is not None:
+        query = query.filter(Capture.investigation_id == investigation_id)
+
+    matches = []
+    for capture in query:
+        distance = haversine_m(latitude, longitude, capture.latitude, capture.longitude)
+        if distance <= radius_m:
+            matches.append((capture, distance))
+    matches.sort(key=lambda match: (match[1], match[0].id))
+    return matches[:limit]
+
+
+def parse_time(value):
+    """ISO 8601 query parameter -> aware datetime in IST (naive values are IST)."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed.astimezone(IST) if parsed.tzinfo else IST.localize(parsed)
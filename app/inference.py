@@ -0,0 +1,250 @@
+# app/inference.py
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from contextlib import nullcontext
+from multiprocessing import resource_tracker, shared_memory
+
+from flask import current_app
+
+from . import analysis_utils
+
+# Every message is a 4-byte big-endian length followed by that many bytes of JSON.
+HEADER = struct.Struct('>I')
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+
+def send_message(sock, payload):
+    body = json.dumps(payload).encode('utf-8')
+    sock.sendall(HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while size:
+        n = sock.recv_into(view[-size:], size)
+        if not n:
+            raise ConnectionError("Inference socket closed mid-message.")
+        size -= n
+    return bytes(buf)
+
+
+def recv_message(sock):
+    header = sock.recv(HEADER.size, socket.MSG_WAITALL)
+    if not header:
+        return None  # Clean EOF between messages
+    if len(header) < HEADER.size:
+        header += _recv_exact(sock, HEADER.size - len(header))
+    (size,) = HEADER.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Inference message too large ({size} bytes).")
+    return json.loads(_recv_exact(sock, size))
+
+
+def _attach_shared_memory(name):
+    """Opens a client's segment without letting this process's resource tracker unlink it on exit."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+# --- Server ---
+class _InferenceHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # One connection carries many requests; web workers keep theirs open.
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Inference connection dropped: {e}")
+                return
+            if request is None:
+                return
+            try:
+                response = self.server.dispatch(request)
+            except Exception as e:
+                response = {'ok': False, 'error': f"Inference failed: {e}"}
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Owns the only copy of the InsightFace and ViT models and analyzes images
+    for any number of web workers over a Unix socket (`flask inference serve`).
+
+    Image bytes never travel through the socket: the client writes them into
+    a shared memory segment and sends its name, and the server decodes
+    straight out of that buffer. Requests run on their own threads so the
+    emotion batcher can merge faces from concurrent frames; with batching
+    disabled the models are used by one request at a time.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # Stale socket from a previous run
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+        super().__init__(socket_path, _InferenceHandler)
+        os.chmod(socket_path, 0o660)
+        self.socket_path = socket_path
+        self.model_lock = threading.Lock() if analysis_utils.emotion_batcher is None else nullcontext()
+        self.requests_served = 0
+
+    def dispatch(self, request):
+        op = request.get('op')
+        if op == 'ping':
+            face_app = analysis_utils.face_app
+            return {'ok': True, 'models_loaded': face_app is not None,
+                    'face_modules': sorted(getattr(face_app, 'models', None) or []),
+                    'requests_served': self.requests_served, 'gating': analysis_utils.gating_stats(),
+                    'memory': analysis_utils.memory_stats()}
+        if op == 'analyze':
+            return {'ok': True, 'result': self.analyze(request)}
+        return {'ok': False, 'error': f"Unknown op {op!r}."}
+
+    def analyze(self, request):
+        if not analysis_utils.models_available():
+            return {"error": "Analysis models are not loaded."}
+
+        shm = _attach_shared_memory(request['shm'])
+        try:
+            view = shm.buf[:request['size']]
+            try:
+                img, scale = analysis_utils.decode_image_bytes_scaled(view, min_side=request.get('min_side'))
+            except Exception as e:
+                return {"error": f"Error decoding image: {e}"}
+            finally:
+                view.release()  # The segment cannot be closed while a view is exported
+        finally:
+            shm.close()
+        if img is None:
+            return {"error": "Could not decode the image data."}
+
+        with self.model_lock:
+            result = analysis_utils.analyze_image(img, scale=scale)
+        self.requests_served += 1
+        return result
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+# --- Client ---
+class InferenceUnavailable(Exception):
+    """The inference server could not be reached; the caller should run in-process."""
+
+
+class InferenceClient:
+    """
+    Thin client used by the web workers. Each thread keeps one connection
+    open. When the server is absent, analyze() falls back to in-process
+    inference (loading the models on first use) and only retries the socket
+    every `retry_seconds`, so a missing server does not cost a connect()
+    per request.
+    """
+
+    def __init__(self, socket_path, timeout=30, retry_seconds=5):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self._local = threading.local()
+        self._unavailable_until = 0.0
+        self._load_lock = threading.Lock()
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError as e:
+                sock.close()
+                raise InferenceUnavailable(str(e)) from e
+            self._local.sock = sock
+        return sock
+
+    def _drop_connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _call(self, payload):
+        for attempt in (1, 2):
+            sock = self._connection()
+            try:
+                send_message(sock, payload)
+                response = recv_message(sock)
+                if response is None:
+                    raise ConnectionError("Inference server closed the connection.")
+                return response
+            except (ConnectionError, BrokenPipeError) as e:
+                # A kept-alive connection may be stale after a server restart: reconnect once.
+                self._drop_connection()
+                if attempt == 2:
+                    raise InferenceUnavailable(str(e)) from e
+            except OSError:
+                self._drop_connection()
+                raise
+
+    def ping(self):
+        return self._call({'op': 'ping'})
+
+    def analyze_remote(self, image_bytes, min_side=analysis_utils.DECODE_MIN_SIDE):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(image_bytes)))
+        try:
+            shm.buf[:len(image_bytes)] = image_bytes
+            response = self._call({'op': 'analyze', 'shm': shm.name, 'size': len(image_bytes),
+                                   'min_side': min_side})
+        finally:
+            shm.close()
+            shm.unlink()
+        if not response.get('ok'):
+            return {"error": response.get('error', "Inference server error.")}
+        return response['result']
+
+    def analyze_local(self, image_bytes, min_side=analysis_utils.DECODE_MIN_SIDE):
+        if analysis_utils.MODELS_LOADED and analysis_utils.face_app is None and not analysis_utils.models_unloaded:
+            with self._load_lock:
+                analysis_utils.initialize_models()
+        return analysis_utils.analyze_image_from_bytes(image_bytes, min_side=min_side)
+
+    def analyze(self, image_bytes, min_side=analysis_utils.DECODE_MIN_SIDE):
+        if time.monotonic() >= self._unavailable_until:
+            try:
+                return self.analyze_remote(image_bytes, min_side=min_side)
+            except InferenceUnavailable as e:
+                print(f"[WARN] Inference server unavailable ({e}); analyzing in-process.")
+                self._unavailable_until = time.monotonic() + self.retry_seconds
+            except OSError as e:
+                return {"error": f"Inference server error: {e}"}
+        return self.analyze_local(image_bytes, min_side=min_side)
+
+
+def get_inference_client():
+    return current_app.extensions.get('inference')
+
+
+def analyze_image_bytes(image_bytes):
+    """Analyzes an encoded image via the inference server when configured, else in-process."""
+    client = get_inference_client()
+    if client is None:
+        return analysis_utils.analyze_image_from_bytes(image_bytes)
+    return client.analyze(image_bytes)
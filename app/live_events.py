@@ -0,0 +1,127 @@
+# app/live_events.py
+import json
+import queue
+import threading
+from collections import defaultdict, deque
+
+from flask import current_app
+
+
+RETRY_WHEN_FULL_SECONDS = 30
+
+
+class Subscription:
+    def __init__(self, investigation_id, queue_size):
+        self.investigation_id = investigation_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Set when the client fell too far behind; it is told to refetch instead.
+        self.overflowed = False
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe hub for per-investigation live events.
+
+    `save_capture` and `analyze_capture` publish small deltas here and every
+    open Server-Sent Events stream for that investigation receives them.
+    A short backlog per investigation lets reconnecting clients replay what
+    they missed via Last-Event-ID. Events only reach subscribers in the same
+    worker process, so the server runs a single worker (see gunicorn.conf.py).
+    """
+
+    def __init__(self, backlog=100, queue_size=256, max_subscribers=None):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._sequence = defaultdict(int)
+        self._subscribers = defaultdict(set)
+        self._recent = defaultdict(lambda: deque(maxlen=backlog))
+
+    def publish(self, investigation_id, event, data):
+        with self._lock:
+            self._sequence[investigation_id] += 1
+            record = (self._sequence[investigation_id], event, json.dumps(data, separators=(',', ':')))
+            self._recent[investigation_id].append(record)
+            subscribers = list(self._subscribers.get(investigation_id, ()))
+        for sub in subscribers:
+            try:
+                sub.queue.put_nowait(record)
+            except queue.Full:
+                sub.overflowed = True
+        return record[0]
+
+    def subscribe(self, investigation_id, last_event_id=None):
+        """
+        Returns a Subscription, or None when `max_subscribers` streams are
+        already open in this process: each open stream holds a request thread.
+        """
+        sub = Subscription(investigation_id, self.queue_size)
+        with self._lock:
+            if (self.max_subscribers is not None
+                    and sum(len(subs) for subs in self._subscribers.values()) >= self.max_subscribers):
+                return None
+            self._subscribers[investigation_id].add(sub)
+            if last_event_id is not None:
+                self._replay(sub, last_event_id)
+        return sub
+
+    def _replay(self, sub, last_event_id):
+        recent = self._recent.get(sub.investigation_id)
+        if not recent:
+            # Nothing buffered: either nothing happened or this process restarted
+            sub.overflowed = last_event_id > 0
+            return
+        if last_event_id > recent[-1][0] or recent[0][0] > last_event_id + 1:
+            # The backlog does not reach back to the client's last event
+            sub.overflowed = True
+        for record in recent:
+            if record[0] > last_event_id:
+                try:
+                    sub.queue.put_nowait(record)
+                except queue.Full:
+                    sub.overflowed = True
+                    break
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subscribers = self._subscribers.get(sub.investigation_id)
+            if subscribers is not None:
+                subscribers.discard(sub)
+                if not subscribers:
+                    del self._subscribers[sub.investigation_id]
+
+    def subscriber_count(self, investigation_id):
+        with self._lock:
+            return len(self._subscribers.get(investigation_id, ()))
+
+    def stream(self, sub, heartbeat=15):
+        """Yields text/event-stream frames until the client disconnects."""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                if sub.overflowed:
+                    sub.overflowed = False
+                    yield "event: resync\ndata: {}\n\n"
+                try:
+                    event_id, event, data = sub.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comment frame keeps proxies from closing the connection and
+                    # surfaces client disconnects on the next write.
+                    yield ": ping\n\n"
+                    continue
+                yield f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+
+def get_event_broker():
+    return current_app.extensions['live_events']
+
+
+def publish_event(investigation_id, event, data):
+    """Publishes a live event; never lets a broker problem break the caller's request."""
+    try:
+        return get_event_broker().publish(investigation_id, event, data)
+    except Exception as e:
+        print(f"[WARN] Could not publish {event} for investigation {investigation_id}: {e}")
+        return None
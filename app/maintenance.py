@@ -0,0 +1,335 @@
+# app/maintenance.py
+import os
+import queue
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import bindparam, func
+
+from .models import (db, Capture, CapturePack, Investigation, IST, User, Report, FaceResult, PanicAlert,
+                     PanicSample, PanicRollup)
+from .capture_store import get_capture_store
+from .near_duplicates import get_near_duplicate_index
+from .frame_buffer import get_frame_buffers
+
+BATCH_SIZE = 500
+
+
+# --- Helpers ---
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _referenced_loose(filenames):
+    """Returns the subset of `filenames` still needed as loose files (referenced by unpacked rows)."""
+    rows = db.session.query(Capture.image_filename).filter(
+        Capture.image_filename.in_(filenames),
+        Capture.pack_id.is_(None)
+    ).distinct()
+    return {name for (name,) in rows}
+
+
+def _remove(path, dry_run):
+    try:
+        size = os.path.getsize(path)
+        if not dry_run:
+            os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+# --- Orphan Collection ---
+def collect_orphans(dry_run=False, grace_seconds=None):
+    """
+    Removes loose capture files and pack files that no Capture row references.
+    Files younger than CAPTURE_GC_GRACE_SECONDS are kept so in-flight uploads survive.
+    """
+    store = get_capture_store()
+    if grace_seconds is None:
+        grace_seconds = current_app.config['CAPTURE_GC_GRACE_SECONDS']
+    cutoff = time.time() - grace_seconds
+    stats = {'files_scanned': 0, 'files_removed': 0, 'packs_removed': 0, 'bytes_freed': 0}
+
+    # 1. Loose files, checked against the DB in batches so memory stays flat
+    for batch in _chunks(store.iter_loose_files(), BATCH_SIZE):
+        stats['files_scanned'] += len(batch)
+        candidates = {name: path for name, path, mtime in batch if mtime < cutoff}
+        if not candidates:
+            continue
+        keep = _referenced_loose(list(candidates))
+        for name, path in candidates.items():
+            if name not in keep:
+                stats['bytes_freed'] += _remove(path, dry_run)
+                stats['files_removed'] += 1
+                if not dry_run:
+                    store.prune_empty_dirs(path)
+
+    # 2. Packs whose captures have all been deleted
+    live_pack_ids = {pid for (pid,) in db.session.query(Capture.pack_id).filter(Capture.pack_id.isnot(None)).distinct()}
+    known_packs = set()
+    for pack in CapturePack.query.all():
+        known_packs.add(pack.filename)
+        if pack.id in live_pack_ids:
+            continue
+        stats['bytes_freed'] += _remove(store.pack_path(pack.filename), dry_run)
+        stats['packs_removed'] += 1
+        if not dry_run:
+            db.session.delete(pack)
+
+    # 3. Pack files left behind without a CapturePack row (e.g. an interrupted pack run)
+    for name, path, mtime in store.iter_pack_files():
+        if name not in known_packs and mtime < cutoff:
+            stats['bytes_freed'] += _remove(path, dry_run)
+            stats['packs_removed'] += 1
+
+    if not dry_run:
+        db.session.commit()
+    return stats
+
+
+# --- Retention ---
+def apply_retention(dry_run=False, now=None):
+    """
+    Deletes Capture rows older than CAPTURE_RETENTION_DAYS in investigations whose
+    status is listed in CAPTURE_RETENTION_STATUSES. Files are left to collect_orphans,
+    since identical content may still be referenced elsewhere.
+    """
+    days = current_app.config.get('CAPTURE_RETENTION_DAYS')
+    if not days:
+        return {'captures_deleted': 0}
+
+    cutoff = (now or datetime.now(IST)) - timedelta(days=days)
+    investigation_ids = db.session.query(Investigation.id).filter(
+        Investigation.status.in_(current_app.config['CAPTURE_RETENTION_STATUSES'])
+    )
+    expired = Capture.query.filter(
+        Capture.timestamp < cutoff,
+        Capture.investigation_id.in_(investigation_ids.scalar_subquery())
+    )
+    if dry_run:
+        return {'captures_deleted': expired.count()}
+
+    deleted = expired.delete(synchronize_session=False)
+    db.session.commit()
+    return {'captures_deleted': deleted}
+
+
+# --- Archive Packs ---
+def pack_investigation(investigation_id, dry_run=False):
+    """
+    Folds an investigation's loose captures into a single indexed pack file.
+    Rows keep their filename and gain (pack_id, pack_offset, pack_length);
+    loose copies are removed once no unpacked row needs them.
+    """
+    store = get_capture_store()
+    filenames = [name for (name,) in db.session.query(Capture.image_filename).filter(
+        Capture.investigation_id == investigation_id,
+        Capture.pack_id.is_(None)
+    ).distinct().order_by(Capture.image_filename)]
+    if not filenames:
+        return None
+    if dry_run:
+        return {'investigation_id': investigation_id, 'files': len(filenames), 'pack': None}
+
+    pack_filename = f"inv{investigation_id}-{int(time.time())}-{secrets.token_hex(4)}.pack"
+    index, size = store.write_pack(pack_filename, filenames)
+    if not index:
+        os.remove(store.pack_path(pack_filename))
+        return None
+
+    pack = CapturePack(filename=pack_filename, investigation_id=investigation_id, size_bytes=size)
+    db.session.add(pack)
+    db.session.flush()
+
+    table = Capture.__table__
+    stmt = table.update().where(
+        table.c.investigation_id == investigation_id,
+        table.c.image_filename == bindparam('b_filename'),
+        table.c.pack_id.is_(None)
+    ).values(pack_id=pack.id, pack_offset=bindparam('b_offset'), pack_length=bindparam('b_length'))
+    db.session.execute(stmt, [
+        {'b_filename': name, 'b_offset': offset, 'b_length': length}
+        for name, (offset, length) in index.items()
+    ])
+    pack.capture_count = Capture.query.filter_by(pack_id=pack.id).count()
+    db.session.commit()
+
+    # Rows now point at the pack, so loose copies only matter to other investigations
+    removed = 0
+    for batch in _chunks(index, BATCH_SIZE):
+        keep = _referenced_loose(batch)
+        for name in batch:
+            if name not in keep and store.delete(name):
+                removed += 1
+
+    return {'investigation_id': investigation_id, 'files': len(index), 'pack': pack_filename,
+            'size_bytes': size, 'loose_removed': removed}
+
+
+def pack_completed_investigations(dry_run=False, now=None):
+    """Packs every Completed investigation whose newest loose capture is older than CAPTURE_PACK_AFTER_HOURS."""
+    cutoff = (now or datetime.now(IST)) - timedelta(hours=current_app.config['CAPTURE_PACK_AFTER_HOURS'])
+    ready = db.session.query(Capture.investigation_id).join(Investigation).filter(
+        Investigation.status == 'Completed',
+        Capture.pack_id.is_(None)
+    ).group_by(Capture.investigation_id).having(func.max(Capture.timestamp) < cutoff)
+
+    results = []
+    for (investigation_id,) in ready.all():
+        result = pack_investigation(investigation_id, dry_run=dry_run)
+        if result:
+            results.append(result)
+    return results
+
+
+# --- Set-based Deletion ---
+# Child tables in delete order. With ON DELETE CASCADE the database would remove them
+# anyway; deleting them explicitly also covers databases created before the cascades.
+INVESTIGATION_CHILDREN = [FaceResult, PanicAlert, PanicSample, PanicRollup, Capture]
+
+
+def _uploaded_file(filename, default):
+    return None if not filename or filename == default else filename
+
+
+def _delete_investigation_rows(investigation_ids):
+    """
+    One DELETE per table for all of `investigation_ids` (no ORM objects are
+    loaded). Returns the files the deleted rows pointed at, for FileCleaner.
+    """
+    ids = list(investigation_ids)
+    files = {'captures': [], 'packs': [], 'uploads': []}
+    for batch in _chunks(ids, BATCH_SIZE):
+        files['captures'] += [name for (name,) in db.session.query(Capture.image_filename).filter(
+            Capture.investigation_id.in_(batch), Capture.pack_id.is_(None)).distinct()]
+        files['packs'] += [name for (name,) in db.session.query(CapturePack.filename).filter(
+            CapturePack.investigation_id.in_(batch))]
+        files['uploads'] += [name for (name,) in db.session.query(Investigation.drone_photo).filter(
+            Investigation.id.in_(batch)) if _uploaded_file(name, 'default-drone.png')]
+
+        for model in INVESTIGATION_CHILDREN:
+            db.session.execute(db.delete(model).where(model.investigation_id.in_(batch)))
+        db.session.execute(db.delete(CapturePack).where(CapturePack.investigation_id.in_(batch)))
+        db.session.execute(db.delete(Investigation).where(Investigation.id.in_(batch)))
+
+    near_duplicates, frame_buffers = get_near_duplicate_index(), get_frame_buffers()
+    for investigation_id in ids:
+        near_duplicates.forget(investigation_id)
+        frame_buffers.forget(investigation_id)
+    return files
+
+
+def delete_investigations(investigation_ids):
+    """
+    Deletes investigations with everything under them in one transaction and
+    hands their files to the background FileCleaner, so the request returns
+    as soon as the rows are gone. Returns the number of files queued.
+    """
+    files = _delete_investigation_rows(investigation_ids)
+    db.session.commit()
+    return get_file_cleaner().submit(**files)
+
+
+def delete_user(user_id):
+    """Deletes an account with its investigations, reports and uploaded pictures (set-based, like above)."""
+    investigation_ids = [inv_id for (inv_id,) in db.session.query(Investigation.id).filter_by(user_id=user_id)]
+    files = _delete_investigation_rows(investigation_ids)
+    profile_pic = db.session.query(User.profile_pic_url).filter_by(id=user_id).scalar()
+    if _uploaded_file(profile_pic, 'default-profile-pic.png'):
+        files['uploads'].append(profile_pic)
+    db.session.execute(db.delete(Report).where(Report.user_id == user_id))
+    db.session.execute(db.delete(User).where(User.id == user_id))
+    db.session.commit()
+    return get_file_cleaner().submit(**files)
+
+
+class FileCleaner:
+    """
+    Background thread removing the files of deleted investigations.
+
+    Jobs wait CAPTURE_CLEANER_DELAY_SECONDS first, so an upload of identical
+    content that was mid-request during the delete has committed its row.
+    A capture file is then only removed if no remaining row uses it (files
+    are shared by content hash) and it was not saved again after the
+    delete. Anything skipped, or lost to a restart, is left to
+    collect_orphans.
+    """
+
+    def __init__(self, app, delay=30):
+        self.app = app
+        self.delay = delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'files_removed': 0, 'files_kept': 0, 'bytes_freed': 0}
+
+    def submit(self, captures=(), packs=(), uploads=()):
+        job = (time.time(), list(captures), list(packs), list(uploads))
+        count = len(job[1]) + len(job[2]) + len(job[3])
+        if count:
+            self._queue.put(job)
+            self._ensure_thread()
+        return count
+
+    def _ensure_thread(self):
+        with self._lock:
+            # Also restarts it in a forked worker, where the parent's thread no longer exists
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='file-cleaner', daemon=True)
+                self._thread.start()
+
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def join(self):
+        """Blocks until every queued job has run (CLI and benchmarks)."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                time.sleep(max(0.0, job[0] + self.delay - time.time()))
+                with self.app.app_context():
+                    self.clean(*job)
+            except Exception as e:
+                print(f"[WARN] File cleaner job failed (collect_orphans will retry): {e}")
+            finally:
+                self._queue.task_done()
+
+    def clean(self, deleted_at, captures, packs, uploads):
+        store = get_capture_store()
+        self.stats['jobs'] += 1
+        for batch in _chunks(captures, BATCH_SIZE):
+            keep = _referenced_loose(batch)
+            for name in batch:
+                path = store.resolve(name)
+                if path is None:
+                    continue
+                if name in keep or os.path.getmtime(path) >= deleted_at:
+                    self.stats['files_kept'] += 1
+                    continue
+                self.stats['bytes_freed'] += _remove(path, dry_run=False)
+                self.stats['files_removed'] += 1
+                store.prune_empty_dirs(path)
+        for name in packs:
+            self.stats['bytes_freed'] += _remove(store.pack_path(name), dry_run=False)
+            self.stats['files_removed'] += 1
+        upload_folder = self.app.config['UPLOAD_FOLDER']
+        for name in uploads:
+            self.stats['bytes_freed'] += _remove(os.path.join(upload_folder, os.path.basename(name)), dry_run=False)
+            self.stats['files_removed'] += 1
+
+
+def get_file_cleaner():
+    return current_app.extensions['file_cleaner']
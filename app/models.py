@@ -4,12 +4,24 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from sqlalchemy.sql import func
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import sqlite3
 import pytz
 
 IST = pytz.timezone("Asia/Kolkata")
 
 db = SQLAlchemy()
 
+
+# SQLite only honours ON DELETE CASCADE / SET NULL with foreign keys switched on per connection
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -26,8 +38,11 @@ class User(UserMixin, db.Model):
     website_url = db.Column(db.String(200))
 
     # Relationships to other tables
-    investigations = db.relationship('Investigation', backref='author', lazy=True)
-    reports = db.relationship('Report', backref='author', lazy=True)
+    # Deleted by the database (see maintenance.delete_user); passive so the ORM never loads them to do it
+    investigations = db.relationship('Investigation', backref='author', lazy=True, cascade='all, delete-orphan',
+                                     passive_deletes=True)
+    reports = db.relationship('Report', backref='author', lazy=True, cascade='all, delete-orphan',
+                              passive_deletes=True)
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -46,14 +61,22 @@ class Investigation(db.Model):
     description = db.Column(db.Text)
     drone_photo = db.Column(db.String(20), nullable=False, default='default-drone.png') # For user-uploaded photos
     status = db.Column(db.String(20), nullable=False, default='Live') # Default status is now 'Live'
+    speaker_endpoints = db.Column(db.Text) # Drone speaker base URLs, one per line (see speaker_relay.py)
     # AFTER (Correct):
     timestamp = db.Column(
         db.DateTime(timezone=True), 
         nullable=False, 
         default=lambda: datetime.now(IST)
     )
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    captures = db.relationship('Capture', backref='investigation', lazy=True, cascade='all, delete-orphan')
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Children go with ON DELETE CASCADE; passive_deletes keeps the ORM from loading them first
+    captures = db.relationship('Capture', backref='investigation', lazy=True, cascade='all, delete-orphan',
+                               passive_deletes=True)
+    panic_samples = db.relationship('PanicSample', backref='investigation', lazy='dynamic', cascade='all, delete-orphan',
+                                    passive_deletes=True)
+    panic_rollups = db.relationship('PanicRollup', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
+    panic_alerts = db.relationship('PanicAlert', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
+    face_results = db.relationship('FaceResult', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
 
 class Report(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -64,7 +87,7 @@ class Report(db.Model):
         nullable=False, 
         default=lambda: datetime.now(IST)
     )
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
 
 class ThreadFeedItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -80,13 +103,125 @@ class ThreadFeedItem(db.Model):
 # ADD THIS NEW MODEL AT THE END OF THE FILE
 class Capture(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    image_filename = db.Column(db.String(50), nullable=False)
+    # Content-hash filename; identical frames share one file (see capture_store.py)
+    image_filename = db.Column(db.String(50), nullable=False, index=True)
     timestamp = db.Column(
         db.DateTime(timezone=True), 
         nullable=False, 
         default=lambda: datetime.now(IST)
     )
-    investigation_id = db.Column(db.Integer, db.ForeignKey('investigation.id'), nullable=False)
+    investigation_id = db.Column(db.Integer, db.ForeignKey('investigation.id', ondelete='CASCADE'), nullable=False,
+                                 index=True)
+
+    # 64-bit dHash (stored signed) and the earlier capture this frame nearly duplicates (see near_duplicates.py)
+    phash = db.Column(db.BigInteger)
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('capture.id', ondelete='SET NULL'), index=True)
+
+    # Set once the image has been moved into a per-investigation archive pack
+    pack_id = db.Column(db.Integer, db.ForeignKey('capture_pack.id'), index=True)
+    pack_offset = db.Column(db.BigInteger)
+    pack_length = db.Column(db.Integer)
+    pack = db.relationship('CapturePack', backref='captures', lazy=True)
+
+    # From the frame's EXIF at ingest (see geo.py); taken_at is the receipt time when EXIF has none
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    altitude = db.Column(db.Float)  # Metres above sea level
+    taken_at = db.Column(db.DateTime(timezone=True), index=True)
+    geohash = db.Column(db.String(12))
+
+    __table_args__ = (
+        # "Within r metres of a point between t1 and t2": prefix ranges on geohash, then the time
+        db.Index('ix_capture_geohash_taken_at', 'geohash', 'taken_at'),
+    )
 
     def _repr_(self):
-        return f"Capture('{self.image_filename}', Investigation ID: {self.investigation_id})"
\ No newline at end of file
+        return f"Capture('{self.image_filename}', Investigation ID: {self.investigation_id})"
+
+
+# --- Archive packs for completed investigations (see maintenance.py) ---
+class CapturePack(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(100), nullable=False, unique=True)
+    investigation_id = db.Column(db.Integer, db.ForeignKey('investigation.id', ondelete='SET NULL'), index=True)
+    capture_count = db.Column(db.Integer, nullable=False, default=0)
+    size_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    timestamp = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(IST)
+    )
+
+
+# --- Panic score time series (see panic_series.py) ---
+class PanicSample(db.Model):
+    """One analyzed capture; append-only. Rolling values are as of this sample."""
+    __table_args__ = (db.Index('ix_panic_sample_investigation_id_timestamp', 'investigation_id', 'timestamp', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    investigation_id = db.Column(db.Integer, db.ForeignKey('investigation.id', ondelete='CASCADE'), nullable=False)
+    # Kept (as NULL) when retention deletes the capture, so the series survives
+    capture_id = db.Column(db.Integer, db.ForeignKey('capture.id', ondelete='SET NULL'), unique=True)
+    timestamp = db.Column(db.DateTime(timezone=True), nullable=False)  # Capture time
+    group_score = db.Column(db.Float, nullable=False)
+    max_face_score = db.Column(db.Float, nullable=False, default=0.0)
+    face_count = db.Column(db.Integer, nullable=False, default=0)
+    face_scores = db.Column(db.Text)  # JSON list of individual panic scores
+    rolling_mean = db.Column(db.Float, nullable=False)
+    rolling_max = db.Column(db.Float, nullable=False)
+    ewma = db.Column(db.Float, nullable=False)
+
+
+class PanicRollup(db.Model):
+    """Pre-aggregated group scores per time bucket, so charts never read raw samples."""
+    __table_args__ = (db.UniqueConstraint('investigation_id', 'bucket_seconds', 'bucket_start'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    investigation_id = db.Column(db.Integer, db.ForeignKey('investigation.id', ondelete='CASCADE'), nullable=False)
+    bucket_seconds = db.Column(db.Integer, nullable=False)
+    bucket_start = db.Column(db.BigInteger, nullable=False)  # Unix seconds
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    max_score = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class PanicAlert(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    investigation_id = db.Column(db.Integer, db.ForeignKey('investigation.id', ondelete='CASCADE'),
+                                 nullable=False, index=True)
+    sample_id = db.Column(db.Integer, db.ForeignKey('panic_sample.id', ondelete='CASCADE'))
+    metric = db.Column(db.String(20), nullable=False)  # 'ewma', 'mean', 'max', 'group' or 'max_face'
+    value = db.Column(db.Float, nullable=False)
+    threshold = db.Column(db.Float, nullable=False)
+    timestamp = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(IST)
+    )
+
+
+# --- Per-face analysis results (see face_results.py) ---
+class FaceResult(db.Model):
+    """
+    One detected face of an analyzed capture. Investigation and capture time
+    are copied from the capture so demographic queries filter and group on
+    this table alone.
+    """
+    __table_args__ = (
+        db.Index('ix_face_result_investigation_id_timestamp', 'investigation_id', 'timestamp'),
+        db.Index('ix_face_result_investigation_id_emotion', 'investigation_id', 'emotion'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    investigation_id = db.Column(db.Integer, db.ForeignKey('investigation.id', ondelete='CASCADE'), nullable=False)
+    # Kept (as NULL) when retention deletes the capture, so the aggregates survive
+    capture_id = db.Column(db.Integer, db.ForeignKey('capture.id', ondelete='SET NULL'), index=True)
+    timestamp = db.Column(db.DateTime(timezone=True), nullable=False)  # Capture time
+    face_index = db.Column(db.SmallInteger, nullable=False)
+    gender = db.Column(db.String(1))  # 'M' or 'F'
+    age = db.Column(db.SmallInteger)
+    emotion = db.Column(db.String(10))  # NULL when the face was gated
+    fear = db.Column(db.Float)  # 0-1
+    panic_score = db.Column(db.Float)  # 0-100
+    det_score = db.Column(db.Float)
+    gated = db.Column(db.String(20))  # 'too_small', 'blurred' or 'low_confidence'
@@ -0,0 +1,149 @@
+# app/near_duplicates.py
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from flask import current_app
+
+from .models import db, Capture
+
+HASH_BITS = 64
+NEAR_DUPLICATE_ACTIONS = ('flag', 'skip_analysis', 'skip_storage')
+
+
+# --- Perceptual Hash ---
+def dhash(image_bytes):
+    """
+    64-bit difference hash: the frame shrunk to 9x8 grayscale, one bit per
+    horizontally adjacent pixel pair. JPEGs are decoded at 1/8 scale, so this
+    costs far less than the full decode analysis does. Returns None if the
+    bytes are not a decodable image.
+    """
+    buf = np.frombuffer(image_bytes, dtype=np.uint8)
+    gray = cv2.imdecode(buf, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        gray = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def to_signed(value):
+    """Unsigned 64-bit hash -> value that fits a signed BIGINT column."""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value):
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+# --- BK-tree ---
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance. Children are keyed by their
+    distance to the parent, so a radius search only descends into children
+    whose key lies within [d - radius, d + radius] (triangle inequality).
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        node = [value, [item], {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            if distance == 0:
+                current[1].append(item)
+                return
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value, radius):
+        """All (distance, item) within `radius` bits, nearest first."""
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= radius:
+                found.extend((distance, item) for item in items)
+            for key, child in children.items():
+                if distance - radius <= key <= distance + radius:
+                    stack.append(child)
+        found.sort()
+        return found
+
+
+class NearDuplicateIndex:
+    """
+    One BK-tree per investigation holding the hashes of its original
+    (non-duplicate) captures, so bursts from a hovering drone are compared
+    with the first frame of the burst. Trees are built lazily from the
+    Capture table and topped up on every lookup with the originals stored
+    since (by this or any other worker); only the `max_investigations` most
+    recently used are kept in memory.
+    """
+
+    def __init__(self, threshold=6, max_investigations=32):
+        self.threshold = threshold
+        self.max_investigations = max_investigations
+        self._trees = OrderedDict()  # investigation_id -> (tree, last_capture_id)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.threshold is not None and self.threshold >= 0
+
+    def _tree_for(self, investigation_id):
+        tree, last_id = self._trees.pop(investigation_id, (BKTree(), 0))
+        rows = (db.session.query(Capture.id, Capture.phash)
+                .filter(Capture.investigation_id == investigation_id, Capture.id > last_id,
+                        Capture.phash.isnot(None), Capture.duplicate_of_id.is_(None))
+                .order_by(Capture.id))
+        for capture_id, phash in rows:
+            tree.add(to_unsigned(phash), capture_id)
+            last_id = capture_id
+        self._trees[investigation_id] = (tree, last_id)
+        while len(self._trees) > self.max_investigations:
+            self._trees.popitem(last=False)
+        return tree
+
+    def find(self, investigation_id, value):
+        """(capture_id, distance) of the closest original within the threshold, or None."""
+        if not self.enabled or value is None:
+            return None
+        with self._lock:
+            matches = self._tree_for(investigation_id).search(value, self.threshold)
+        if not matches:
+            return None
+        distance, capture_id = matches[0]
+        return capture_id, distance
+
+    def forget(self, investigation_id=None):
+        with self._lock:
+            if investigation_id is None:
+                self._trees.clear()
+            else:
+                self._trees.pop(investigation_id, None)
+
+
+def get_near_duplicate_index():
+    return current_app.extensions['near_duplicates']
@@ -0,0 +1,267 @@
+# app/panic_series.py
+import json
+import threading
+from collections import deque
+
+from flask import current_app
+from sqlalchemy import case, func
+
+from .models import db, IST, PanicSample, PanicRollup, PanicAlert
+from .live_events import publish_event
+
+METRICS = ('group', 'mean', 'max', 'ewma', 'max_face')
+
+
+def _score(value):
+    """Analysis results carry scores as display strings ("42", "N/A")."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _epoch(dt):
+    # SQLite hands back naive datetimes; they were stored as IST
+    if dt.tzinfo is None:
+        dt = IST.localize(dt)
+    return dt.timestamp()
+
+
+class RollingWindow:
+    """
+    Rolling mean/max over the last `size` samples plus an EWMA, each updated
+    in O(1) (amortized for the max): a running sum for the mean and a
+    monotonic deque of (position, value) for the max.
+    """
+
+    def __init__(self, size=20, alpha=0.3):
+        self.size = size
+        self.alpha = alpha
+        self.values = deque()
+        self.total = 0.0
+        self.maxima = deque()
+        self.position = 0
+        self.ewma = None
+        self.last_time = None  # Epoch seconds of the newest sample pushed
+        self.armed = {}
+
+    def push(self, value):
+        self.values.append(value)
+        self.total += value
+        if len(self.values) > self.size:
+            self.total -= self.values.popleft()
+        while self.maxima and self.maxima[-1][1] <= value:
+            self.maxima.pop()
+        self.maxima.append((self.position, value))
+        if self.maxima[0][0] <= self.position - self.size:
+            self.maxima.popleft()
+        self.position += 1
+        self.ewma = value if self.ewma is None else self.alpha * value + (1 - self.alpha) * self.ewma
+
+    @property
+    def mean(self):
+        return self.total / len(self.values) if self.values else 0.0
+
+    @property
+    def max(self):
+        return self.maxima[0][1] if self.maxima else 0.0
+
+
+class PanicSeries:
+    """
+    Appends one PanicSample per analyzed capture and keeps the rolling window
+    for each investigation in memory. Each sample also updates one PanicRollup
+    row per bucket size, so the chart API reads at most a few hundred
+    pre-aggregated rows however long the investigation runs.
+
+    The series is ordered by (timestamp, id). The in-memory window is trusted
+    as is, since an investigation's requests stay on one worker (see
+    gunicorn.conf.py); it is loaded from the newest `window` samples when first
+    needed. A back-dated sample recomputes the rolling fields of every sample
+    after it, which costs one query plus one update per later sample.
+    """
+
+    def __init__(self, window=20, alpha=0.3, thresholds=None, hysteresis=10.0, bucket_sizes=(10, 60, 600, 3600)):
+        self.window = window
+        self.alpha = alpha
+        self.thresholds = dict(thresholds or {})
+        unknown = set(self.thresholds) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown panic alert metric(s): {', '.join(sorted(unknown))}")
+        self.hysteresis = hysteresis
+        self.bucket_sizes = tuple(sorted(bucket_sizes))
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _samples(investigation_id):
+        return PanicSample.query.filter_by(investigation_id=investigation_id)
+
+    def _seed(self, recent):
+        """A window as it stood right after recent[0], from the newest `window` samples (newest first)."""
+        state = RollingWindow(self.window, self.alpha)
+        for sample in reversed(recent):
+            state.push(sample.group_score)
+        if recent:
+            state.ewma = recent[0].ewma  # Exact, unlike replaying only the window
+            self._advance(state, recent[0])
+        return state
+
+    def _advance(self, state, sample):
+        state.last_time = _epoch(sample.timestamp)
+        values = self._metric_values(state, sample.group_score, sample.max_face_score)
+        state.armed = {metric: values[metric] < threshold for metric, threshold in self.thresholds.items()}
+
+    def _load_window(self, investigation_id):
+        return self._seed(self._samples(investigation_id)
+                          .order_by(PanicSample.timestamp.desc(), PanicSample.id.desc())
+                          .limit(self.window).all())
+
+    @staticmethod
+    def _metric_values(state, group_score, max_face_score):
+        return {'group': group_score, 'mean': state.mean, 'max': state.max,
+                'ewma': state.ewma, 'max_face': max_face_score}
+
+    def _update_rollups(self, investigation_id, timestamp, value):
+        epoch = int(_epoch(timestamp))
+        for seconds in self.bucket_sizes:
+            bucket_start = epoch - epoch % seconds
+            updated = (PanicRollup.query
+                       .filter_by(investigation_id=investigation_id, bucket_seconds=seconds, bucket_start=bucket_start)
+                       .update({PanicRollup.count: PanicRollup.count + 1,
+                                PanicRollup.total: PanicRollup.total + value,
+                                PanicRollup.max_score: case((PanicRollup.max_score < value, value),
+                                                            else_=PanicRollup.max_score)},
+                               synchronize_session=False))
+            if not updated:
+                db.session.add(PanicRollup(investigation_id=investigation_id, bucket_seconds=seconds,
+                                           bucket_start=bucket_start, count=1, total=value, max_score=value))
+
+    @staticmethod
+    def _apply(state, sample):
+        state.push(sample.group_score)
+        sample.rolling_mean, sample.rolling_max, sample.ewma = state.mean, state.max, state.ewma
+
+    def _check_alerts(self, state, sample):
+        fired = []
+        values = self._metric_values(state, sample.group_score, sample.max_face_score)
+        for metric, threshold in self.thresholds.items():
+            value = values[metric]
+            if state.armed.get(metric, True) and value >= threshold:
+                state.armed[metric] = False
+                fired.append(PanicAlert(investigation_id=sample.investigation_id, sample_id=sample.id,
+                                        metric=metric, value=value, threshold=threshold))
+            elif value < threshold - self.hysteresis:
+                state.armed[metric] = True  # Re-arm once it has clearly dropped back
+        return fired
+
+    def record(self, capture, analysis_results):
+        """Appends the capture's scores and returns (sample, alerts). Commits."""
+        if PanicSample.query.filter_by(capture_id=capture.id).first() is not None:
+            return None, []  # Re-analysis of the same capture does not add a point
+
+        group_score = _score(analysis_results.get('group_stats', {}).get('panic_score')) or 0.0
+        faces = analysis_results.get('faces', [])
+        face_scores = [s for s in (_score(f.get('panic_score')) for f in faces) if s is not None]
+        sample = PanicSample(
+            investigation_id=capture.investigation_id, capture_id=capture.id, timestamp=capture.timestamp,
+            group_score=group_score, max_face_score=max(face_scores, default=0.0),
+            face_count=len(faces), face_scores=json.dumps(face_scores),
+        )
+        with self._lock:
+            try:
+                state = self._windows.get(capture.investigation_id)
+                if state is None:
+                    state = self._windows[capture.investigation_id] = self._load_window(capture.investigation_id)
+                later = []
+                if state.last_time is not None and _epoch(capture.timestamp) < state.last_time:
+                    # Back-dated (e.g. an older capture analyzed late): start from the samples before it,
+                    # then recompute the rolling fields of every later sample so the series stays in time order
+                    samples = self._samples(capture.investigation_id)
+                    state = self._seed(samples.filter(PanicSample.timestamp <= capture.timestamp)
+                                       .order_by(PanicSample.timestamp.desc(), PanicSample.id.desc())
+                                       .limit(self.window).all())
+                    later = (samples.filter(PanicSample.timestamp > capture.timestamp)
+                             .order_by(PanicSample.timestamp, PanicSample.id).all())
+                self._apply(state, sample)
+                db.session.add(sample)
+                db.session.flush()
+                self._update_rollups(capture.investigation_id, capture.timestamp, group_score)
+                alerts = self._check_alerts(state, sample)
+                db.session.add_all(alerts)
+                if later:
+                    for later_sample in later:
+                        self._apply(state, later_sample)  # Alerts already raised for these stand
+                    self._advance(state, later[-1])
+                else:
+                    state.last_time = _epoch(sample.timestamp)
+                db.session.commit()
+                self._windows[capture.investigation_id] = state
+            except Exception:
+                db.session.rollback()
+                # The in-memory window already counted this sample; rebuild it next time
+                self._windows.pop(capture.investigation_id, None)
+                raise
+        return sample, alerts
+
+    def series(self, investigation_id, points=300):
+        """Chart data with at most ~`points` entries: raw samples if few enough, else the finest rollup that fits."""
+        coarsest = self.bucket_sizes[-1]
+        total = (db.session.query(func.coalesce(func.sum(PanicRollup.count), 0))
+                 .filter_by(investigation_id=investigation_id, bucket_seconds=coarsest).scalar())
+        if total <= points:
+            samples = self._samples(investigation_id).order_by(PanicSample.timestamp, PanicSample.id).all()
+            return {'resolution': 'raw', 'points': [sample_to_dict(s) for s in samples]}
+
+        for seconds in self.bucket_sizes:
+            buckets = (PanicRollup.query.filter_by(investigation_id=investigation_id, bucket_seconds=seconds)
+                       .order_by(PanicRollup.bucket_start))
+            if seconds == coarsest or buckets.count() <= points:
+                return {'resolution': seconds, 'points': [
+                    {'t': b.bucket_start, 'mean': round(b.total / b.count, 2), 'max': b.max_score, 'count': b.count}
+                    for b in buckets]}
+
+
+def sample_to_dict(sample):
+    return {
+        't': int(_epoch(sample.timestamp)),
+        'capture_id': sample.capture_id,
+        'group': sample.group_score,
+        'max_face': sample.max_face_score,
+        'faces': sample.face_count,
+        'mean': round(sample.rolling_mean, 2),
+        'max': sample.rolling_max,
+        'ewma': round(sample.ewma, 2),
+    }
+
+
+def alert_to_dict(alert):
+    return {
+        'id': alert.id,
+        'sample_id': alert.sample_id,
+        'metric': alert.metric,
+        'value': round(alert.value, 2),
+        'threshold': alert.threshold,
+        'timestamp': alert.timestamp.isoformat(),
+    }
+
+
+def get_panic_series():
+    return current_app.extensions['panic_series']
+
+
+def record_panic_sample(capture, analysis_results):
+    """Records a sample and pushes it (and any alerts) to live viewers; never breaks the caller's request."""
+    try:
+        sample, alerts = get_panic_series().record(capture, analysis_results)
+    except Exception as e:
+        print(f"[WARN] Could not record panic sample for capture {capture.id}: {e}")
+        return None
+    if sample is None:
+        return None
+    publish_event(capture.investigation_id, 'panic.sample', sample_to_dict(sample))
+    for alert in alerts:
+        print(f"[WARN] Panic alert on investigation {capture.investigation_id}: "
+              f"{alert.metric}={alert.value:.1f} >= {alert.threshold}")
+        publish_event(capture.investigation_id, 'panic.alert', alert_to_dict(alert))
+    return sample
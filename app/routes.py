@@ -4,15 +4,33 @@ import secrets
 from PIL import Image
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort
 from flask_login import current_user, login_user, logout_user, login_required
-from .models import db, User, Investigation, Report, ThreadFeedItem, Capture
+from werkzeug.exceptions import RequestEntityTooLarge
+from .models import db, User, Investigation, Report, ThreadFeedItem, Capture, PanicSample, PanicAlert
+from .capture_store import get_capture_store, read_capture_bytes
+from .exports import EXPORT_FORMATS, stream_export
+from .live_events import get_event_broker, publish_event, RETRY_WHEN_FULL_SECONDS
+from .inference import analyze_image_bytes
+from .user_cache import invalidate_user
+from .assets import get_asset_pipeline, ASSETS_URL_PATH
+from .admission import admission, get_admission, rejection_response, AdmissionRejected
+from .search import search_investigations, search_result_to_dict, MAX_PER_PAGE
+from .geo import apply_exif, captures_near, parse_time
+from .maintenance import delete_investigations, delete_user
+from .frame_buffer import get_frame_buffers, select_frames, FrameBuffersFull
+from .speaker_relay import get_speaker_relay, parse_endpoints
+from .near_duplicates import dhash, to_signed, get_near_duplicate_index
+from .panic_series import get_panic_series, record_panic_sample, sample_to_dict, alert_to_dict
+from .face_results import (record_face_results, filter_faces, emotion_histogram, demographics, face_to_dict,
+                           since_minutes, AGE_BANDS, GENDERS)
 from .forms import SignUpForm, LoginForm, UpdateProfileForm, NewInvestigationForm, EditInvestigationForm
 from collections import defaultdict,  OrderedDict
 from datetime import datetime, date, timedelta
 # THIS IS THE ONLY LINE THAT WAS CHANGED
 from sqlalchemy import func, case 
 import json
+import time
 import base64
-from flask import jsonify
+from flask import jsonify, Response
 import re
 import app.analysis_utils as analysis_utils
 import asyncio
@@ -30,11 +48,35 @@ main = Blueprint('main', __name__)
 # --- Context Processor ---
 @main.app_context_processor
 def inject_forms():
+    # Built on first use only, so pages without the investigation modals skip the form/CSRF setup
     return dict(
-        new_investigation_form=NewInvestigationForm(),
-        edit_investigation_form=EditInvestigationForm()
+        new_investigation_form=LazyForm(NewInvestigationForm),
+        edit_investigation_form=LazyForm(EditInvestigationForm)
     )
 
+class LazyForm:
+    """Stands in for a form in templates and constructs it on first attribute access."""
+    def __init__(self, form_class):
+        self._form_class = form_class
+        self._form = None
+
+    def _get(self):
+        if self._form is None:
+            self._form = self._form_class()
+        return self._form
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __iter__(self):
+        return iter(self._get())
+
+    def __getitem__(self, name):
+        return self._get()[name]
+
+    def __contains__(self, name):
+        return name in self._get()
+
 # --- Helper Function for Saving Picture ---
 def save_picture(form_picture):
     random_hex = secrets.token_hex(8)
@@ -48,6 +90,87 @@ def save_picture(form_picture):
     i.save(picture_path)
     return picture_fn
 
+# --- Helper Function for Capture JSON ---
+def capture_to_dict(capture, image_url=None):
+    return {
+        'id': capture.id,
+        'url': image_url or url_for('main.capture_file', filename=capture.image_filename),
+        'timestamp': capture.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+        'duplicate_of': capture.duplicate_of_id,
+        'taken_at': capture.taken_at.strftime('%Y-%m-%d %H:%M:%S') if capture.taken_at else None,
+        'latitude': capture.latitude,
+        'longitude': capture.longitude,
+        'altitude': capture.altitude,
+    }
+
+# --- Helper Function for Storing a Capture ---
+def store_capture(inv, image_bytes, analyze=False, timestamp=None):
+    """Stores one frame as a Capture of `inv` (upload or frame-buffer snapshot); returns the JSON response dict."""
+    # Near-identical frames (e.g. a hovering drone) are matched against this investigation's earlier captures
+    phash = dhash(image_bytes)
+    near_duplicates = get_near_duplicate_index()
+    duplicate_of = near_duplicates.find(inv.id, phash)
+    if duplicate_of is not None and db.session.get(Capture, duplicate_of[0]) is None:
+        near_duplicates.forget(inv.id)  # The original was deleted since the tree was built
+        duplicate_of = near_duplicates.find(inv.id, phash)
+    action = current_app.config['CAPTURE_NEAR_DUP_ACTION']
+
+    if duplicate_of is not None and action == 'skip_storage':
+        original = db.session.get(Capture, duplicate_of[0])
+        return {'success': True, 'skipped': True, 'capture_id': original.id,
+                'duplicate_of': original.id, 'distance': duplicate_of[1],
+                'image_url': url_for('main.capture_file', filename=original.image_filename)}
+
+    # Stored under its content hash; a repeated frame reuses the existing file
+    filename, _ = get_capture_store().save(image_bytes)
+
+    new_capture = Capture(image_filename=filename, investigation_id=inv.id,
+                          phash=to_signed(phash) if phash is not None else None,
+                          duplicate_of_id=duplicate_of[0] if duplicate_of else None,
+                          timestamp=timestamp or datetime.now(IST))
+    # GPS position, altitude and capture time from the EXIF header
+    apply_exif(new_capture, image_bytes)
+    db.session.add(new_capture)
+    db.session.commit()
+
+    image_url = url_for('main.capture_file', filename=filename)
+    # Push the new frame to open captures views instead of having them refetch the list
+    publish_event(inv.id, 'capture.created', capture_to_dict(new_capture, image_url))
+    response = {'success': True, 'capture_id': new_capture.id, 'image_url': image_url}
+    if duplicate_of is not None:
+        response['duplicate_of'], response['distance'] = duplicate_of
+
+    # Optional analyze-on-ingest straight from the uploaded bytes (no disk re-read)
+    skip_analysis = duplicate_of is not None and action == 'skip_analysis'
+    if not skip_analysis and analyze:
+        # Ingest analysis is optional: when the analysis slots are taken the frame is
+        # stored unanalyzed rather than queued behind /capture/<id>/analyze
+        controller = get_admission('analysis')
+        token = controller.try_acquire() if controller else None
+        if controller and token is None:
+            response['analysis'] = {'deferred': True}
+        else:
+            try:
+                analysis_results = analyze_image_bytes(image_bytes)
+            finally:
+                if token is not None:
+                    controller.release(token)
+            if "error" not in analysis_results:
+                save_analysis_results(new_capture, analysis_results)
+            response['analysis'] = analysis_results
+
+    return response
+
+
+# --- Helper Function for Persisting Analysis ---
+def save_analysis_results(capture, analysis_results):
+    publish_event(capture.investigation_id, 'analysis.completed', {
+        'capture_id': capture.id,
+        'group_stats': analysis_results.get('group_stats', {})
+    })
+    record_panic_sample(capture, analysis_results)
+    record_face_results(capture, analysis_results)
+
 # --- AI Assistant Configuration (can be placed before your 'main' blueprint) ---
 try:
     groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
@@ -153,11 +276,17 @@ def home():
 @main.route('/investigations')
 @login_required
 def investigations():
-    all_investigations = (
-        Investigation.query.filter_by(author=current_user)
-        .order_by(Investigation.timestamp.desc())
-        .all()
-    )
+    search_query = request.args.get('q', '').strip()
+    if search_query:
+        # Top-bar search: the best matches (see search.py), still grouped by day below
+        _, results = search_investigations(current_user.id, search_query, per_page=MAX_PER_PAGE)
+        all_investigations = [inv for inv, _ in results]
+    else:
+        all_investigations = (
+            Investigation.query.filter_by(author=current_user)
+            .order_by(Investigation.timestamp.desc())
+            .all()
+        )
 
     grouped_investigations = defaultdict(list)
 
@@ -176,10 +305,29 @@ def investigations():
     return render_template(
         'investigations.html',
         active_page='investigations',
-        grouped_investigations=sorted_grouped_investigations
+        grouped_investigations=sorted_grouped_investigations,
+        search_query=search_query
     )
 
 
+@main.route('/investigations/search', methods=['GET'])
+@login_required
+def search_investigations_api():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Missing search query (q)"}), 400
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_PER_PAGE)
+    total, results = search_investigations(current_user.id, query, page=page, per_page=per_page)
+    return jsonify({
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'results': [search_result_to_dict(inv, score) for inv, score in results],
+    })
+
+
 @main.route('/reports')
 @login_required
 def reports():
@@ -285,6 +433,7 @@ def profile():
         current_user.website_url = form.website_url.data
         current_user.bio = form.bio.data
         db.session.commit()
+        invalidate_user(current_user.id)
         flash('Your profile has been updated!', 'success')
         return redirect(url_for('main.profile'))
         
@@ -308,8 +457,10 @@ def profile():
 @main.route('/profile/delete', methods=['POST'])
 @login_required
 def delete_account():
-    db.session.delete(current_user)
-    db.session.commit()
+    user_id = current_user.id
+    # Investigations, captures and reports go with the account; files are removed in the background
+    delete_user(user_id)
+    invalidate_user(user_id)
     logout_user()
     flash('Your account has been permanently deleted.', 'info')
     return redirect(url_for('main.login'))
@@ -348,8 +499,8 @@ def delete_investigation(investigation_id):
     inv = Investigation.query.get_or_404(investigation_id)
     if inv.author != current_user:
         abort(403) # Forbidden
-    db.session.delete(inv)
-    db.session.commit()
+    # Bulk DELETEs instead of loading every capture; files are removed in the background
+    delete_investigations([inv.id])
     flash('Investigation has been deleted.', 'success')
     return redirect(url_for('main.investigations'))
 
@@ -399,6 +550,7 @@ def edit_investigation(investigation_id):
         inv.title = form.title.data
         inv.location = form.location.data
         inv.description = form.description.data
+        inv.speaker_endpoints = '\n'.join(parse_endpoints(form.speaker_endpoints.data)) or None
         if form.drone_photo.data:
             photo_file = save_picture(form.drone_photo.data)
             inv.drone_photo = photo_file
@@ -452,22 +604,160 @@ def save_capture(investigation_id):
     except (TypeError, base64.binascii.Error):
         return jsonify({'error': 'Invalid base64 data'}), 400
 
-    random_hex = secrets.token_hex(16)
-    filename = f"{random_hex}.jpg"
-    
-    captures_dir = os.path.join(current_app.root_path, 'static/captures')
-    os.makedirs(captures_dir, exist_ok=True)
-    file_path = os.path.join(captures_dir, filename)
+    analyze = data.get('analyze', current_app.config['CAPTURE_ANALYZE_ON_INGEST'])
+    return jsonify(store_capture(inv, image_bytes, analyze=analyze))
 
-    with open(file_path, 'wb') as f:
-        f.write(image_bytes)
-        
-    new_capture = Capture(image_filename=filename, investigation_id=inv.id)
-    db.session.add(new_capture)
-    db.session.commit()
 
-    image_url = url_for('static', filename=f'captures/{filename}')
-    return jsonify({'success': True, 'image_url': image_url})
+@main.route('/investigation/<int:investigation_id>/frames', methods=['POST'])
+@login_required
+def ingest_frame(investigation_id):
+    # Continuous feed: raw JPEG bodies (no base64, no JSON) into this worker's ring buffer
+    inv = Investigation.query.get_or_404(investigation_id)
+    if inv.author != current_user:
+        abort(403)
+
+    buffers = get_frame_buffers()
+    request.max_content_length = buffers.max_bytes  # A frame must fit the ring; refused before it is read
+    try:
+        frame = request.get_data(cache=False)
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Frames are limited to {buffers.max_bytes} bytes"}), 413
+    if not frame.startswith(b'\xff\xd8'):
+        return jsonify({"error": "Body must be a JPEG frame (Content-Type: image/jpeg)"}), 400
+    try:
+        seq = buffers.push(inv.id, frame)
+    except FrameBuffersFull as full:
+        return rejection_response(AdmissionRejected(503, str(full), full.retry_after))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    return jsonify({'seq': seq})
+
+
+@main.route('/investigation/<int:investigation_id>/frames', methods=['GET'])
+@login_required
+def frame_buffer_stats(investigation_id):
+    inv = Investigation.query.get_or_404(investigation_id)
+    if inv.author != current_user:
+        abort(403)
+    return jsonify(get_frame_buffers().stats(inv.id) or {'frames': 0})
+
+
+@main.route('/investigation/<int:investigation_id>/snapshot', methods=['POST'])
+@login_required
+def snapshot_frames(investigation_id):
+    """
+    Turns buffered frames into Captures: those from `before` seconds ahead of
+    the trigger up to `after` seconds past it (waiting for them to arrive),
+    at most `max_frames` of them evenly spaced. Nothing is re-uploaded.
+    """
+    inv = Investigation.query.get_or_404(investigation_id)
+    if inv.author != current_user:
+        abort(403)
+
+    data = request.get_json(silent=True) or {}
+    buffers = get_frame_buffers()
+    try:
+        before = min(max(float(data.get('before', 2.0)), 0.0), buffers.seconds)
+        after = min(max(float(data.get('after', 0.0)), 0.0), current_app.config['FRAME_SNAPSHOT_MAX_AFTER_SECONDS'])
+        max_frames = min(max(int(data.get('max_frames', 5)), 1), current_app.config['FRAME_SNAPSHOT_MAX_FRAMES'])
+    except (TypeError, ValueError):
+        return jsonify({"error": "before/after must be seconds and max_frames an integer"}), 400
+
+    trigger = time.time()
+    if after:
+        time.sleep(after)
+    frames = select_frames(buffers.snapshot(inv.id, since=trigger - before, until=trigger + after), max_frames)
+    if not frames:
+        return jsonify({"error": "No buffered frames in that window"}), 404
+
+    analyze = data.get('analyze', current_app.config['CAPTURE_ANALYZE_ON_INGEST'])
+    captures = []
+    for seq, timestamp, frame in frames:
+        result = store_capture(inv, frame, analyze=analyze, timestamp=datetime.fromtimestamp(timestamp, IST))
+        result['seq'] = seq
+        result['offset_seconds'] = round(timestamp - trigger, 3)  # Negative: before the trigger
+        captures.append(result)
+    return jsonify({'success': True, 'captures': captures})
+
+
+def _speaker_endpoints(inv):
+    # The investigation's own drones, else the deployment-wide SPEAKER_ENDPOINTS
+    return parse_endpoints(inv.speaker_endpoints) or parse_endpoints(current_app.config['SPEAKER_ENDPOINTS'])
+
+
+def _relay_response(result):
+    # 502 only when no drone accepted the command; partial success is reported per drone
+    result['success'] = any(drone['ok'] for drone in result['drones'])
+    return jsonify(result), 200 if result['success'] else 502
+
+
+@main.route('/investigation/<int:investigation_id>/speaker/play', methods=['POST'])
+@login_required
+def speaker_play(investigation_id):
+    """
+    Plays an uploaded clip on every drone speaker of the investigation: the
+    clip is transcoded once (cached by content hash) and sent to all drones
+    concurrently. Responds with each drone's status and round-trip time.
+    """
+    inv = Investigation.query.get_or_404(investigation_id)
+    if inv.author != current_user:
+        abort(403)
+
+    endpoints = _speaker_endpoints(inv)
+    if not endpoints:
+        return jsonify({"error": "No drone speakers are set for this investigation"}), 400
+    max_mb = current_app.config['SPEAKER_MAX_UPLOAD_MB']
+    request.max_content_length = int(max_mb * 2**20)  # Checked before the form is parsed
+    try:
+        upload = request.files.get('file')
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Clips are limited to {max_mb} MB"}), 413
+    if upload is None or not upload.filename:
+        return jsonify({"error": "No audio file provided"}), 400
+    try:
+        volume = min(max(int(request.form.get('volume', 70)), 0), 100)
+    except ValueError:
+        return jsonify({"error": "volume must be an integer from 0 to 100"}), 400
+
+    return _relay_response(get_speaker_relay().play(endpoints, upload.read(), upload.filename, volume))
+
+
+@main.route('/investigation/<int:investigation_id>/speaker/stop', methods=['POST'])
+@login_required
+def speaker_stop(investigation_id):
+    inv = Investigation.query.get_or_404(investigation_id)
+    if inv.author != current_user:
+        abort(403)
+
+    endpoints = _speaker_endpoints(inv)
+    if not endpoints:
+        return jsonify({"error": "No drone speakers are set for this investigation"}), 400
+    return _relay_response(get_speaker_relay().stop(endpoints))
+
+
+@main.route('/admission', methods=['GET'])
+@login_required
+def admission_stats():
+    # Queue depth and rejection counters of this worker's admission classes
+    return jsonify({name: controller.stats() for name, controller in current_app.extensions['admission'].items()})
+
+
+@main.route(f'{ASSETS_URL_PATH}/<path:filename>')
+def asset(filename):
+    # Fingerprinted, precompressed bundles from `flask assets build` (see assets.py)
+    return get_asset_pipeline().send(filename)
+
+
+@main.route('/captures/<filename>')
+@login_required
+def capture_file(filename):
+    store = get_capture_store()
+    if store.resolve(filename) is None:
+        # Archived investigations are served by byte offset from their pack file
+        packed = Capture.query.filter(Capture.image_filename == filename, Capture.pack_id.isnot(None)).first()
+        if packed is not None:
+            return store.send_packed(packed.pack.filename, packed.pack_offset, packed.pack_length, filename)
+    return store.send(filename)
 
 
 @main.route('/investigation/<int:investigation_id>/captures', methods=['GET'])
@@ -477,22 +767,150 @@ def get_captures(investigation_id):
     if inv.author != current_user:
         abort(403)
 
-    captures = Capture.query.filter_by(investigation_id=inv.id).order_by(Capture.timestamp.desc()).all()
+    query = Capture.query.filter_by(investigation_id=inv.id)
+    # Clients that already hold a list ask only for what is newer (e.g. after an SSE resync)
+    since_id = request.args.get('since_id', type=int)
+    if since_id is not None:
+        query = query.filter(Capture.id > since_id)
+    captures = query.order_by(Capture.timestamp.desc()).all()
 
-    captures_data = [{
-        'id': capture.id, # <-- ADDED THIS LINE
-        'url': url_for('static', filename=f'captures/{capture.image_filename}'),
-        'timestamp': capture.timestamp.strftime('%Y-%m-%d %H:%M:%S')
-    } for capture in captures]
+    captures_data = [capture_to_dict(capture) for capture in captures]
 
     return jsonify(captures_data)
 
 
+@main.route('/captures/near', methods=['GET'])
+@login_required
+def captures_near_point():
+    # Across all of the user's investigations unless investigation_id narrows it
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "lat and lon are required decimal degrees"}), 400
+    radius = request.args.get('radius', 200, type=float)
+    if not 0 < radius <= 100000:
+        return jsonify({"error": "radius must be between 0 and 100000 metres"}), 400
+    try:
+        start, end = parse_time(request.args.get('start')), parse_time(request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 times"}), 400
+
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    matches = captures_near(current_user.id, lat, lon, radius, start=start, end=end,
+                            investigation_id=request.args.get('investigation_id', type=int), limit=limit)
+    results = []
+    for capture, distance in matches:
+        item = capture_to_dict(capture)
+        item['investigation_id'] = capture.investigation_id
+        item['distance_m'] = round(distance, 1)
+        results.append(item)
+    return jsonify({'count': len(results), 'captures': results})
+
+
+@main.route('/investigation/<int:investigation_id>/panic-series', methods=['GET'])
+@login_required
+def panic_series(investigation_id):
+    inv = Investigation.query.get_or_404(investigation_id)
+    if inv.author != current_user:
+        abort(403)
+
+    points = min(max(request.args.get('points', 300, type=int), 10), 2000)
+    data = get_panic_series().series(inv.id, points=points)
+    latest = (PanicSample.query.filter_by(investigation_id=inv.id)
+              .order_by(PanicSample.timestamp.desc(), PanicSample.id.desc()).first())
+    data['latest'] = sample_to_dict(latest) if latest else None
+    alerts = PanicAlert.query.filter_by(investigation_id=inv.id).order_by(PanicAlert.id.desc()).limit(50).all()
+    data['alerts'] = [alert_to_dict(alert) for alert in alerts]
+    return jsonify(data)
+
+
+@main.route('/investigation/<int:investigation_id>/faces', methods=['GET'])
+@login_required
+def investigation_faces(investigation_id):
+    inv = Investigation.query.get_or_404(investigation_id)
+    if inv.author != current_user:
+        abort(403)
+
+    age_band = request.args.get('age_band')
+    gender = request.args.get('gender')
+    if age_band is not None and age_band not in AGE_BANDS:
+        return jsonify({"error": f"age_band must be one of {', '.join(AGE_BANDS)}"}), 400
+    if gender is not None and gender not in GENDERS.values():
+        return jsonify({"error": "gender must be M or F"}), 400
+
+    query = filter_faces(
+        inv.id,
+        since=since_minutes(request.args.get('since_minutes', type=int)),
+        age_band=age_band,
+        gender=gender,
+        emotion=request.args.get('emotion'),
+        min_fear=request.args.get('min_fear', type=float),
+    )
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    return jsonify({
+        'count': query.order_by(None).count(),
+        'faces': [face_to_dict(face) for face in query.limit(limit)],
+    })
+
+
+@main.route('/investigation/<int:investigation_id>/faces/stats', methods=['GET'])
+@login_required
+def investigation_face_stats(investigation_id):
+    inv = Investigation.query.get_or_404(investigation_id)
+    if inv.author != current_user:
+        abort(403)
+
+    since = since_minutes(request.args.get('since_minutes', type=int))
+    return jsonify({
+        'emotions': emotion_histogram(inv.id, since=since),
+        'demographics': demographics(inv.id, since=since),
+    })
+
+
+@main.route('/investigation/<int:investigation_id>/events', methods=['GET'])
+@login_required
+def investigation_events(investigation_id):
+    inv = Investigation.query.get_or_404(investigation_id)
+    if inv.author != current_user:
+        abort(403)
+
+    broker = get_event_broker()
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    sub = broker.subscribe(inv.id, last_event_id=last_event_id)
+    if sub is None:
+        return rejection_response(AdmissionRejected(503, "all live event streams are in use",
+                                                    RETRY_WHEN_FULL_SECONDS))
+    heartbeat = current_app.config['LIVE_EVENTS_HEARTBEAT_SECONDS']
+    # The stream can stay open for hours; don't hold a DB connection for it
+    db.session.close()
+
+    response = Response(broker.stream(sub, heartbeat=heartbeat), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # Also covers clients that drop before the first frame is sent
+    response.call_on_close(lambda: broker.unsubscribe(sub))
+    return response
+
+
+@main.route('/investigation/<int:investigation_id>/export.<fmt>', methods=['GET'])
+@login_required
+def export_investigation(investigation_id, fmt):
+    inv = Investigation.query.get_or_404(investigation_id)
+    if inv.author != current_user:
+        abort(403)
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    # Streamed straight from a yield_per query, so memory stays flat on large investigations
+    return stream_export(inv, fmt)
+
+
 # ================================================
 # START: NEW ROUTE FOR CAPTURE ANALYSIS
 # ================================================
 @main.route('/capture/<int:capture_id>/analyze', methods=['POST'])
 @login_required
+@admission('analysis')
 def analyze_capture(capture_id):
     capture = Capture.query.get_or_404(capture_id)
     investigation = Investigation.query.get_or_404(capture.investigation_id)
@@ -500,42 +918,18 @@ def analyze_capture(capture_id):
     if investigation.author != current_user:
         abort(403) # Ensure user has permission
 
-    # Construct the full path to the image file
-    image_path = os.path.join(current_app.root_path, 'static/captures', capture.image_filename)
-
-    if not os.path.exists(image_path):
+    # Read the image from the capture store (loose or packed) and analyze it in memory
+    image_bytes = read_capture_bytes(capture)
+    if image_bytes is None:
         return jsonify({"error": "Capture file not found."}), 404
 
     # Call the analysis function from our utility file
-    analysis_results = analysis_utils.analyze_image_from_path(image_path)
+    analysis_results = analyze_image_bytes(image_bytes)
 
     if "error" in analysis_results:
         return jsonify(analysis_results), 500
 
-    # ===== START: NEW CODE TO SAVE ANALYSIS =====
-    try:
-        # Check if analysis already exists to avoid duplicates
-        existing_analysis = AnalysisResult.query.filter_by(capture_id=capture.id).first()
-        if not existing_analysis:
-            existing_analysis = AnalysisResult(capture_id=capture.id)
-
-        group_stats = analysis_results.get('group_stats', {})
-        existing_analysis.male_count = group_stats.get('male_count', 0)
-        existing_analysis.female_count = group_stats.get('female_count', 0)
-        existing_analysis.panic_score = group_stats.get('panic_score', 0.0)
-        
-        # Aggregate emotions from individual faces into a dictionary
-        emotions = [face.get('emotion_label', 'unknown') for face in analysis_results.get('faces', [])]
-        emotion_counts = {emotion: emotions.count(emotion) for emotion in set(emotions) if emotion != 'unknown'}
-        existing_analysis.emotion_summary = emotion_counts
-
-        db.session.add(existing_analysis)
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error saving analysis result: {e}")
-    # ===== END: NEW CODE TO SAVE ANALYSIS =====
-
+    save_analysis_results(capture, analysis_results)
     return jsonify(analysis_results)
 # ================================================
 # END: NEW ROUTE FOR CAPTURE ANALYSIS
@@ -544,6 +938,7 @@ def analyze_capture(capture_id):
 # ===== ADD THIS NEW ROUTE AT THE END OF THE FILE =====
 @main.route('/voice-assistant', methods=['POST'])
 @login_required
+@admission('voice')
 async def voice_assistant():
     if 'audio_data' not in request.files:
         return jsonify({"error": "No audio file part"}), 400
@@ -567,13 +962,14 @@ async def voice_assistant():
             tmp_path = tmp.name
         
         # 1. Transcribe User's Speech
-        user_text = transcribe_audio_from_file(tmp_path)
+        # Blocking client calls go to a thread so they don't stall the shared event loop
+        user_text = await asyncio.to_thread(transcribe_audio_from_file, tmp_path)
         if not user_text:
             # If no speech is detected, return an empty success response
             return jsonify({"user_text": "", "ai_reply_text": "", "ai_reply_audio": ""})
 
         # 2. Get AI Text Response
-        ai_reply_text = get_ai_response_from_text(user_text, history)
+        ai_reply_text = await asyncio.to_thread(get_ai_response_from_text, user_text, history)
 
         # 3. Generate AI Speech
         if ai_reply_text: # Only generate speech if there is a reply
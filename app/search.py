@@ -0,0 +1,158 @@
+# app/search.py
+import re
+import weakref
+
+from sqlalchemy import event, inspect, text
+
+from .models import db, Investigation
+
+# Searchable columns with their rank weight (title matches count most)
+SEARCH_COLUMNS = [('title', 10.0), ('location', 5.0), ('drone_type', 2.0), ('description', 1.0)]
+MAX_PER_PAGE = 100
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_columns = ', '.join(name for name, _ in SEARCH_COLUMNS)
+_new_values = ', '.join(f'new.{name}' for name, _ in SEARCH_COLUMNS)
+_old_values = ', '.join(f'old.{name}' for name, _ in SEARCH_COLUMNS)
+
+# SQLite: an external-content FTS5 table (the text lives only in `investigation`)
+# kept in step by triggers, so ORM writes, bulk deletes and cascades all stay in sync.
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS investigation_fts USING fts5("
+    f"{_columns}, content='investigation', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS investigation_fts_ai AFTER INSERT ON investigation BEGIN "
+    f"INSERT INTO investigation_fts(rowid, {_columns}) VALUES (new.id, {_new_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS investigation_fts_ad AFTER DELETE ON investigation BEGIN "
+    f"INSERT INTO investigation_fts(investigation_fts, rowid, {_columns}) VALUES ('delete', old.id, {_old_values}); END",
+    # Only text edits touch the index; status changes do not
+    f"CREATE TRIGGER IF NOT EXISTS investigation_fts_au AFTER UPDATE OF {_columns} ON investigation BEGIN "
+    f"INSERT INTO investigation_fts(investigation_fts, rowid, {_columns}) VALUES ('delete', old.id, {_old_values}); "
+    f"INSERT INTO investigation_fts(rowid, {_columns}) VALUES (new.id, {_new_values}); END",
+]
+
+# Postgres: a stored generated tsvector (weights A-D in SEARCH_COLUMNS order) with a GIN index
+_tsvector = ' || '.join(f"setweight(to_tsvector('simple', coalesce({name}, '')), '{weight}')"
+                        for (name, _), weight in zip(SEARCH_COLUMNS, 'ABCD'))
+POSTGRES_DDL = [
+    f"ALTER TABLE investigation ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS ({_tsvector}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_investigation_search_vector ON investigation USING GIN (search_vector)",
+]
+
+
+# Backend per engine, probed on the first search: the schema only changes through migrations
+_backends = weakref.WeakKeyDictionary()
+
+
+def install_search_index(connection):
+    """Creates the engine's search index (idempotent); returns the backend now in use."""
+    dialect = connection.dialect.name
+    statements = SQLITE_DDL if dialect == 'sqlite' else POSTGRES_DDL if dialect == 'postgresql' else []
+    for statement in statements:
+        connection.execute(text(statement))
+    _backends.pop(connection.engine, None)
+    return search_backend(connection)
+
+
+def rebuild_search_index(connection):
+    """Re-reads every investigation into the index (e.g. after restoring a backup)."""
+    backend = install_search_index(connection)
+    if backend == 'fts5':
+        connection.execute(text("INSERT INTO investigation_fts(investigation_fts) VALUES ('rebuild')"))
+    return backend
+
+
+# Fresh databases (db.create_all) get the index together with the table
+@event.listens_for(Investigation.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    install_search_index(connection)
+
+
+def search_backend(connection):
+    """
+    'fts5', 'tsvector' or 'like' (no index installed, or another engine).
+    Probed once per engine, so restart the app after `flask db upgrade` has
+    installed the index from another process.
+    """
+    backend = _backends.get(connection.engine)
+    if backend is None:
+        backend = _backends[connection.engine] = _probe_backend(connection)
+    return backend
+
+
+def _probe_backend(connection):
+    inspector = inspect(connection)
+    if connection.dialect.name == 'sqlite' and inspector.has_table('investigation_fts'):
+        return 'fts5'
+    if connection.dialect.name == 'postgresql' and any(
+            column['name'] == 'search_vector' for column in inspector.get_columns('investigation')):
+        return 'tsvector'
+    return 'like'
+
+
+def search_terms(query):
+    return TOKEN_RE.findall(query or '')[:16]
+
+
+def _fts5_query(terms):
+    # Each word quoted (no FTS syntax from user input) and prefix-matched, all required
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def search_investigations(user_id, query, page=1, per_page=20):
+    """
+    The user's investigations matching every word of `query` (prefixes count,
+    so "flo pun" finds "Flood watch" in "Pune"), best matches first.
+    Returns (total, [(Investigation, score), ...]) for the requested page.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return 0, []
+    per_page = min(max(per_page, 1), MAX_PER_PAGE)
+    offset = (max(page, 1) - 1) * per_page
+    backend = search_backend(db.session.connection())
+
+    if backend == 'fts5':
+        weights = ', '.join(str(weight) for _, weight in SEARCH_COLUMNS)
+        match = ("FROM investigation_fts JOIN investigation ON investigation.id = investigation_fts.rowid "
+                 "WHERE investigation_fts MATCH :match AND investigation.user_id = :user_id")
+        params = {'match': _fts5_query(terms), 'user_id': user_id}
+        total = db.session.execute(text(f"SELECT count(*) {match}"), params).scalar()
+        rows = db.session.execute(text(
+            f"SELECT investigation.id, -bm25(investigation_fts, {weights}) AS score {match} "
+            f"ORDER BY bm25(investigation_fts, {weights}), investigation.id DESC LIMIT :limit OFFSET :offset"),
+            {**params, 'limit': per_page, 'offset': offset}).all()
+    elif backend == 'tsvector':
+        match = ("FROM investigation, to_tsquery('simple', :match) AS query "
+                 "WHERE search_vector @@ query AND user_id = :user_id")
+        params = {'match': ' & '.join(f"{term}:*" for term in terms), 'user_id': user_id}
+        total = db.session.execute(text(f"SELECT count(*) {match}"), params).scalar()
+        rows = db.session.execute(text(
+            f"SELECT id, ts_rank_cd(search_vector, query) AS score {match} "
+            f"ORDER BY score DESC, id DESC LIMIT :limit OFFSET :offset"),
+            {**params, 'limit': per_page, 'offset': offset}).all()
+    else:
+        # Unindexed fallback: a scan, newest first
+        scan = Investigation.query.filter_by(user_id=user_id)
+        for term in terms:
+            pattern = f"%{term}%"
+            scan = scan.filter(db.or_(*[getattr(Investigation, name).ilike(pattern) for name, _ in SEARCH_COLUMNS]))
+        total = scan.count()
+        rows = [(row.id, None) for row in scan.with_entities(Investigation.id)
+                .order_by(Investigation.timestamp.desc()).limit(per_page).offset(offset)]
+
+    by_id = {inv.id: inv for inv in Investigation.query.filter(Investigation.id.in_([row[0] for row in rows]))}
+    return total, [(by_id[row[0]], row[1]) for row in rows if row[0] in by_id]
+
+
+def search_result_to_dict(inv, score):
+    return {
+        'id': inv.id,
+        'title': inv.title,
+        'location': inv.location,
+        'drone_type': inv.drone_type,
+        'status': inv.status,
+        'timestamp': inv.timestamp.isoformat(),
+        'score': round(score, 6) if score is not None else None,
+    }
@@ -0,0 +1,165 @@
+# app/serving.py
+import asyncio
+import contextvars
+import gc
+import os
+import threading
+from concurrent.futures import Future
+
+
+DEFAULT_REQUEST_THREADS = 16
+
+
+def request_threads():
+    """
+    Request threads per process (WEB_THREADS): gunicorn's gthread pool, or
+    the a2wsgi pool under ASGI. Limits that hold a thread per request, like
+    live event streams, are sized from this.
+    """
+    return int(os.environ.get('WEB_THREADS', DEFAULT_REQUEST_THREADS))
+
+
+# --- Pre-fork model sharing ---
+def prepare_master():
+    """
+    Call in the pre-fork master before it builds the app. Keeps the master
+    single-threaded while it loads the models: an OpenMP pool started in the
+    parent can leave forked children hanging on their first parallel op.
+    Workers get their own thread counts in init_worker().
+    """
+    from . import analysis_utils
+    analysis_utils.configure_threads(1)
+
+
+def freeze_master():
+    """
+    Moves everything the master allocated (app, models) to the GC's permanent
+    generation just before forking, so collections in the workers do not
+    write to those pages and un-share them.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def init_worker(app, compute_threads):
+    """Call in each worker right after fork (gunicorn's post_fork)."""
+    from .models import db
+    from . import analysis_utils
+    with app.app_context():
+        db.engine.dispose(close=False)  # Never reuse the master's pooled connections
+    analysis_utils.reset_after_fork(compute_threads)
+
+
+def process_memory(pid='self'):
+    """
+    Resident memory of a process in bytes. `rss` counts shared pages in full
+    for every process mapping them; `pss` splits them between those processes
+    and `private` is what this process alone holds, so summing `pss` over the
+    master and workers gives the real total. Linux only; {} elsewhere.
+    """
+    fields = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared',
+              'Private_Clean': 'private', 'Private_Dirty': 'private'}
+    usage = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in fields:
+                    usage[fields[key]] = usage.get(fields[key], 0) + int(rest.split()[0]) * 1024
+    except OSError:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        usage['rss'] = int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return usage
+
+
+# --- Async views ---
+class EventLoopRunner:
+    """
+    Runs Flask's `async def` views on one long-lived event loop per process
+    instead of a fresh loop per request (Flask's default, via asgiref). The
+    loop runs on its own thread, or is the ASGI server's loop once attach()ed;
+    request threads block until their coroutine finishes, with the request
+    context carried over.
+
+    After a fork the loop thread is gone; the first call in the child starts
+    a new one.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def attach(self, loop):
+        with self._lock:
+            self.loop, self._thread, self._pid = loop, None, os.getpid()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self.loop is None or self._pid != os.getpid() or (self._thread and not self._thread.is_alive()):
+                self.loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self.loop.run_forever, name='async-views', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+            return self.loop
+
+    def run(self, coro):
+        loop = self._ensure_loop()
+        context = contextvars.copy_context()
+        future = Future()
+
+        def on_done(task):
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+        def schedule():
+            # Runs inside `context`, so the task inherits the caller's request/app context
+            loop.create_task(coro).add_done_callback(on_done)
+
+        loop.call_soon_threadsafe(schedule, context=context)
+        return future.result()
+
+    def async_to_sync(self, func):
+        """Drop-in for Flask.async_to_sync."""
+        def wrapper(*args, **kwargs):
+            return self.run(func(*args, **kwargs))
+        return wrapper
+
+
+def make_asgi_app(app, threads=None):
+    """
+    Wraps the WSGI app for an ASGI server (uvicorn, or gunicorn's
+    UvicornWorker). Sync views run on a pool of `threads`; async views run
+    on the server's own event loop. Needs the optional `a2wsgi` package.
+    """
+    try:
+        from a2wsgi import WSGIMiddleware
+    except ImportError:
+        raise RuntimeError("ASGI serving needs the 'a2wsgi' package (pip install a2wsgi uvicorn).") from None
+    wsgi = WSGIMiddleware(app, workers=threads or request_threads())
+    runner = app.extensions.get('event_loop')
+
+    async def application(scope, receive, send):
+        if runner is not None and runner.loop is not asyncio.get_running_loop():
+            runner.attach(asyncio.get_running_loop())
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        await wsgi(scope, receive, send)
+
+    return application
@@ -0,0 +1,343 @@
+# app/speaker_relay.py
+import hashlib
+import http.client
+import io
+import ipaddress
+import json
+import os
+import queue
+import re
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+FFMPEG = shutil.which('ffmpeg')
+CONTENT_TYPES = {'.mp3': 'audio/mpeg', '.wav': 'audio/wav', '.ogg': 'audio/ogg', '.m4a': 'audio/mp4',
+                 '.aac': 'audio/aac', '.flac': 'audio/flac'}
+ENDPOINT_SPLIT_RE = re.compile(r'[\s,]+')
+
+
+def parse_endpoints(value):
+    """Drone base URLs from text (one per line or comma separated) or a list; invalid entries are dropped."""
+    if not value:
+        return []
+    items = ENDPOINT_SPLIT_RE.split(value) if isinstance(value, str) else value
+    endpoints = []
+    for item in items:
+        url = item.strip().rstrip('/')
+        parts = urlsplit(url)
+        if parts.scheme in ('http', 'https') and parts.hostname and url not in endpoints:
+            endpoints.append(url)
+    return endpoints
+
+
+class EndpointNotAllowed(ValueError):
+    """A drone URL whose host does not resolve into SPEAKER_ALLOWED_NETWORKS."""
+
+
+def parse_networks(value):
+    """ip_network objects from CIDR strings ("10.84.160.0/24") or bare addresses; raises ValueError."""
+    return [ipaddress.ip_network(item, strict=False) for item in value or []]
+
+
+def resolve_endpoint(host, port, networks):
+    """
+    The first address `host` resolves to that lies in one of `networks`.
+    Drone URLs are entered by users, so the relay only ever connects to
+    this checked address, never to a fresh lookup of the name.
+    """
+    if not networks:
+        raise EndpointNotAllowed("Drone speakers are disabled: SPEAKER_ALLOWED_NETWORKS is empty.")
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise EndpointNotAllowed(f"{host} could not be resolved: {e}") from None
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if any(address.version == network.version and address in network for network in networks):
+            return str(address)
+    raise EndpointNotAllowed(f"{host} is not in SPEAKER_ALLOWED_NETWORKS.")
+
+
+# --- Transcoding ---
+class AudioTranscoder:
+    """
+    Turns an uploaded clip into compact mono audio for the drone speakers,
+    once: results are cached on disk under a hash of the source bytes and
+    the settings, so replaying a clip (to any number of drones) skips the
+    work. With ffmpeg installed the output is a low-bitrate MP3; without it
+    WAV input is downmixed and resampled to 16-bit mono WAV, and already
+    compressed formats are passed through unchanged.
+    """
+
+    def __init__(self, cache_folder, bitrate='48k', sample_rate=22050, max_cache_mb=200):
+        self.cache_folder = cache_folder
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.max_cache_bytes = int(max_cache_mb * 2**20)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(cache_folder, exist_ok=True)
+
+    def cache_key(self, data):
+        settings = f"{self.bitrate}|{self.sample_rate}|{'ffmpeg' if FFMPEG else 'native'}".encode()
+        return hashlib.sha256(settings + b'\0' + data).hexdigest()[:32]
+
+    def _cached(self, key):
+        for ext in CONTENT_TYPES:
+            path = os.path.join(self.cache_folder, key + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def transcode(self, data, filename=''):
+        """Returns (audio bytes, extension, cache key, was_cached)."""
+        key = self.cache_key(data)
+        try:
+            with self._lock_for(key):  # Concurrent plays of the same clip transcode it once
+                path = self._cached(key)
+                if path is not None:
+                    os.utime(path)  # Recently used clips survive trimming
+                    with open(path, 'rb') as f:
+                        return f.read(), os.path.splitext(path)[1], key, True
+
+                audio, ext = self._convert(data, os.path.splitext(filename)[1].lower())
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_folder, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(audio)
+                os.replace(tmp_path, os.path.join(self.cache_folder, key + ext))
+        finally:
+            with self._locks_guard:
+                self._locks.pop(key, None)
+        self._trim()
+        return audio, ext, key, False
+
+    def _convert(self, data, source_ext):
+        if FFMPEG:
+            try:
+                result = subprocess.run(
+                    [FFMPEG, '-v', 'error', '-i', 'pipe:0', '-vn', '-ac', '1', '-ar', str(self.sample_rate),
+                     '-b:a', self.bitrate, '-f', 'mp3', 'pipe:1'],
+                    input=data, capture_output=True, timeout=120, check=True)
+                if result.stdout:
+                    return result.stdout, '.mp3'
+            except (subprocess.SubprocessError, OSError) as e:
+                print(f"[WARN] ffmpeg could not transcode the clip, sending it as is: {e}")
+        if data[:4] == b'RIFF' and data[8:12] == b'WAVE':
+            try:
+                return self._downmix_wav(data), '.wav'
+            except Exception as e:
+                print(f"[WARN] Could not downmix WAV clip, sending it as is: {e}")
+        return data, source_ext if source_ext in CONTENT_TYPES else '.mp3'
+
+    def _downmix_wav(self, data):
+        from scipy.io import wavfile
+        from scipy.signal import resample_poly
+
+        rate, samples = wavfile.read(io.BytesIO(data))
+        if samples.dtype.kind in 'iu':
+            info = np.iinfo(samples.dtype)
+            samples = (samples.astype(np.float32) - (info.max + info.min + 1) / 2) / (2 ** (info.bits - 1))
+        samples = samples.astype(np.float32)
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)
+        if rate > self.sample_rate:
+            divisor = np.gcd(rate, self.sample_rate)
+            samples = resample_poly(samples, self.sample_rate // divisor, rate // divisor)
+            rate = self.sample_rate
+        out = io.BytesIO()
+        wavfile.write(out, rate, (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16))
+        return out.getvalue()
+
+    def _trim(self):
+        entries = []
+        for name in os.listdir(self.cache_folder):
+            path = os.path.join(self.cache_folder, name)
+            if not name.endswith('.tmp') and os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_cache_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+# --- Drone connections ---
+class DronePool:
+    """
+    Keep-alive HTTP connections to one drone's speaker service, reused across
+    requests. Every new connection re-resolves the host and checks the address
+    against `networks` first (raising EndpointNotAllowed).
+    """
+
+    def __init__(self, base_url, size=2, timeout=10.0, networks=()):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self.prefix = parts.path.rstrip('/')
+        self._factory = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._host, self._port = parts.hostname, parts.port
+        self.timeout = timeout
+        self.networks = networks
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.connections_opened = 0
+
+    def _connect(self):
+        conn = self._factory(self._host, self._port, timeout=self.timeout)
+        address = resolve_endpoint(self._host, conn.port, self.networks)
+        # Connect to the checked address; TLS still verifies (and sends SNI for) the host name
+        conn._create_connection = lambda addr, *args: socket.create_connection((address, addr[1]), *args)
+        self.connections_opened += 1
+        return conn
+
+    def request(self, method, path, body=None, headers=None):
+        """Returns (status, body bytes). A stale pooled connection is retried once on a fresh one."""
+        try:
+            conn, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._connect(), False
+        try:
+            try:
+                conn.request(method, self.prefix + path, body=body, headers=headers or {})
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                conn.close()
+                conn = self._connect()
+                conn.request(method, self.prefix + path, body=body, headers=headers or {})
+                response = conn.getresponse()
+            payload = response.read()
+        except BaseException:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+        return response.status, payload
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _multipart(fields, files):
+    """multipart/form-data body and content type; built once and sent to every drone."""
+    boundary = uuid.uuid4().hex
+    out = io.BytesIO()
+    for name, value in fields.items():
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content_type, data) in files.items():
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                  f'Content-Type: {content_type}\r\n\r\n'.encode())
+        out.write(data)
+        out.write(b'\r\n')
+    out.write(f'--{boundary}--\r\n'.encode())
+    return out.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+class SpeakerRelay:
+    """
+    Relays speaker commands to an investigation's drones. A clip is
+    transcoded (or fetched from the cache) once, encoded into one upload body
+    and sent to every drone at the same time over pooled keep-alive
+    connections, so N drones take about as long as the slowest one.
+    The drones speak the Pi audio service's API: POST /upload (multipart
+    `file` + `volume`) and POST /stop.
+    """
+
+    def __init__(self, transcoder, pool_size=2, timeout=10.0, max_workers=16, allowed_networks=()):
+        self.transcoder = transcoder
+        self.allowed_networks = parse_networks(allowed_networks)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._pools = {}
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self, endpoint):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Created lazily and per process: sockets and threads do not survive a fork
+                self._pools, self._executor, self._pid = {}, None, os.getpid()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='speaker-relay')
+            if endpoint not in self._pools:
+                self._pools[endpoint] = DronePool(endpoint, size=self.pool_size, timeout=self.timeout,
+                                                  networks=self.allowed_networks)
+            return self._pools[endpoint]
+
+    def _send(self, pool, method, path, body, headers):
+        start = time.perf_counter()
+        result = {'endpoint': pool.base_url, 'ok': False, 'status': None}
+        try:
+            status, payload = pool.request(method, path, body, headers)
+            result['status'] = status
+            result['ok'] = 200 <= status < 300
+            try:
+                message = json.loads(payload).get('message')
+            except (ValueError, AttributeError):
+                message = None
+            # Only a drone's own JSON message is passed on, never the body of some other service
+            result['message'] = message[:200] if isinstance(message, str) else 'Reply was not a drone speaker message'
+        except EndpointNotAllowed as e:
+            result['message'] = str(e)
+        except (OSError, http.client.HTTPException) as e:
+            result['message'] = f"Unreachable: {e}"
+        result['ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def check_endpoint(self, endpoint):
+        """Raises EndpointNotAllowed unless the URL's host resolves into the allowed networks."""
+        parts = urlsplit(endpoint)
+        resolve_endpoint(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80),
+                         self.allowed_networks)
+
+    def broadcast(self, endpoints, method, path, body=None, headers=None):
+        pools = [self._pool(endpoint) for endpoint in endpoints]
+        futures = [self._executor.submit(self._send, pool, method, path, body, headers) for pool in pools]
+        return [future.result() for future in futures]
+
+    def play(self, endpoints, data, filename='clip', volume=None):
+        audio, ext, key, cached = self.transcoder.transcode(data, filename)
+        fields = {'volume': volume} if volume is not None else {}
+        name = secure_filename(os.path.splitext(filename)[0]) or 'clip'
+        body, content_type = _multipart(fields, {'file': (f'{name}{ext}', CONTENT_TYPES[ext], audio)})
+        results = self.broadcast(endpoints, 'POST', '/upload', body,
+                                 {'Content-Type': content_type, 'Content-Length': str(len(body))})
+        return {'clip': key, 'format': ext[1:], 'bytes': len(audio), 'source_bytes': len(data),
+                'cached': cached, 'drones': results}
+
+    def stop(self, endpoints):
+        return {'drones': self.broadcast(endpoints, 'POST', '/stop', b'', {'Content-Length': '0'})}
+
+
+def get_speaker_relay():
+    return current_app.extensions['speaker_relay']
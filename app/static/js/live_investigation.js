@@ -27,41 +27,92 @@ document.addEventListener('DOMContentLoaded', function () {
         // Initialize a variable to hold the count
         let totalCaptures = parseInt(captureCountDisplay.textContent.replace(/\D/g, ''), 10) || 0;
 
+        // Adds a thumbnail once per capture, whether it came from our own POST
+        // or from the live event stream (e.g. a drone posting frames directly).
+        const addThumbnail = (captureId, imageUrl) => {
+            const capturesGrid = document.getElementById('captures-grid');
+            if (!capturesGrid) return;
+            if (captureId && capturesGrid.querySelector(`[data-capture-id="${captureId}"]`)) return;
+
+            const maxThumbnails = 12;
+            if (capturesGrid.children.length >= maxThumbnails) {
+                capturesGrid.removeChild(capturesGrid.lastElementChild); // Remove the oldest
+            }
+            const img = document.createElement('img');
+            img.src = imageUrl;
+            img.classList.add('capture-thumbnail');
+            if (captureId) img.dataset.captureId = captureId;
+            capturesGrid.prepend(img); // Add new capture to the start
+            // ===== START: NEW COUNTER LOGIC =====
+            totalCaptures++; // Increment the count
+            captureCountDisplay.textContent = `(${totalCaptures})`; // Update the display
+            // ===== END: NEW COUNTER LOGIC =====
+        };
+
+        // --- Live Capture Events (Server-Sent Events) ---
+        const connectLiveEvents = () => {
+            const liveEvents = new EventSource(`/investigation/${investigationId}/events`);
+            // A 503 (every stream slot busy) closes the source for good instead of retrying
+            liveEvents.addEventListener('error', () => {
+                if (liveEvents.readyState === EventSource.CLOSED) setTimeout(connectLiveEvents, 30000);
+            });
+            liveEvents.addEventListener('capture.created', (e) => {
+                const capture = JSON.parse(e.data);
+                addThumbnail(capture.id, capture.url);
+            });
+            // Rolling panic score; an alert highlights it until it drops back
+            const panicValue = document.getElementById('live-panic-value');
+            liveEvents.addEventListener('panic.sample', (e) => {
+                const sample = JSON.parse(e.data);
+                if (panicValue) panicValue.textContent = `${Math.round(sample.ewma)}%`;
+            });
+            liveEvents.addEventListener('panic.alert', (e) => {
+                const alert = JSON.parse(e.data);
+                if (!panicValue) return;
+                panicValue.classList.add('status-tag', 'status-live');
+                panicValue.title = `Panic alert: ${alert.metric} ${Math.round(alert.value)} >= ${alert.threshold}`;
+                setTimeout(() => panicValue.classList.remove('status-tag', 'status-live'), 30000);
+            });
+            window.addEventListener('beforeunload', () => liveEvents.close());
+        };
+        if (window.EventSource) connectLiveEvents();
+
+        // Uploads the frame currently shown in the feed (used when nothing streams into the frame buffer)
+        const captureFromFeed = () => {
+            const canvas = document.getElementById('canvas');
+            const feed = document.getElementById('camera-feed');
+            const ready = feed && (feed.readyState >= 3 || (feed.complete && feed.naturalWidth > 0));
+            if (!canvas || !ready) return Promise.resolve({ success: false, error: 'Camera feed not ready' });
+
+            const context = canvas.getContext('2d');
+            canvas.width = feed.videoWidth || feed.naturalWidth;
+            canvas.height = feed.videoHeight || feed.naturalHeight;
+            context.drawImage(feed, 0, 0, canvas.width, canvas.height);
+            const dataUrl = canvas.toDataURL('image/jpeg');
+            return fetch(`/investigation/${investigationId}/capture`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ image_data: dataUrl })
+            }).then(response => response.json())
+              .then(data => ({ success: data.success, error: data.error, captures: [data] }));
+        };
+
         if (captureBtn) {
             captureBtn.addEventListener('click', () => {
-                const canvas = document.getElementById('canvas');
-                const capturesGrid = document.getElementById('captures-grid');
-                if (!canvas || !capturesGrid || !video || video.readyState < 3) return;
-
-                const context = canvas.getContext('2d');
-                canvas.width = video.videoWidth;
-                canvas.height = video.videoHeight;
-                context.drawImage(video, 0, 0, canvas.width, canvas.height);
-                const dataUrl = canvas.toDataURL('image/jpeg');
-                
                 captureBtn.disabled = true;
                 captureBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Saving...';
 
-                fetch(`/investigation/${investigationId}/capture`, {
+                // Snapshot the server-side frame buffer (including the seconds before the click);
+                // 404 means no frames are streaming in, so fall back to grabbing the feed
+                fetch(`/investigation/${investigationId}/snapshot`, {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ image_data: dataUrl })
+                    body: JSON.stringify({ before: 2, max_frames: 5 })
                 })
-                .then(response => response.json())
+                .then(response => response.status === 404 ? captureFromFeed() : response.json())
                 .then(data => {
                     if (data.success) {
-                        const maxThumbnails = 12;
-                        if (capturesGrid.children.length >= maxThumbnails) {
-                            capturesGrid.removeChild(capturesGrid.lastChild); // Remove the oldest
-                        }
-                        const img = document.createElement('img');
-                        img.src = data.image_url;
-                        img.classList.add('capture-thumbnail');
-                        capturesGrid.prepend(img); // Add new capture to the start
-                        // ===== START: NEW COUNTER LOGIC =====
-                        totalCaptures++; // Increment the count
-                        captureCountDisplay.textContent = `(${totalCaptures})`; // Update the display
-                        // ===== END: NEW COUNTER LOGIC =====
+                        data.captures.forEach(capture => addThumbnail(capture.capture_id, capture.image_url));
                     } else {
                         console.error('Failed to save capture:', data.error);
                     }
@@ -106,7 +157,16 @@ document.addEventListener('DOMContentLoaded', function () {
             }
         });
         // ===== START: NEW DRONE SPEAKER MODAL LOGIC =====
-        const API_URL = "http://10.84.160.98:5000"; // Drone/Pi's IP Address
+        // The server relays to every drone speaker set on the investigation (see speaker_relay.py)
+        const SPEAKER_URL = `/investigation/${investigationId}/speaker`;
+        const describeRelay = (data) => {
+            if (!data.drones) return data.error || "Error: Could not reach the drone speakers.";
+            const reached = data.drones.filter(drone => drone.ok).length;
+            const failed = data.drones.filter(drone => !drone.ok).map(drone => drone.endpoint);
+            let text = `${reached}/${data.drones.length} drone speakers: ${data.drones.find(drone => drone.ok)?.message || 'no response'}`;
+            if (failed.length) text += ` (unreachable: ${failed.join(', ')})`;
+            return text;
+        };
 
         // Get modal elements
         const speakerModal = document.getElementById('drone-speaker-modal-overlay');
@@ -143,11 +203,10 @@ document.addEventListener('DOMContentLoaded', function () {
                 statusDiv.innerText = "Uploading and sending command...";
 
                 try {
-                    const res = await fetch(`${API_URL}/upload`, { method: "POST", body: formData });
-                    const data = await res.json();
-                    statusDiv.innerText = data.message || "Success! Music is playing.";
+                    const res = await fetch(`${SPEAKER_URL}/play`, { method: "POST", body: formData });
+                    statusDiv.innerText = describeRelay(await res.json());
                 } catch (err) {
-                    statusDiv.innerText = "Error: Could not connect to the drone's audio system.";
+                    statusDiv.innerText = "Error: Could not reach the server.";
                     console.error(err);
                 }
             });
@@ -156,11 +215,10 @@ document.addEventListener('DOMContentLoaded', function () {
             stopBtn.addEventListener('click', async () => {
                 statusDiv.innerText = "Sending stop command...";
                 try {
-                    const res = await fetch(`${API_URL}/stop`, { method: "POST" });
-                    const data = await res.json();
-                    statusDiv.innerText = data.message;
+                    const res = await fetch(`${SPEAKER_URL}/stop`, { method: "POST" });
+                    statusDiv.innerText = describeRelay(await res.json());
                 } catch (err) {
-                    statusDiv.innerText = "Error: Could not connect to the drone's audio system.";
+                    statusDiv.innerText = "Error: Could not reach the server.";
                     console.error(err);
                 }
             });
@@ -267,6 +325,16 @@ document.addEventListener('DOMContentLoaded', function () {
         try {
             const response = await fetch('/voice-assistant', { method: 'POST', body: formData });
             
+            if (response.status === 429 || response.status === 503) {
+                // Server busy: wait as long as it asks before listening again
+                const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 1;
+                if (isAssistantListening) {
+                    setStatus(`Server busy, retrying in ${retryAfter}s...`, 'processing');
+                    setTimeout(runAssistantCycle, retryAfter * 1000);
+                }
+                return;
+            }
+
             if (!response.ok) {
                 // Handle server errors (like 500)
                 throw new Error(`Server responded with status: ${response.status}`);
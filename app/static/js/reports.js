@@ -144,6 +144,7 @@ document.addEventListener('DOMContentLoaded', function () {
     const personDetailsModal = document.getElementById('person-details-modal-overlay');
     const allModals = [capturesModal, groupAnalysisModal, personDetailsModal];
     let modalStack = [];
+    let captureEvents = null; // Live SSE stream for the open captures modal
 
     // --- 2. Modal Stack Management ---
     function openModal(modal) {
@@ -159,6 +160,9 @@ document.addEventListener('DOMContentLoaded', function () {
         if (modalStack.length === 0) return;
         const closingModal = modalStack.pop();
         closingModal.classList.remove('active');
+        if (closingModal === capturesModal) {
+            stopCaptureEvents();
+        }
 
         if (modalStack.length > 0) {
             const newTopModal = modalStack[modalStack.length - 1];
@@ -200,26 +204,42 @@ document.addEventListener('DOMContentLoaded', function () {
         modalGrid.innerHTML = '<p class="placeholder-text">Loading...</p>';
         openModal(capturesModal);
         
+        let captureCount = 0;
+        let latestCaptureId = 0;
+
+        const addCaptureToGrid = (capture, prepend) => {
+            if (modalGrid.querySelector(`[data-capture-id="${capture.id}"]`)) return;
+            const placeholder = modalGrid.querySelector('.placeholder-text');
+            if (placeholder) placeholder.remove();
+
+            const imgWrapper = document.createElement('div');
+            imgWrapper.className = 'capture-image-wrapper';
+            imgWrapper.dataset.captureId = capture.id; // IMPORTANT
+            imgWrapper.innerHTML = `<img src="${capture.url}" alt="Capture" loading="lazy">`;
+            if (prepend) {
+                modalGrid.prepend(imgWrapper);
+            } else {
+                modalGrid.appendChild(imgWrapper);
+            }
+            captureCount++;
+            latestCaptureId = Math.max(latestCaptureId, capture.id);
+            modalSubtitle.textContent = `Viewing ${captureCount} captured images for this investigation.`;
+        };
+
         fetch(`/investigation/${investigationId}/captures`)
             .then(response => response.json())
             .then(captures => {
                 // ===== START: MODIFIED SECTION =====
-                const captureCount = captures.length; // 3. Get the count
-                modalSubtitle.textContent = `Viewing ${captureCount} captured images for this investigation.`; // 4. Update the text
+                modalSubtitle.textContent = `Viewing ${captures.length} captured images for this investigation.`; // 4. Update the text
                 // ===== END: MODIFIED SECTION =====
                 
                 modalGrid.innerHTML = '';
                 if (captures.length > 0) {
-                    captures.forEach(capture => {
-                        const imgWrapper = document.createElement('div');
-                        imgWrapper.className = 'capture-image-wrapper';
-                        imgWrapper.dataset.captureId = capture.id; // IMPORTANT
-                        imgWrapper.innerHTML = `<img src="${capture.url}" alt="Capture">`;
-                        modalGrid.appendChild(imgWrapper);
-                    });
+                    captures.forEach(capture => addCaptureToGrid(capture, false));
                 } else {
                     modalGrid.innerHTML = '<p class="placeholder-text">No captures found.</p>';
                 }
+                startCaptureEvents(investigationId, addCaptureToGrid, () => latestCaptureId);
             })
             .catch(error => {
                 console.error('Error fetching captures:', error);
@@ -228,6 +248,48 @@ document.addEventListener('DOMContentLoaded', function () {
             });
     });
 
+    // --- 4b. Live Capture Deltas (Server-Sent Events) ---
+    // New captures and finished analyses are pushed by the server, so the open
+    // modal only applies deltas instead of refetching the whole list.
+    function startCaptureEvents(investigationId, addCapture, getLatestId) {
+        stopCaptureEvents();
+        if (!window.EventSource) return;
+
+        const source = captureEvents = new EventSource(`/investigation/${investigationId}/events`);
+        // A 503 (every stream slot busy) closes the source for good: retry later if still open
+        source.addEventListener('error', () => {
+            if (source.readyState !== EventSource.CLOSED) return;
+            setTimeout(() => {
+                if (captureEvents === source) startCaptureEvents(investigationId, addCapture, getLatestId);
+            }, 30000);
+        });
+        captureEvents.addEventListener('capture.created', (e) => {
+            addCapture(JSON.parse(e.data), true);
+        });
+        captureEvents.addEventListener('analysis.completed', (e) => {
+            const data = JSON.parse(e.data);
+            const wrapper = capturesModal.querySelector(`[data-capture-id="${data.capture_id}"]`);
+            if (wrapper && data.group_stats && data.group_stats.panic_score !== undefined) {
+                wrapper.classList.add('analyzed');
+                wrapper.title = `Panic score: ${data.group_stats.panic_score}%`;
+            }
+        });
+        // The server could not replay everything we missed: fetch only the newer captures
+        captureEvents.addEventListener('resync', () => {
+            fetch(`/investigation/${investigationId}/captures?since_id=${getLatestId()}`)
+                .then(response => response.json())
+                .then(captures => captures.reverse().forEach(capture => addCapture(capture, true)))
+                .catch(error => console.error('Error resyncing captures:', error));
+        });
+    }
+
+    function stopCaptureEvents() {
+        if (captureEvents) {
+            captureEvents.close();
+            captureEvents = null;
+        }
+    }
+
     // --- 5. Capture Click -> Open Group Analysis Modal ---
     capturesModal.querySelector('#captures-modal-grid').addEventListener('click', (e) => {
         const wrapper = e.target.closest('.capture-image-wrapper');
@@ -272,11 +334,13 @@ document.addEventListener('DOMContentLoaded', function () {
                     card.dataset[key] = face[key];
                 });
                 
+                // Gated faces (too small, blurred, low confidence) have no emotion or panic score
+                const panicText = face.gated ? `Skipped (${face.gated.replace('_', ' ')})` : `Panic: ${face.panic_score}%`;
                 card.innerHTML = `
                     <img src="${face.crop_base64}" alt="Face crop">
                     <div class="face-card-info">
                         ${face.gender}, ${face.age_range}<br>
-                        <strong>Panic: ${face.panic_score}%</strong>
+                        <strong>${panicText}</strong>
                     </div>
                 `;
                 grid.appendChild(card);
@@ -301,7 +365,7 @@ document.addEventListener('DOMContentLoaded', function () {
         document.getElementById('person-detail-emotion').textContent = personData.emotion_label;
         document.getElementById('person-detail-vulnerability').textContent = personData.vulnerability;
         document.getElementById('person-detail-fear').textContent = personData.fear_score;
-        document.getElementById('person-detail-panic').innerHTML = `${personData.panic_score}%`;
+        document.getElementById('person-detail-panic').innerHTML = personData.gated ? 'N/A' : `${personData.panic_score}%`;
 
         openModal(personDetailsModal);
     }
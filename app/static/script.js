@@ -254,6 +254,7 @@ document.addEventListener('DOMContentLoaded', function () {
                     editForm.querySelector('[name="title"]').value = card.dataset.title;
                     editForm.querySelector('[name="location"]').value = card.dataset.location;
                     editForm.querySelector('[name="description"]').value = card.dataset.description;
+                    editForm.querySelector('[name="speaker_endpoints"]').value = card.dataset.speakerEndpoints;
                     editForm.action = `/investigation/${id}/edit`;
                     if (editModalOverlay) editModalOverlay.classList.add('active');
                 } else if (action === 'delete') {
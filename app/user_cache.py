@@ -0,0 +1,61 @@
+# app/user_cache.py
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from .models import db, User
+
+
+class UserCache:
+    """
+    Short-TTL cache for the logged-in user, so `load_user` does not query the
+    DB on every request. Only column values are cached; each request gets its
+    own instance merged into its session without SQL (merge(load=False)), so
+    relationships, updates and deletes behave exactly as for a queried user.
+
+    The cache is per process: a profile update invalidates this worker at
+    once, and other workers see it once the TTL expires.
+    """
+
+    def __init__(self, ttl=30, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._columns = [attr.key for attr in inspect(User).column_attrs]
+
+    def load(self, user_id):
+        if not self.ttl:
+            return db.session.get(User, user_id)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            user = User(**entry[1])
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+        user = db.session.get(User, user_id)
+        if user is not None:
+            values = {key: getattr(user, key) for key in self._columns}
+            with self._lock:
+                if len(self._entries) >= self.max_size:
+                    self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                self._entries[user_id] = (now + self.ttl, values)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+def get_user_cache():
+    return current_app.extensions['user_cache']
+
+
+def invalidate_user(user_id):
+    get_user_cache().invalidate(user_id)
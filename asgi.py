@@ -0,0 +1,6 @@
+# asgi.py
+"""ASGI entry point: `WEB_ASGI=1 gunicorn -c gunicorn.conf.py`, or `uvicorn asgi:application`."""
+from app.serving import make_asgi_app
+from wsgi import app
+
+application = make_asgi_app(app)  # WEB_THREADS sync-view threads, as for gthread
@@ -0,0 +1,197 @@
+# benchmarks/bench_analysis.py
+"""
+Offline micro-benchmarks for the analysis and panic-scoring hot paths.
+
+    python -m benchmarks.bench_analysis -o benchmarks/results/analysis.json
+    python -m benchmarks.compare old.json new.json
+
+Scoring helpers run as-is. The full pipeline runs against the deterministic
+stand-in models from benchmarks/stubs.py, and additionally against the real
+buffalo_l / ViT models when both are already in the local caches (nothing is
+ever downloaded).
+"""
+import argparse
+import glob
+import os
+import tempfile
+import threading
+
+# Never reach for the network, even if a model is missing from the cache
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+import numpy as np
+
+import app.analysis_utils as analysis_utils
+from app.admission import AdmissionController
+from benchmarks.harness import bench, save_results
+from benchmarks.stubs import install_stub_models, restore_models, synthetic_frame, synthetic_jpeg
+
+EMOTION_MODEL_ID = "abhilash88/face-emotion-detection"
+
+
+def _face_data(n, seed=0):
+    rng = np.random.default_rng(seed)
+    faces = []
+    for _ in range(n):
+        age_vuln = float(rng.choice([1.0, 0.6, 0.2, 0.9]))
+        fear = float(rng.uniform(0, 1))
+        gender_score = float(rng.choice([0.8, 1.0]))
+        conf = float(rng.uniform(0.5, 1.0))
+        raw, _ = analysis_utils.compute_panic_score(age_vuln, fear, gender_score, conf)
+        faces.append({'emo_fear': fear, 'age_vuln': age_vuln, 'gender_score': gender_score,
+                      'face_conf': conf, 'raw_score': raw})
+    return faces
+
+
+def scoring_benchmarks(opts):
+    results = [
+        bench('age_to_range', lambda: analysis_utils.age_to_range(37), **opts),
+        bench('age_to_range[sweep 0-99]', lambda: [analysis_utils.age_to_range(a) for a in range(100)], **opts),
+        bench('compute_panic_score', lambda: analysis_utils.compute_panic_score(0.6, 0.42, 0.8, 0.91), **opts),
+    ]
+    for n in (1, 8, 32):
+        faces = _face_data(n)
+        results.append(bench(f'compute_group_panic[{n} faces]', lambda: analysis_utils.compute_group_panic(faces), **opts))
+    return results
+
+
+def encoding_benchmarks(opts):
+    crop = synthetic_frame(112, 112, seed=1)
+    frame = synthetic_frame(640, 480, seed=2)
+    jpeg_4k = synthetic_jpeg(3840, 2160, seed=3)
+    return [
+        bench('image_to_base64[112x112 crop]', lambda: analysis_utils.image_to_base64(crop), **opts),
+        bench('image_to_base64[640x480 frame]', lambda: analysis_utils.image_to_base64(frame), **opts),
+        bench('decode_image_bytes[4K, full]', lambda: analysis_utils.decode_image_bytes(jpeg_4k, min_side=None), **opts),
+        bench('decode_image_bytes[4K, reduced]', lambda: analysis_utils.decode_image_bytes(jpeg_4k), **opts),
+    ]
+
+
+def pipeline_benchmarks(opts, label, workdir):
+    results = []
+    for width, height in ((1280, 720), (3840, 2160)):
+        data = synthetic_jpeg(width, height, seed=width)
+        path = os.path.join(workdir, f'frame_{width}x{height}.jpg')
+        with open(path, 'wb') as f:
+            f.write(data)
+        results.append(bench(f'analyze_image_from_path[{label}, {width}x{height}]',
+                             lambda: analysis_utils.analyze_image_from_path(path), **opts))
+        results.append(bench(f'analyze_image_from_bytes[{label}, {width}x{height}]',
+                             lambda: analysis_utils.analyze_image_from_bytes(data), **opts))
+    return results
+
+
+def concurrency_benchmarks(opts, label, concurrency=8):
+    """`concurrency` threads analyzing one frame each, with and without the emotion batcher."""
+    frame = synthetic_frame(1280, 720, seed=4)
+
+    def burst():
+        threads = [threading.Thread(target=analysis_utils.analyze_image, args=(frame,)) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    previous = analysis_utils.emotion_batcher
+    results = []
+    try:
+        for max_batch_size, max_wait_ms in ((0, 0), (32, 2), (32, 10)):
+            analysis_utils.configure_batching(max_batch_size, max_wait_ms)
+            name = 'off' if not max_batch_size else f'{max_batch_size}/{max_wait_ms}ms'
+            results.append(bench(f'analyze_image[{label}, {concurrency} concurrent, batch {name}]', burst, **opts))
+    finally:
+        analysis_utils.emotion_batcher = previous
+    return results
+
+
+def admission_benchmarks(opts, label, requests=16, batch=(32, 5)):
+    """
+    `requests` analyses arriving at once through the analysis admission class,
+    for several max_concurrent values: the limit also caps how many analyses
+    the emotion batcher can merge into one forward pass.
+    """
+    frame = synthetic_frame(1280, 720, seed=5)
+    previous = analysis_utils.emotion_batcher
+    results = []
+    try:
+        for max_concurrent in (2, 4, 8, 16):
+            controller = AdmissionController('analysis', max_concurrent, max_queue=requests, queue_timeout=60)
+            analysis_utils.emotion_batcher = None
+            analysis_utils.configure_batching(*batch)
+
+            def admitted():
+                token = controller.acquire()
+                try:
+                    analysis_utils.analyze_image(frame)
+                finally:
+                    controller.release(token)
+
+            def burst():
+                threads = [threading.Thread(target=admitted) for _ in range(requests)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+
+            result = bench(f'analyze_image[{label}, {requests} at once, admit {max_concurrent}]', burst, **opts)
+            result['mean_batch_size'] = round(analysis_utils.emotion_batcher.stats()['mean_batch_size'], 1)
+            print(f"    mean emotion batch {result['mean_batch_size']} crops")
+            results.append(result)
+    finally:
+        analysis_utils.emotion_batcher = previous
+    return results
+
+
+def real_models_cached():
+    """True when buffalo_l and the ViT emotion model are both available offline."""
+    if not analysis_utils.MODELS_LOADED:
+        return False
+    insightface_dir = os.path.join(os.path.expanduser('~'), '.insightface', 'models', 'buffalo_l')
+    if not glob.glob(os.path.join(insightface_dir, '*.onnx')):
+        return False
+    try:
+        from transformers import ViTForImageClassification
+        ViTForImageClassification.from_pretrained(EMOTION_MODEL_ID, local_files_only=True)
+    except Exception:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', default=os.path.join('benchmarks', 'results', 'analysis.json'))
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per timing sample.')
+    parser.add_argument('--quick', action='store_true', help='Fewer, shorter samples (smoke run).')
+    parser.add_argument('--no-real', action='store_true', help='Skip the real models even if cached.')
+    parser.add_argument('--faces', type=int, default=6, help='Faces returned by the stand-in detector.')
+    args = parser.parse_args()
+
+    opts = {'repeat': 3 if args.quick else args.repeat, 'min_time': 0.05 if args.quick else args.min_time}
+    pipeline_opts = dict(opts, min_time=0, number=1)
+    results = scoring_benchmarks(opts) + encoding_benchmarks(opts)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        previous = install_stub_models(num_faces=args.faces)
+        try:
+            results += pipeline_benchmarks(pipeline_opts, 'stub', workdir)
+            results += concurrency_benchmarks(pipeline_opts, 'stub')
+            results += admission_benchmarks(pipeline_opts, 'stub')
+        finally:
+            restore_models(previous)
+
+        real = not args.no_real and real_models_cached()
+        if real:
+            analysis_utils.initialize_models()
+            results += pipeline_benchmarks(pipeline_opts, 'real', workdir)
+            results += concurrency_benchmarks(pipeline_opts, 'real')
+            results += admission_benchmarks(pipeline_opts, 'real')
+        else:
+            print("[INFO] Real models not cached locally (or --no-real); skipped.")
+
+    save_results(args.output, 'analysis', results, extra={'real_models': real, 'stub_faces': args.faces})
+
+
+if __name__ == '__main__':
+    main()
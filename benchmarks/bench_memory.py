@@ -0,0 +1,92 @@
+# benchmarks/bench_memory.py
+"""
+Memory-budget mode: resident model memory, analysis latency and cold-reload
+latency for each MODEL_PRECISION.
+
+    python -m benchmarks.bench_memory -o benchmarks/results/memory.json
+
+Each precision runs in its own forked process: load the models, time
+analyze_image, unload them (as the idle reaper does) and time the first
+analysis after that, which pays the transparent reload. Resident model
+memory is the RSS dropped by the unload. Label agreement compares each
+precision's emotion labels on the same face crops with float32.
+Real models are used when cached locally, otherwise the stand-ins carrying
+--stub-weights-mb of synthetic Linear weights.
+"""
+import argparse
+import os
+import time
+
+from benchmarks.bench_analysis import real_models_cached
+from benchmarks.bench_serving import run_in_child
+from benchmarks.harness import bench, save_results
+from benchmarks.stubs import install_stub_loaders, synthetic_frame
+
+MB = 2 ** 20
+
+
+def measure_precision(precision, args, opts):
+    from app import analysis_utils
+    from app.serving import process_memory
+
+    if not args.real:
+        install_stub_loaders(num_faces=args.faces, weights_mb=args.stub_weights_mb)
+    analysis_utils.configure_batching(0)
+    analysis_utils.configure_memory_budget(precision)
+    analysis_utils.initialize_models()
+    stats = analysis_utils.memory_stats()
+
+    frame = synthetic_frame(1280, 720, seed=6)
+    crops = [synthetic_frame(112, 112, seed=100 + i) for i in range(32)]
+    labels = [label for label, _ in analysis_utils.get_emotions_vit(crops)]
+    result = bench(f'analyze_image[{precision}]', lambda: analysis_utils.analyze_image(frame), **opts)
+
+    loaded_rss = process_memory().get('rss', 0)
+    analysis_utils.unload_models()
+    unloaded_rss = process_memory().get('rss', 0)
+    start = time.perf_counter()
+    analysis_utils.analyze_image(frame)  # Reloads first
+    reload_request_seconds = time.perf_counter() - start
+
+    result.update({
+        'precision': precision,
+        'emotion_model_mb': stats['emotion_model_bytes'] / MB,
+        'resident_model_mb': (loaded_rss - unloaded_rss) / MB,
+        'load_seconds': stats['last_load_seconds'],
+        'reload_seconds': analysis_utils.model_stats['last_load_seconds'],
+        'reload_request_seconds': reload_request_seconds,
+        'labels': labels,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', default=os.path.join('benchmarks', 'results', 'memory.json'))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='Fewer samples (smoke run).')
+    parser.add_argument('--no-real', action='store_true', help='Use the stand-in models even if the real ones are cached.')
+    parser.add_argument('--faces', type=int, default=6, help='Faces returned by the stand-in detector.')
+    parser.add_argument('--stub-weights-mb', type=float, default=330,
+                        help='Synthetic Linear weights in the stand-in emotion model (about ViT-base size).')
+    args = parser.parse_args()
+    args.real = not args.no_real and run_in_child(real_models_cached)
+    print(f"[INFO] {'Real' if args.real else 'Stand-in'} models")
+
+    from app.analysis_utils import MODEL_PRECISIONS
+    opts = {'repeat': 3 if args.quick else args.repeat, 'min_time': 0, 'number': 1}
+    results = [run_in_child(measure_precision, precision, args, opts) for precision in MODEL_PRECISIONS]
+
+    reference = results[0]['labels']
+    print(f"\n{'precision':<10} {'weights':>9} {'resident':>9} {'analyze':>9} {'reload':>8} "
+          f"{'1st request':>12} {'labels = fp32':>14}")
+    for r in results:
+        r['label_agreement'] = sum(a == b for a, b in zip(r.pop('labels'), reference)) / len(reference)
+        print(f"{r['precision']:<10} {r['emotion_model_mb']:>7.1f}MB {r['resident_model_mb']:>7.1f}MB "
+              f"{r['median'] * 1000:>7.1f}ms {r['reload_seconds']:>7.2f}s {r['reload_request_seconds']:>11.2f}s "
+              f"{r['label_agreement']:>13.0%}")
+    save_results(args.output, 'memory', results, extra={'real_models': args.real})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_profiles.py
+"""
+Per-image detector latency and resident memory for each analysis profile.
+
+    python -m benchmarks.bench_profiles -o benchmarks/results/profiles.json
+
+Each profile (ANALYSIS_PROFILES in analysis_utils) loads buffalo_l in its own
+forked process with only its modules, so the RSS difference is exactly the
+cost of the loaded heads. FaceAnalysis.get() is then timed on a synthetic
+frame. Needs the real models in the local cache; the stand-ins have no
+per-module cost to measure.
+"""
+import argparse
+import os
+import time
+
+from benchmarks.bench_analysis import real_models_cached
+from benchmarks.bench_serving import run_in_child
+from benchmarks.harness import bench, save_results
+from benchmarks.stubs import synthetic_frame
+
+MB = 2 ** 20
+
+
+def measure_profile(profile, opts):
+    from insightface.app import FaceAnalysis
+    from app import analysis_utils
+    from app.serving import process_memory
+
+    analysis_utils.configure_profile(profile)
+    before = process_memory().get('rss', 0)
+    start = time.perf_counter()
+    face_app = FaceAnalysis(name="buffalo_l", allowed_modules=analysis_utils.face_modules)
+    face_app.prepare(ctx_id=0, det_size=(640, 640))
+    load_seconds = time.perf_counter() - start
+
+    frame = synthetic_frame(1280, 720, seed=5)
+    result = bench(f'FaceAnalysis.get[{profile}]', lambda: face_app.get(frame), **opts)
+    result.update({
+        'profile': profile,
+        'modules': sorted(face_app.models),
+        'load_seconds': load_seconds,
+        'models_rss_mb': (process_memory().get('rss', 0) - before) / MB,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', default=os.path.join('benchmarks', 'results', 'profiles.json'))
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--quick', action='store_true', help='Fewer samples (smoke run).')
+    args = parser.parse_args()
+
+    if not run_in_child(real_models_cached):
+        print("[INFO] Real models not cached locally; nothing to measure.")
+        return
+
+    from app.analysis_utils import ANALYSIS_PROFILES
+    opts = {'repeat': 3 if args.quick else args.repeat, 'min_time': 0, 'number': 1 if args.quick else 5}
+    results = [run_in_child(measure_profile, profile, opts) for profile in ANALYSIS_PROFILES]
+
+    full = next(r for r in results if r['profile'] == 'full')
+    print(f"\n{'profile':<12} {'modules':<58} {'get() ms':>9} {'vs full':>8} {'RSS MB':>8} {'saved MB':>9}")
+    for r in results:
+        print(f"{r['profile']:<12} {','.join(r['modules']):<58} {r['median'] * 1000:>9.1f} "
+              f"{r['median'] / full['median']:>7.0%} {r['models_rss_mb']:>8.1f} "
+              f"{full['models_rss_mb'] - r['models_rss_mb']:>9.1f}")
+    save_results(args.output, 'profiles', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/bench_requests.py
+"""
+Fixed per-request overhead: user loading and template context forms.
+
+    python -m benchmarks.bench_requests -o benchmarks/results/requests.json
+
+Builds two apps over the same throwaway database: "baseline" reproduces the
+old behaviour (load_user queries the DB on every request, both investigation
+forms are built for every render) and "current" uses the defaults (cached
+user, lazy context forms). Each is timed through Flask's test client on a
+JSON endpoint, a page without the investigation modals and a full page.
+CSRF protection stays on, as in production, so eager forms pay for their
+tokens; the client logs in through the real form to get a valid session.
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+
+from benchmarks.harness import bench, save_results
+
+PAGES = [
+    ('json', '/investigation/{inv}/captures'),
+    ('live page', '/investigation/{inv}/live'),
+    ('investigations page', '/investigations'),
+]
+CSRF_TOKEN_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def build_app(workdir, cache_ttl, eager_forms):
+    os.environ['FLASK_SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['FLASK_CAPTURE_FOLDER'] = os.path.join(workdir, 'captures')
+    os.environ['FLASK_CAPTURE_PACK_FOLDER'] = os.path.join(workdir, 'packs')
+    os.environ.pop('FLASK_WTF_CSRF_ENABLED', None)
+    os.environ['FLASK_USER_CACHE_TTL_SECONDS'] = str(cache_ttl)
+    from app import create_app
+    from app.forms import NewInvestigationForm, EditInvestigationForm
+
+    app = create_app()
+    if eager_forms:
+        # What inject_forms did before it went lazy; registered last, so it wins
+        @app.context_processor
+        def eager_investigation_forms():
+            return dict(new_investigation_form=NewInvestigationForm(),
+                        edit_investigation_form=EditInvestigationForm())
+    return app
+
+
+def seed(app):
+    from app.models import db, User, Investigation
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='benchuser', email='bench@example.com')
+        user.set_password('bench-password')
+        inv = Investigation(title='Benchmark', location='Test Site', drone_type='Multirotor',
+                            description='Benchmark', author=user)
+        db.session.add_all([user, inv])
+        db.session.commit()
+        return inv.id
+
+
+def logged_in_client(app):
+    client = app.test_client()
+    token = CSRF_TOKEN_RE.search(client.get('/login').get_data(as_text=True))
+    assert token, "no CSRF token on the login page"
+    response = client.post('/login', data={'email': 'bench@example.com', 'password': 'bench-password',
+                                           'csrf_token': token.group(1)})
+    assert response.status_code == 302, "login failed"
+    return client
+
+
+def request_benchmarks(label, app, inv_id, opts):
+    client = logged_in_client(app)
+    results = []
+    for name, path in PAGES:
+        url = path.format(inv=inv_id)
+
+        def get():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+
+        results.append(bench(f'GET {name} [{label}]', get, **opts))
+    return results
+
+
+def component_benchmarks(baseline, current, opts):
+    from flask_login import login_user
+    from app.models import db, User
+    from app.forms import NewInvestigationForm, EditInvestigationForm
+    from app.routes import inject_forms
+
+    results = []
+    for label, app in (('baseline', baseline), ('current', current)):
+        loader = app.login_manager._user_callback
+        with app.test_request_context():
+            loader('1')  # Warm the cache where there is one
+
+            def load():
+                loader('1')
+                db.session.remove()
+
+            results.append(bench(f'load_user [{label}]', load, **opts))
+
+    with current.test_request_context():
+        login_user(db.session.get(User, 1))
+        results.append(bench('context forms [baseline: eager]',
+                             lambda: (NewInvestigationForm(), EditInvestigationForm()), **opts))
+        results.append(bench('context forms [current: lazy, unused]', inject_forms, **opts))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', default=os.path.join('benchmarks', 'results', 'requests.json'))
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per timing sample.')
+    parser.add_argument('--quick', action='store_true', help='Fewer, shorter samples (smoke run).')
+    args = parser.parse_args()
+
+    opts = {'repeat': 3 if args.quick else args.repeat, 'min_time': 0.05 if args.quick else args.min_time}
+    workdir = tempfile.mkdtemp(prefix='ignitia-bench-')
+    try:
+        baseline = build_app(workdir, cache_ttl=0, eager_forms=True)
+        current = build_app(workdir, cache_ttl=30, eager_forms=False)
+        inv_id = seed(current)
+
+        results = component_benchmarks(baseline, current, opts)
+        results += request_benchmarks('baseline', baseline, inv_id, opts)
+        results += request_benchmarks('current', current, inv_id, opts)
+        save_results(args.output, 'requests', results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
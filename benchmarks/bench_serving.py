@@ -0,0 +1,183 @@
+# benchmarks/bench_serving.py
+"""
+Resident memory per worker process, with and without pre-fork model loading.
+
+    python -m benchmarks.bench_serving -o benchmarks/results/serving.json
+
+Each mode runs in its own freshly forked master process, which forks
+`--workers` children the way gunicorn does:
+
+  preload     the master builds the app and loads the models, then forks
+              (gunicorn.conf.py's preload_app + post_fork hooks)
+  per-worker  every child builds its own app and models after the fork
+
+gunicorn.conf.py runs a single worker, since live events and the frame
+buffer are per process; more --workers estimate what a multi-worker setup
+would cost once that state is shared.
+
+Once every worker has analyzed a few frames, the master reads RSS, PSS and
+private memory from /proc/<pid>/smaps_rollup for itself and each worker.
+RSS counts shared pages in every process; PSS splits them, so the PSS
+total is the real footprint. Real models are used when cached locally,
+otherwise the stand-ins carrying --stub-weights-mb of synthetic weights.
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import tempfile
+import traceback
+
+from benchmarks.harness import save_results
+
+MODES = ('per-worker', 'preload')
+MB = 2 ** 20
+
+
+def build_app(workdir, real, stub_weights_mb):
+    os.environ['FLASK_SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'serving.db')}"
+    os.environ['FLASK_CAPTURE_FOLDER'] = os.path.join(workdir, 'captures')
+    os.environ['FLASK_CAPTURE_PACK_FOLDER'] = os.path.join(workdir, 'packs')
+    if not real:
+        from benchmarks.stubs import install_stub_models
+        install_stub_models(weights_mb=stub_weights_mb)
+    from app import create_app
+    return create_app()
+
+
+def worker(mode, app, args, workdir, ready_fd):
+    from app import analysis_utils
+    from app.serving import init_worker
+    from benchmarks.stubs import synthetic_jpeg
+
+    status = b'0'
+    try:
+        if mode == 'preload':
+            init_worker(app, args.compute_threads)
+        else:
+            app = build_app(workdir, args.real, args.stub_weights_mb)
+            analysis_utils.configure_threads(args.compute_threads)
+        frame = synthetic_jpeg()
+        for _ in range(args.requests):
+            analysis_utils.analyze_image_from_bytes(frame)
+        status = b'1'
+    except Exception:
+        traceback.print_exc()
+    os.write(ready_fd, status)
+    signal.pause()  # Stay alive until the master has measured everyone
+
+
+def master(mode, args, workdir):
+    from app.serving import prepare_master, freeze_master, process_memory
+
+    app = None
+    if mode == 'preload':
+        prepare_master()
+        app = build_app(workdir, args.real, args.stub_weights_mb)
+        freeze_master()
+
+    ready_r, ready_w = os.pipe()
+    pids = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            worker(mode, app, args, workdir, ready_w)
+            os._exit(0)
+        pids.append(pid)
+    os.close(ready_w)
+
+    statuses = b''
+    while len(statuses) < args.workers:
+        chunk = os.read(ready_r, args.workers)
+        if not chunk:
+            break
+        statuses += chunk
+    try:
+        if statuses != b'1' * args.workers:
+            raise RuntimeError(f"{mode}: {statuses.count(b'1')}/{args.workers} workers came up")
+        return {'master': process_memory(), 'workers': [process_memory(pid) for pid in pids]}
+    finally:
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+
+
+def run_in_child(fn, *args):
+    """Calls fn in a forked child and returns its (JSON) result, so nothing it loads stays in this process."""
+    result_r, result_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(result_r)
+        try:
+            payload = {'ok': fn(*args)}
+        except Exception as e:
+            traceback.print_exc()
+            payload = {'error': str(e)}
+        with os.fdopen(result_w, 'w') as f:
+            json.dump(payload, f)
+        os._exit(0)
+    os.close(result_w)
+    with os.fdopen(result_r) as f:
+        payload = json.load(f)
+    os.waitpid(pid, 0)
+    if 'error' in payload:
+        raise RuntimeError(payload['error'])
+    return payload['ok']
+
+
+def summarize(mode, memory):
+    workers = memory['workers']
+
+    def mean(key):
+        return sum(w.get(key, 0) for w in workers) / len(workers) / MB
+
+    return {
+        'name': mode,
+        'workers': len(workers),
+        'worker_rss_mb': mean('rss'),
+        'worker_pss_mb': mean('pss'),
+        'worker_private_mb': mean('private'),
+        'master_rss_mb': memory['master'].get('rss', 0) / MB,
+        'total_pss_mb': (memory['master'].get('pss', 0) + sum(w.get('pss', 0) for w in workers)) / MB,
+    }
+
+
+def print_table(results):
+    print(f"\n{'mode':<12} {'workers':>7} {'RSS/worker':>11} {'PSS/worker':>11} {'private/worker':>15} "
+          f"{'master RSS':>11} {'total PSS':>10}")
+    for r in results:
+        print(f"{r['name']:<12} {r['workers']:>7} {r['worker_rss_mb']:>9.1f}MB {r['worker_pss_mb']:>9.1f}MB "
+              f"{r['worker_private_mb']:>13.1f}MB {r['master_rss_mb']:>9.1f}MB {r['total_pss_mb']:>8.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', default=os.path.join('benchmarks', 'results', 'serving.json'))
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=5, help='Analyses per worker before measuring.')
+    parser.add_argument('--compute-threads', type=int, default=0,
+                        help='torch/OpenCV threads per worker (default: cores // workers).')
+    parser.add_argument('--no-real', action='store_true', help='Use the stand-in models even if the real ones are cached.')
+    parser.add_argument('--stub-weights-mb', type=float, default=350,
+                        help='Synthetic weights carried by the stand-in emotion model (about ViT-base size).')
+    args = parser.parse_args()
+    args.compute_threads = args.compute_threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    from benchmarks.bench_analysis import real_models_cached
+    args.real = not args.no_real and run_in_child(real_models_cached)
+    print(f"[INFO] {'Real' if args.real else 'Stand-in'} models, {args.workers} workers, "
+          f"{args.compute_threads} compute threads each")
+
+    workdir = tempfile.mkdtemp(prefix='ignitia-bench-')
+    try:
+        results = [summarize(mode, run_in_child(master, mode, args, workdir)) for mode in MODES]
+        print_table(results)
+        save_results(args.output, 'serving', results, extra={'config': vars(args)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
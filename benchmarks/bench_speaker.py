@@ -0,0 +1,97 @@
+# benchmarks/bench_speaker.py
+"""
+Drone speaker relay: transcode cost, payload size and multi-drone fan-out.
+
+    python -m benchmarks.bench_speaker -o benchmarks/results/speaker.json
+
+The clip is a synthetic 44.1 kHz stereo WAV sent to --drones stand-in drones
+(benchmarks/drone_stub.py), each adding --delay seconds per request. The
+baseline is what the browser did before the relay, repeated per drone: the
+untouched clip, one drone after another, on a fresh connection each time.
+The relay sends the transcoded (cached) clip to all drones at once over
+pooled keep-alive connections. Transcoding uses ffmpeg when installed, else
+the WAV downmix/resample fallback.
+"""
+import argparse
+import http.client
+import io
+import os
+import tempfile
+
+import numpy as np
+from scipy.io import wavfile
+
+from app.speaker_relay import FFMPEG, AudioTranscoder, SpeakerRelay, _multipart
+from benchmarks.drone_stub import start_drones
+from benchmarks.harness import bench, save_results
+
+
+def synthetic_clip(seconds=20.0, rate=44100, seed=0):
+    t = np.arange(int(seconds * rate)) / rate
+    rng = np.random.default_rng(seed)
+    tone = 0.4 * np.sin(2 * np.pi * 440 * t) + 0.05 * rng.standard_normal(t.size)
+    stereo = np.stack([tone, np.roll(tone, 50)], axis=1)
+    out = io.BytesIO()
+    wavfile.write(out, rate, (stereo * 32767).astype(np.int16))
+    return out.getvalue()
+
+
+def send_sequential(drones, clip):
+    # One drone after another, a new connection per upload (no relay, no transcode)
+    body, content_type = _multipart({'volume': 70}, {'file': ('clip.wav', 'audio/wav', clip)})
+    for drone in drones:
+        conn = http.client.HTTPConnection('127.0.0.1', drone.server_address[1], timeout=30)
+        conn.request('POST', '/upload', body=body, headers={'Content-Type': content_type})
+        conn.getresponse().read()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', default=os.path.join('benchmarks', 'results', 'speaker.json'))
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--quick', action='store_true', help='Fewer samples (smoke run).')
+    parser.add_argument('--drones', type=int, default=4)
+    parser.add_argument('--delay', type=float, default=0.05, help='Per-request latency of each stand-in drone.')
+    parser.add_argument('--seconds', type=float, default=20.0, help='Length of the synthetic clip.')
+    args = parser.parse_args()
+    opts = {'repeat': 3 if args.quick else args.repeat, 'min_time': 0, 'number': 1}
+    print(f"[INFO] Transcoding with {'ffmpeg' if FFMPEG else 'the WAV fallback (ffmpeg not found)'}")
+
+    clip = synthetic_clip(args.seconds)
+    drones = start_drones(args.drones, delay=args.delay)
+    endpoints = [drone.url for drone in drones]
+    with tempfile.TemporaryDirectory() as cache_folder:
+        transcoder = AudioTranscoder(cache_folder)
+        relay = SpeakerRelay(transcoder, allowed_networks=['127.0.0.1/32'])
+
+        def transcode_cold():
+            for name in os.listdir(cache_folder):
+                os.remove(os.path.join(cache_folder, name))
+            transcoder.transcode(clip, 'clip.wav')
+
+        results = [
+            bench('transcode[cold]', transcode_cold, **opts),
+            bench('transcode[cached]', lambda: transcoder.transcode(clip, 'clip.wav'), **opts),
+            bench(f'sequential[{args.drones} drones, source clip]', lambda: send_sequential(drones, clip), **opts),
+            bench(f'relay[{args.drones} drones, cached clip]',
+                  lambda: relay.play(endpoints, clip, 'clip.wav', 70), **opts),
+        ]
+        played = relay.play(endpoints, clip, 'clip.wav', 70)
+
+    connections = sum(drone.connections for drone in drones)
+    for drone in drones:
+        drone.stop()
+    sequential, fanout = results[2]['median'], results[3]['median']
+    print(f"\nclip {len(clip) / 1024:.0f} KB -> {played['bytes'] / 1024:.0f} KB {played['format']} "
+          f"({len(clip) / played['bytes']:.1f}x smaller); fan-out {sequential / fanout:.1f}x faster; "
+          f"{connections} TCP connections accepted in total")
+    save_results(args.output, 'speaker', results, extra={
+        'ffmpeg': bool(FFMPEG), 'drones': args.drones, 'delay': args.delay,
+        'source_bytes': len(clip), 'transcoded_bytes': played['bytes'], 'format': played['format'],
+        'connections': connections,
+    })
+
+
+if __name__ == '__main__':
+    main()
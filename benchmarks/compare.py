@@ -0,0 +1,57 @@
+# benchmarks/compare.py
+"""
+Compares two benchmark result files and flags regressions.
+
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/head.json
+
+Exits with status 1 when any shared benchmark's median got slower than the
+threshold (default 10%), so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.harness import format_seconds
+
+
+def load(path):
+    with open(path) as f:
+        payload = json.load(f)
+    return payload, {r['name']: r for r in payload['results']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--metric', default='median', choices=['min', 'median', 'mean'])
+    parser.add_argument('--threshold', type=float, default=0.10, help='Allowed slowdown ratio (0.10 = 10%%).')
+    args = parser.parse_args()
+
+    base_meta, base = load(args.baseline)
+    cand_meta, cand = load(args.candidate)
+    print(f"baseline:  {base_meta['environment'].get('git_revision')}  ({args.baseline})")
+    print(f"candidate: {cand_meta['environment'].get('git_revision')}  ({args.candidate})\n")
+
+    regressions = 0
+    for name in base:
+        if name not in cand:
+            continue
+        old, new = base[name][args.metric], cand[name][args.metric]
+        ratio = new / old if old else float('inf')
+        flag = ''
+        if ratio > 1 + args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            flag = '  faster'
+        print(f"{name:<48} {format_seconds(old):>12} -> {format_seconds(new):>12}  x{ratio:.2f}{flag}")
+
+    only_new = sorted(set(cand) - set(base))
+    if only_new:
+        print(f"\nNew benchmarks: {', '.join(only_new)}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
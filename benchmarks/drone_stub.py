@@ -0,0 +1,145 @@
+# benchmarks/drone_stub.py
+"""
+Stand-in for a drone's speaker service (the Pi audio API the relay talks to).
+
+    python -m benchmarks.drone_stub --port 5001 --port 5002 --delay 0.05
+
+Each port serves POST /upload (multipart `file` + `volume`) and POST /stop
+with the same JSON replies as the Pi, over HTTP/1.1 keep-alive. Nothing is
+played: uploads are recorded (filename, volume, bytes) along with the number
+of TCP connections accepted, so a relay run can be checked for pooling.
+`--delay` adds per-request latency to mimic a drone on a slow radio link.
+Point an investigation's drone speaker URLs (or FLASK_SPEAKER_ENDPOINTS) at
+http://127.0.0.1:<port>, with FLASK_SPEAKER_ALLOWED_NETWORKS='["127.0.0.1/32"]',
+to use them from the app.
+"""
+import argparse
+import json
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DISPOSITION_RE = re.compile(rb'name="([^"]*)"(?:; filename="([^"]*)")?')
+
+
+def parse_multipart(body, content_type):
+    """{name: (filename, bytes)} from a multipart/form-data body (enough for the relay's uploads)."""
+    match = re.search(r'boundary=([^;]+)', content_type or '')
+    if not match:
+        return {}
+    fields = {}
+    for part in body.split(b'--' + match.group(1).strip('"').encode())[1:-1]:
+        headers, _, value = part[2:].partition(b'\r\n\r\n')
+        disposition = DISPOSITION_RE.search(headers)
+        if disposition:
+            filename = disposition.group(2).decode() if disposition.group(2) is not None else None
+            fields[disposition.group(1).decode()] = (filename, value[:-2])  # Drop the trailing CRLF
+    return fields
+
+
+class DroneSpeakerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the Flask dev server on the Pi
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+            self.server.open_sockets.add(self.connection)
+
+    def finish(self):
+        super().finish()
+        with self.server.lock:
+            self.server.open_sockets.discard(self.connection)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if self.path == '/stop':
+            with self.server.lock:
+                self.server.stops += 1
+            return self._reply(200, {'message': 'Music stopped'})
+        if self.path != '/upload':
+            return self._reply(404, {'message': 'Not found'})
+
+        fields = parse_multipart(body, self.headers.get('Content-Type'))
+        if 'file' not in fields:
+            return self._reply(400, {'message': 'No file uploaded'})
+        filename, audio = fields['file']
+        volume = fields['volume'][1].decode().strip() if 'volume' in fields else '70'
+        with self.server.lock:
+            self.server.uploads.append({'filename': filename, 'volume': volume, 'bytes': len(audio)})
+        self._reply(200, {'message': f"Playing {filename} at {volume}% volume"})
+
+
+class DroneStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, delay=0.0, verbose=False):
+        super().__init__(('127.0.0.1', port), DroneSpeakerHandler)
+        self.delay = delay
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.open_sockets = set()
+        self.uploads = []
+        self.stops = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stops serving and drops kept-alive connections, like a drone going out of range."""
+        self.shutdown()
+        self.server_close()
+        with self.lock:
+            for sock in self.open_sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def start_drones(count, delay=0.0):
+    """`count` stand-in drones on free local ports, already serving."""
+    return [DroneStub(delay=delay).start() for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, action='append', help='Port to serve a drone on (repeatable).')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds added to every request.')
+    args = parser.parse_args()
+
+    drones = [DroneStub(port, delay=args.delay, verbose=True).start() for port in args.port or [5001]]
+    for drone in drones:
+        print(f"[INFO] Stand-in drone speaker at {drone.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for drone in drones:
+            drone.stop()
+
+
+if __name__ == '__main__':
+    main()
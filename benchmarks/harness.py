@@ -0,0 +1,92 @@
+# benchmarks/harness.py
+"""Small timing harness shared by the benchmark scripts; results are plain JSON."""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    info = {
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+    }
+    for module in ('numpy', 'cv2', 'torch'):
+        mod = sys.modules.get(module)
+        if mod is not None:
+            info[module] = getattr(mod, '__version__', None)
+    return info
+
+
+def _autorange(fn, min_time):
+    """Like timeit.Timer.autorange: calls per sample so one sample takes >= min_time."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            return number
+        number *= 10 if elapsed < min_time / 10 else 2
+
+
+def bench(name, fn, repeat=7, warmup=1, min_time=0.2, number=None):
+    """Times `fn` and returns per-call statistics in seconds."""
+    for _ in range(warmup):
+        fn()
+    number = number or _autorange(fn, min_time)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    samples.sort()
+    result = {
+        'name': name,
+        'number': number,
+        'repeat': repeat,
+        'min': samples[0],
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'max': samples[-1],
+    }
+    print(f"{name:<48} {format_seconds(result['median']):>12} median  "
+          f"{format_seconds(result['min']):>12} min  (x{number}, {repeat} runs)")
+    return result
+
+
+def format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def save_results(path, suite, results, extra=None):
+    payload = {'suite': suite, 'environment': environment(), 'results': results}
+    if extra:
+        payload.update(extra)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nSaved {len(results)} results to {path}")
@@ -0,0 +1,255 @@
+# benchmarks/load_test.py
+"""
+Multi-drone load test against a locally started Ignitia server.
+
+    python -m benchmarks.load_test --drones 8 --rate 2 --analysts 4 --duration 60
+
+Starts the app on a free port with a throwaway SQLite DB and capture folder and
+the stand-in models from benchmarks/stubs.py, seeds users and investigations,
+then runs for --duration seconds:
+
+  * N drones, each POSTing JPEG frames to /investigation/<id>/capture at --rate fps
+  * M analysts cycling through /reports, /investigations, the captures API and
+    (with --analyze-ratio) /capture/<id>/analyze
+
+and reports p50/p95/p99 latency, throughput and error rate per endpoint.
+"""
+import argparse
+import base64
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+
+from benchmarks.harness import save_results
+from benchmarks.stubs import install_stub_models, synthetic_jpeg
+
+PASSWORD = 'loadtest-password'
+
+
+# --- Local Server ---
+def start_server(workdir, num_faces):
+    """Creates the app against temp storage and serves it from a background thread."""
+    os.environ['FLASK_SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    os.environ['FLASK_CAPTURE_FOLDER'] = os.path.join(workdir, 'captures')
+    os.environ['FLASK_CAPTURE_PACK_FOLDER'] = os.path.join(workdir, 'packs')
+    os.environ['FLASK_WTF_CSRF_ENABLED'] = 'false'
+    # Stubs first: initialize_models() sees them and skips loading the real ones
+    install_stub_models(num_faces=num_faces)
+
+    from werkzeug.serving import make_server
+    from app import create_app, db
+
+    app = create_app()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no per-request access log
+    with app.app_context():
+        db.create_all()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return app, server, f"http://127.0.0.1:{server.server_port}"
+
+
+def seed(app, num_users, investigations_per_user):
+    """Creates users and Live investigations directly in the DB. Returns [(email, [investigation ids])]."""
+    from app.models import db, User, Investigation
+
+    accounts = []
+    with app.app_context():
+        for u in range(num_users):
+            user = User(username=f'loaduser{u}', email=f'loaduser{u}@example.com')
+            user.set_password(PASSWORD)
+            db.session.add(user)
+            invs = [Investigation(title=f'Load test investigation {u}-{i}', location='Test Site',
+                                  drone_type='Multirotor', description='Load test', author=user)
+                    for i in range(investigations_per_user)]
+            db.session.add_all(invs)
+            db.session.commit()
+            accounts.append((user.email, [inv.id for inv in invs]))
+    return accounts
+
+
+# --- HTTP Client ---
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, seconds, status):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+            if status == 0 or status >= 400:
+                self.errors[endpoint] += 1
+
+
+class Client:
+    """One logged-in browser-like session (own cookie jar)."""
+
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, endpoint, path, data=None, json_body=None, method=None):
+        headers = {}
+        if json_body is not None:
+            data = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            data = urllib.parse.urlencode(data).encode('utf-8')
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        start = time.perf_counter()
+        status, body = 0, b''
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                status, body = resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        except Exception:
+            status = 0
+        if endpoint:
+            self.recorder.record(endpoint, time.perf_counter() - start, status)
+        return status, body
+
+    def login(self, email):
+        status, _ = self.request(None, '/login', data={'email': email, 'password': PASSWORD})
+        return status == 200
+
+
+# --- Simulated Actors ---
+def drone(client, investigation_id, rate, frames, stop):
+    """Open-loop sender: frames are scheduled at `rate` fps regardless of response time."""
+    interval = 1.0 / rate
+    next_send = time.perf_counter() + random.uniform(0, interval)
+    i = 0
+    while not stop.is_set():
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            stop.wait(delay)
+            if stop.is_set():
+                break
+        client.request('POST /investigation/<id>/capture', f'/investigation/{investigation_id}/capture',
+                       json_body={'image_data': frames[i % len(frames)]})
+        i += 1
+        next_send += interval
+
+
+def analyst(client, investigation_ids, think_time, analyze_ratio, stop):
+    while not stop.is_set():
+        inv_id = random.choice(investigation_ids)
+        client.request('GET /reports', '/reports')
+        client.request('GET /investigations', '/investigations')
+        status, body = client.request('GET /investigation/<id>/captures', f'/investigation/{inv_id}/captures')
+        if status == 200 and analyze_ratio and random.random() < analyze_ratio:
+            captures = json.loads(body or b'[]')
+            if captures:
+                capture_id = random.choice(captures[:20])['id']
+                client.request('POST /capture/<id>/analyze', f'/capture/{capture_id}/analyze', data={}, method='POST')
+        stop.wait(random.expovariate(1 / think_time) if think_time else 0)
+
+
+# --- Reporting ---
+def summarize(recorder, duration):
+    results = []
+    for endpoint in sorted(recorder.latencies):
+        lat = np.array(recorder.latencies[endpoint])
+        count = len(lat)
+        results.append({
+            'name': endpoint,
+            'requests': count,
+            'errors': recorder.errors[endpoint],
+            'error_rate': recorder.errors[endpoint] / count if count else 0.0,
+            'throughput_rps': count / duration,
+            'p50': float(np.percentile(lat, 50)),
+            'p95': float(np.percentile(lat, 95)),
+            'p99': float(np.percentile(lat, 99)),
+            'max': float(lat.max()),
+            'median': float(np.percentile(lat, 50)),
+            'statuses': {str(k): v for k, v in recorder.statuses[endpoint].items()},
+        })
+    return results
+
+
+def print_table(results):
+    print(f"\n{'endpoint':<36} {'reqs':>7} {'rps':>8} {'err%':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for r in results:
+        print(f"{r['name']:<36} {r['requests']:>7} {r['throughput_rps']:>8.2f} {r['error_rate'] * 100:>6.1f}% "
+              f"{r['p50'] * 1000:>9.1f} {r['p95'] * 1000:>9.1f} {r['p99'] * 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drones', type=int, default=4, help='Simulated drones (one investigation each).')
+    parser.add_argument('--rate', type=float, default=1.0, help='Frames per second per drone.')
+    parser.add_argument('--analysts', type=int, default=2, help='Simulated analysts browsing at the same time.')
+    parser.add_argument('--think-time', type=float, default=1.0, help='Mean analyst pause between page cycles (s).')
+    parser.add_argument('--analyze-ratio', type=float, default=0.0, help='Chance an analyst cycle also runs an analysis.')
+    parser.add_argument('--users', type=int, default=2, help='Accounts the drones/investigations are spread over.')
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--frame-size', default='1280x720', help='WIDTHxHEIGHT of generated frames.')
+    parser.add_argument('--unique-frames', type=int, default=8, help='Distinct frames per drone (repeats dedupe).')
+    parser.add_argument('--faces', type=int, default=6, help='Faces the stand-in detector returns.')
+    parser.add_argument('-o', '--output', default=os.path.join('benchmarks', 'results', 'load.json'))
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.frame_size.lower().split('x'))
+    workdir = tempfile.mkdtemp(prefix='ignitia-load-')
+    try:
+        app, server, base_url = start_server(workdir, args.faces)
+        per_user = max(1, -(-args.drones // args.users))
+        accounts = seed(app, args.users, per_user)
+        print(f"[INFO] Serving on {base_url}; {args.drones} drones @ {args.rate} fps, "
+              f"{args.analysts} analysts, {args.duration:.0f}s")
+
+        recorder = Recorder()
+        stop = threading.Event()
+        threads = []
+        for d in range(args.drones):
+            email, inv_ids = accounts[d % len(accounts)]
+            client = Client(base_url, recorder)
+            client.login(email)
+            frames = ['data:image/jpeg;base64,' + base64.b64encode(
+                synthetic_jpeg(width, height, seed=d * 1000 + f)).decode('ascii') for f in range(args.unique_frames)]
+            threads.append(threading.Thread(target=drone, daemon=True,
+                                            args=(client, inv_ids[(d // len(accounts)) % len(inv_ids)], args.rate, frames, stop)))
+        for a in range(args.analysts):
+            email, inv_ids = accounts[a % len(accounts)]
+            client = Client(base_url, recorder)
+            client.login(email)
+            threads.append(threading.Thread(target=analyst, daemon=True,
+                                            args=(client, inv_ids, args.think_time, args.analyze_ratio, stop)))
+
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        stop.wait(args.duration)
+        stop.set()
+        for t in threads:
+            t.join(timeout=60)
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+
+        results = summarize(recorder, elapsed)
+        print_table(results)
+        save_results(args.output, 'load', results, extra={'config': vars(args), 'elapsed': elapsed})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# benchmarks/stubs.py
+"""
+Deterministic stand-ins for the InsightFace detector and the ViT emotion model.
+
+They return objects with the same shapes and attributes the real models
+produce (bbox/kps/det_score/gender/age/embedding per face, (N, 3, 224, 224)
+pixel_values, (N, 7) logits), so the surrounding analysis code runs
+unchanged without network access or downloaded weights.
+"""
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import torch
+
+import app.analysis_utils as analysis_utils
+
+EMBEDDING_SIZE = 512
+
+
+class StubFace(dict):
+    """Attribute-style dict, like insightface.app.common.Face."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class StubFaceAnalysis:
+    """
+    Mimics FaceAnalysis.get(): letterboxes the frame to det_size, runs a cheap
+    convolution in place of the detector and returns `num_faces` faces laid out
+    on a grid, with positions and attributes derived from a fixed seed.
+    """
+
+    def __init__(self, num_faces=6, det_size=(640, 640), seed=0,
+                 allowed_modules=('detection', 'landmark_2d_106', 'landmark_3d_68', 'genderage', 'recognition')):
+        self.num_faces = num_faces
+        self.det_size = det_size
+        self.seed = seed
+        self.allowed_modules = set(allowed_modules)
+
+    def prepare(self, ctx_id=0, det_size=(640, 640)):
+        self.det_size = det_size
+
+    def get(self, img, max_num=0):
+        height, width = img.shape[:2]
+        scale = min(self.det_size[0] / width, self.det_size[1] / height)
+        det_input = np.zeros((self.det_size[1], self.det_size[0], 3), dtype=np.uint8)
+        resized = cv2.resize(img, (int(width * scale), int(height * scale)))
+        det_input[:resized.shape[0], :resized.shape[1]] = resized
+        cv2.GaussianBlur(det_input, (5, 5), 0)
+
+        rng = np.random.default_rng(self.seed)
+        cols = max(1, int(np.ceil(np.sqrt(self.num_faces))))
+        rows = max(1, int(np.ceil(self.num_faces / cols)))
+        cell_w, cell_h = width / cols, height / rows
+        faces = []
+        for i in range(self.num_faces):
+            x0, y0 = (i % cols) * cell_w, (i // cols) * cell_h
+            size = min(cell_w, cell_h) * rng.uniform(0.3, 0.8)
+            x1, y1 = x0 + rng.uniform(0, cell_w - size), y0 + rng.uniform(0, cell_h - size)
+            bbox = np.array([x1, y1, x1 + size, y1 + size], dtype=np.float32)
+            face = StubFace(
+                bbox=bbox,
+                kps=(bbox[:2] + rng.uniform(0, size, (5, 2))).astype(np.float32),
+                det_score=np.float32(rng.uniform(0.5, 0.99)),
+            )
+            if 'genderage' in self.allowed_modules:
+                face['gender'] = int(rng.integers(0, 2))
+                face['age'] = int(rng.integers(3, 80))
+            if 'landmark_2d_106' in self.allowed_modules:
+                face['landmark_2d_106'] = rng.uniform(0, size, (106, 2)).astype(np.float32)
+            if 'landmark_3d_68' in self.allowed_modules:
+                face['landmark_3d_68'] = rng.uniform(0, size, (68, 3)).astype(np.float32)
+            if 'recognition' in self.allowed_modules:
+                face['embedding'] = rng.standard_normal(EMBEDDING_SIZE).astype(np.float32)
+            faces.append(face)
+        return faces
+
+
+class _BatchFeature(dict):
+    def to(self, device):
+        return _BatchFeature({k: v.to(device) for k, v in self.items()})
+
+
+class StubProcessor:
+    """Mimics ViTImageProcessor: resize to 224x224, rescale and normalize."""
+
+    size = 224
+
+    def __call__(self, images, return_tensors="pt"):
+        if not isinstance(images, (list, tuple)):
+            images = [images]
+        arrays = [np.asarray(im.convert('RGB').resize((self.size, self.size)), dtype=np.float32) for im in images]
+        batch = (np.stack(arrays) / 255.0 - 0.5) / 0.5
+        return _BatchFeature(pixel_values=torch.from_numpy(batch.transpose(0, 3, 1, 2).copy()))
+
+
+class StubEmotionModel(torch.nn.Module):
+    """
+    Small conv + linear head producing (N, 7) logits, seeded for repeatable
+    outputs. `padding_mb` adds an unused, fully resident layer so memory
+    measurements see weights of a realistic size.
+    """
+
+    def __init__(self, num_labels=7, seed=0, padding_mb=0):
+        super().__init__()
+        generator_state = torch.random.get_rng_state()
+        torch.manual_seed(seed)
+        self.features = torch.nn.Sequential(
+            torch.nn.Conv2d(3, 16, kernel_size=16, stride=16),
+            torch.nn.GELU(),
+        )
+        self.classifier = torch.nn.Linear(16 * 14 * 14, num_labels)
+        torch.random.set_rng_state(generator_state)
+        # Square Linear like a ViT's, so reduced precision and int8 quantization shrink it too
+        side = int((padding_mb * 2**20 / 4) ** 0.5)
+        self.padding = torch.nn.Linear(side, side, bias=False) if side else None
+
+    def forward(self, pixel_values):
+        x = self.features(pixel_values).flatten(1)
+        return SimpleNamespace(logits=self.classifier(x))
+
+
+def install_stub_models(num_faces=6, seed=0, weights_mb=0):
+    """Points analysis_utils at the stand-in models. Returns the previous state for restore_models()."""
+    previous = (analysis_utils.MODELS_LOADED, analysis_utils.device, analysis_utils.face_app,
+                analysis_utils.processor, analysis_utils.emotion_model)
+    analysis_utils.MODELS_LOADED = True
+    analysis_utils.device = "cpu"
+    analysis_utils.face_app = StubFaceAnalysis(num_faces=num_faces, seed=seed)
+    analysis_utils.processor = StubProcessor()
+    analysis_utils.emotion_model = StubEmotionModel(seed=seed, padding_mb=weights_mb).eval()
+    return previous
+
+
+def install_stub_loaders(num_faces=6, seed=0, weights_mb=0):
+    """
+    Points analysis_utils' loaders at the stand-ins, so initialize_models(),
+    MODEL_PRECISION and the idle unload/reload cycle run as with real models.
+    Returns the previous loaders for restore_loaders().
+    """
+    previous = (analysis_utils.MODELS_LOADED, analysis_utils.load_face_app, analysis_utils.load_emotion_model)
+    analysis_utils.MODELS_LOADED = True
+    analysis_utils.load_face_app = lambda: StubFaceAnalysis(num_faces=num_faces, seed=seed)
+    analysis_utils.load_emotion_model = lambda: (StubProcessor(), StubEmotionModel(seed=seed, padding_mb=weights_mb))
+    return previous
+
+
+def restore_loaders(previous):
+    analysis_utils.MODELS_LOADED, analysis_utils.load_face_app, analysis_utils.load_emotion_model = previous
+
+
+def restore_models(previous):
+    (analysis_utils.MODELS_LOADED, analysis_utils.device, analysis_utils.face_app,
+     analysis_utils.processor, analysis_utils.emotion_model) = previous
+
+
+def synthetic_frame(width=1280, height=720, seed=0):
+    """A deterministic BGR frame with enough texture to behave like a real JPEG."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+    frame = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.integers(0, 24, (height, width, 3), dtype=np.uint8)
+    return cv2.add(frame, noise)
+
+
+def synthetic_jpeg(width=1280, height=720, seed=0, quality=90):
+    ok, buf = cv2.imencode('.jpg', synthetic_frame(width, height, seed), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes()
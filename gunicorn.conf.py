@@ -0,0 +1,62 @@
+# gunicorn.conf.py
+"""
+Production server settings:
+
+    gunicorn -c gunicorn.conf.py               # threaded WSGI worker
+    WEB_ASGI=1 gunicorn -c gunicorn.conf.py    # uvicorn worker (needs uvicorn, a2wsgi)
+
+Live events, the frame buffer and the panic alert windows are kept in
+process memory, so the server runs exactly one worker and scales with
+request threads instead. The master builds the app and loads the models
+before forking it, so a restarted worker starts without reloading them.
+Environment:
+
+    WEB_THREADS          request threads (default 16)
+    WEB_COMPUTE_THREADS  torch/BLAS/OpenCV/ONNX threads (default: all cores)
+    WEB_BIND             listen address (default 0.0.0.0:8000)
+"""
+import os
+import sys
+
+workers = 1
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+compute_threads = int(os.environ.get('WEB_COMPUTE_THREADS', 0)) or os.cpu_count() or 1
+preload_app = True
+timeout = 120  # A cold analysis can take a while on CPU
+
+if os.environ.get('WEB_ASGI'):
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'asgi:application'
+else:
+    worker_class = 'gthread'
+    wsgi_app = 'wsgi:app'
+
+# OpenMP/BLAS size their pools when first loaded, i.e. when the preloaded app imports
+# numpy and torch, so this has to happen before that
+for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+    os.environ[name] = str(compute_threads)
+
+from app.serving import prepare_master, freeze_master, init_worker, request_threads  # noqa: E402
+
+threads = request_threads()
+prepare_master()
+
+
+def on_starting(server):
+    # `-w` on the command line overrides this file, so check what gunicorn ended up with
+    if server.cfg.workers > 1:
+        # Each worker would have its own EventBroker, FrameBuffers and panic windows: SSE subscribers
+        # on one worker would miss events published on another, and /snapshot would land on workers
+        # that never received the frames
+        sys.exit(f"[ERROR] {server.cfg.workers} workers requested, but live events, the frame buffer and "
+                 "panic alerts are per process. Run one worker and raise WEB_THREADS instead.")
+
+
+def pre_fork(server, worker):
+    freeze_master()
+
+
+def post_fork(server, worker):
+    from wsgi import app
+    init_worker(app, compute_threads)
+    server.log.info("Worker %s: %s compute threads", worker.pid, compute_threads)
@@ -45,6 +45,14 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+def include_name(name, type_, parent_names):
+    # The search index (see app/search.py) lives outside the models: the FTS5 table and its
+    # shadow tables on SQLite, the generated column and its GIN index on Postgres
+    if type_ == 'table':
+        return not name.startswith('investigation_fts')
+    return name not in ('search_vector', 'ix_investigation_search_vector')
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -93,10 +101,16 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_name", include_name)
 
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            # Batch migrations rebuild SQLite tables by copy, drop and rename. With foreign
+            # keys on (see models.py) dropping the old copy would cascade into child rows.
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
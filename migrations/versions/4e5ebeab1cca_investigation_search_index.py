@@ -0,0 +1,64 @@
+"""investigation search index
+
+Revision ID: 4e5ebeab1cca
+Revises: cf018e160502
+Create Date: 2026-10-19 16:34:12.064987
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e5ebeab1cca'
+down_revision = 'cf018e160502'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 table and triggers on SQLite, generated tsvector column on Postgres, filled from the
+    # existing investigations. Spelled out here rather than taken from app/search.py so this
+    # revision stays what it was when later releases change the app's copy.
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS investigation_fts USING fts5("
+            "title, location, drone_type, description, content='investigation', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS investigation_fts_ai AFTER INSERT ON investigation BEGIN "
+            "INSERT INTO investigation_fts(rowid, title, location, drone_type, description) "
+            "VALUES (new.id, new.title, new.location, new.drone_type, new.description); END")
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS investigation_fts_ad AFTER DELETE ON investigation BEGIN "
+            "INSERT INTO investigation_fts(investigation_fts, rowid, title, location, drone_type, description) "
+            "VALUES ('delete', old.id, old.title, old.location, old.drone_type, old.description); END")
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS investigation_fts_au "
+            "AFTER UPDATE OF title, location, drone_type, description ON investigation BEGIN "
+            "INSERT INTO investigation_fts(investigation_fts, rowid, title, location, drone_type, description) "
+            "VALUES ('delete', old.id, old.title, old.location, old.drone_type, old.description); "
+            "INSERT INTO investigation_fts(rowid, title, location, drone_type, description) "
+            "VALUES (new.id, new.title, new.location, new.drone_type, new.description); END")
+        op.execute("INSERT INTO investigation_fts(investigation_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        # The generated column is computed for every existing row as it is added
+        op.execute(
+            "ALTER TABLE investigation ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(location, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(drone_type, '')), 'C') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'D')) STORED")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_investigation_search_vector ON investigation USING GIN (search_vector)")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('investigation_fts_ai', 'investigation_fts_ad', 'investigation_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS investigation_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_investigation_search_vector")
+        op.execute("ALTER TABLE investigation DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,72 @@
+"""cascade deletes
+
+Revision ID: 542b2f3fdc6b
+Revises: ff918770f5bd
+Create Date: 2026-10-19 16:35:41.248610
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '542b2f3fdc6b'
+down_revision = 'ff918770f5bd'
+branch_labels = None
+depends_on = None
+
+# (table, column, referred table) whose foreign key gains ON DELETE CASCADE
+CASCADES = [
+    ('investigation', 'user_id', 'user'),
+    ('report', 'user_id', 'user'),
+    ('capture', 'investigation_id', 'investigation'),
+]
+# The initial tables' foreign keys are unnamed; this names them on SQLite's table rebuild
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+# The search index triggers as revision 4e5ebeab1cca created them
+SEARCH_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS investigation_fts_ai AFTER INSERT ON investigation BEGIN "
+    "INSERT INTO investigation_fts(rowid, title, location, drone_type, description) "
+    "VALUES (new.id, new.title, new.location, new.drone_type, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS investigation_fts_ad AFTER DELETE ON investigation BEGIN "
+    "INSERT INTO investigation_fts(investigation_fts, rowid, title, location, drone_type, description) "
+    "VALUES ('delete', old.id, old.title, old.location, old.drone_type, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS investigation_fts_au "
+    "AFTER UPDATE OF title, location, drone_type, description ON investigation BEGIN "
+    "INSERT INTO investigation_fts(investigation_fts, rowid, title, location, drone_type, description) "
+    "VALUES ('delete', old.id, old.title, old.location, old.drone_type, old.description); "
+    "INSERT INTO investigation_fts(rowid, title, location, drone_type, description) "
+    "VALUES (new.id, new.title, new.location, new.drone_type, new.description); END",
+]
+
+
+def _replace_foreign_key(table, column, referred, ondelete):
+    existing = next((fk['name'] for fk in sa.inspect(op.get_bind()).get_foreign_keys(table)
+                     if fk['constrained_columns'] == [column] and fk['referred_table'] == referred), None)
+    name = f'fk_{table}_{column}_{referred}'
+    with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(existing or name, type_='foreignkey')
+        batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+
+def _restore_search_triggers():
+    # Rebuilding `investigation` on SQLite drops the search index triggers along with the old table
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite' and sa.inspect(bind).has_table('investigation_fts'):
+        for statement in SEARCH_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    for table, column, referred in CASCADES:
+        _replace_foreign_key(table, column, referred, 'CASCADE')
+        # Cascades and the set-based deletes look children up by these columns
+        op.create_index(op.f(f'ix_{table}_{column}'), table, [column], unique=False)
+    _restore_search_triggers()
+
+
+def downgrade():
+    for table, column, referred in reversed(CASCADES):
+        op.drop_index(op.f(f'ix_{table}_{column}'), table_name=table)
+        _replace_foreign_key(table, column, referred, None)
+    _restore_search_triggers()
@@ -0,0 +1,29 @@
+"""panic samples ordered by time
+
+Revision ID: 8d3f61c2a9b4
+Revises: 11c980415eb4
+Create Date: 2026-10-19 18:02:41.517204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3f61c2a9b4'
+down_revision = '11c980415eb4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('panic_sample', schema=None) as batch_op:
+        batch_op.drop_index('ix_panic_sample_investigation_id_id')
+        batch_op.create_index('ix_panic_sample_investigation_id_timestamp', ['investigation_id', 'timestamp', 'id'],
+                              unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('panic_sample', schema=None) as batch_op:
+        batch_op.drop_index('ix_panic_sample_investigation_id_timestamp')
+        batch_op.create_index('ix_panic_sample_investigation_id_id', ['investigation_id', 'id'], unique=False)
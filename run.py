@@ -1,12 +1,13 @@
 # run.py
 from app import create_app, db
 from dotenv import load_dotenv
+from flask_migrate import upgrade
 load_dotenv()
 
 app = create_app()
 
 if __name__ == '__main__':
     with app.app_context():
-        # This will create the database tables if they don't exist
-        db.create_all()
-    app.run(debug=True)
\ No newline at end of file
+        # Creates the database, or brings an existing one up to the current models (migrations/versions)
+        upgrade()
+    app.run(debug=True)
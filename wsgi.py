@@ -0,0 +1,8 @@
+# wsgi.py
+"""WSGI entry point for production servers (see gunicorn.conf.py); run.py is the development server."""
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app
+
+app = create_app()